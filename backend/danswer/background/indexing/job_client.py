@@ -4,6 +4,11 @@ not follow the expected behavior, etc.
 
 NOTE: cannot use Celery directly due to
 https://github.com/celery/celery/issues/7007#issuecomment-1740139367"""
+import atexit
+import multiprocessing.connection
+import os
+import signal
+import threading
 from collections.abc import Callable
 from dataclasses import dataclass
 from typing import Any
@@ -11,6 +16,7 @@ from typing import Literal
 from typing import Optional
 from typing import TYPE_CHECKING
 
+from danswer.configs.app_configs import INDEXING_CHUNKER_PROCESSES
 from danswer.utils.logger import setup_logger
 
 logger = setup_logger()
@@ -27,6 +33,27 @@ JobStatusType = (
 )
 
 
+# Daemonic processes can't start child processes, so the indexing jobs are only daemonic
+# if they don't need to run their own chunking pool
+_NON_DAEMONIC_JOBS = INDEXING_CHUNKER_PROCESSES > 0
+
+
+def _terminate_on_parent_exit() -> None:
+    """Non-daemonic jobs outlive their parent if it is killed, so the job terminates itself
+    (and with it its own children) once the parent process is gone"""
+    parent_process = multiprocessing.parent_process()
+    if parent_process is None:
+        return
+    multiprocessing.connection.wait([parent_process.sentinel])
+    logger.warning("Parent process exited, terminating the job")
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+def _run_non_daemonic_job(func: Callable, *args: Any) -> None:
+    threading.Thread(target=_terminate_on_parent_exit, daemon=True).start()
+    func(*args)
+
+
 @dataclass
 class SimpleJob:
     """Drop in replacement for `dask.distributed.Future`"""
@@ -78,6 +105,15 @@ class SimpleJobClient:
         self.n_workers = n_workers
         self.job_id_counter = 0
         self.jobs: dict[int, SimpleJob] = {}
+        # multiprocessing waits for non-daemonic processes when the interpreter exits,
+        # the running jobs are cancelled instead
+        if _NON_DAEMONIC_JOBS:
+            atexit.register(self._cancel_running_jobs)
+
+    def _cancel_running_jobs(self) -> None:
+        for job in list(self.jobs.values()):
+            if job.cancel():
+                logger.info(f"Cancelled job with id: '{job.id}' on exit")
 
     def _cleanup_completed_jobs(self) -> None:
         current_job_ids = list(self.jobs.keys())
@@ -99,7 +135,11 @@ class SimpleJobClient:
         job_id = self.job_id_counter
         self.job_id_counter += 1
 
-        process = Process(target=func, args=args, daemon=True)
+        if _NON_DAEMONIC_JOBS:
+            # Cancelled when this process exits and terminated if it is killed
+            process = Process(target=_run_non_daemonic_job, args=(func, *args))
+        else:
+            process = Process(target=func, args=args, daemon=True)
         job = SimpleJob(id=job_id, process=process)
         process.start()
 
@@ -1,8 +1,11 @@
+import signal
+import threading
 import time
 import traceback
 from datetime import datetime
 from datetime import timedelta
 from datetime import timezone
+from types import FrameType
 
 from sqlalchemy.orm import Session
 
@@ -33,8 +36,10 @@ from danswer.db.models import IndexAttempt
 from danswer.db.models import IndexingStatus
 from danswer.db.models import IndexModelStatus
 from danswer.document_index.factory import get_default_document_index
+from danswer.indexing.chunker import shutdown_chunking_pool
 from danswer.indexing.embedder import DefaultIndexingEmbedder
-from danswer.indexing.indexing_pipeline import build_indexing_pipeline
+from danswer.indexing.indexing_pipeline import build_staged_indexing_pipeline
+from danswer.indexing.indexing_pipeline import IndexedDocBatch
 from danswer.utils.logger import IndexAttemptSingleton
 from danswer.utils.logger import setup_logger
 
@@ -137,13 +142,6 @@ def _run_indexing(
         passage_prefix=db_embedding_model.passage_prefix,
     )
 
-    indexing_pipeline = build_indexing_pipeline(
-        embedder=embedding_model,
-        document_index=document_index,
-        ignore_time_skip=index_attempt.from_beginning
-        or (db_embedding_model.status == IndexModelStatus.FUTURE),
-    )
-
     db_connector = index_attempt.connector
     db_credential = index_attempt.credential
     last_successful_index_time = (
@@ -183,55 +181,80 @@ def _run_indexing(
 
         try:
             all_connector_doc_ids: set[str] = set()
-            for doc_batch in doc_batch_generator:
-                # Check if connector is disabled mid run and stop if so unless it's the secondary
-                # index being built. We want to populate it even for paused connectors
-                # Often paused connectors are sources that aren't updated frequently but the
-                # contents still need to be initially pulled.
-                db_session.refresh(db_connector)
-                if (
-                    db_connector.disabled
-                    and db_embedding_model.status != IndexModelStatus.FUTURE
-                ):
-                    # let the `except` block handle this
-                    raise RuntimeError("Connector was disabled mid run")
-
-                db_session.refresh(index_attempt)
-                if index_attempt.status != IndexingStatus.IN_PROGRESS:
-                    # Likely due to user manually disabling it or model swap
-                    raise RuntimeError("Index Attempt was canceled")
 
-                logger.debug(
-                    f"Indexing batch of documents: {[doc.to_short_descriptor() for doc in doc_batch]}"
-                )
+            def _record_indexed_batches(indexed_batches: list[IndexedDocBatch]) -> None:
+                nonlocal net_doc_change, chunk_count, document_count
+                for indexed_batch in indexed_batches:
+                    net_doc_change += indexed_batch.new_docs
+                    chunk_count += indexed_batch.total_chunks
+                    document_count += len(indexed_batch.documents)
+                    all_connector_doc_ids.update(
+                        doc.id for doc in indexed_batch.documents
+                    )
 
-                new_docs, total_batch_chunks = indexing_pipeline(
-                    documents=doc_batch,
-                    index_attempt_metadata=IndexAttemptMetadata(
-                        connector_id=db_connector.id,
-                        credential_id=db_credential.id,
-                    ),
-                )
-                net_doc_change += new_docs
-                chunk_count += total_batch_chunks
-                document_count += len(doc_batch)
-                all_connector_doc_ids.update(doc.id for doc in doc_batch)
-
-                # commit transaction so that the `update` below begins
-                # with a brand new transaction. Postgres uses the start
-                # of the transactions when computing `NOW()`, so if we have
-                # a long running transaction, the `time_updated` field will
-                # be inaccurate
-                db_session.commit()
-
-                # This new value is updated every batch, so UI can refresh per batch update
-                update_docs_indexed(
-                    db_session=db_session,
-                    index_attempt=index_attempt,
-                    total_docs_indexed=document_count,
-                    new_docs_indexed=net_doc_change,
-                    docs_removed_from_index=0,
-                )
+                    # commit transaction so that the `update` below begins
+                    # with a brand new transaction. Postgres uses the start
+                    # of the transactions when computing `NOW()`, so if we have
+                    # a long running transaction, the `time_updated` field will
+                    # be inaccurate
+                    db_session.commit()
+
+                    # This new value is updated every batch, so UI can refresh per batch update
+                    update_docs_indexed(
+                        db_session=db_session,
+                        index_attempt=index_attempt,
+                        total_docs_indexed=document_count,
+                        new_docs_indexed=net_doc_change,
+                        docs_removed_from_index=0,
+                    )
+
+            # The connector is read on this thread while the batches it already returned
+            # are chunked, embedded and written on the pipeline's threads
+            with build_staged_indexing_pipeline(
+                embedder=embedding_model,
+                document_index=document_index,
+                index_attempt_metadata=IndexAttemptMetadata(
+                    connector_id=db_connector.id,
+                    credential_id=db_credential.id,
+                ),
+                ignore_time_skip=index_attempt.from_beginning
+                or (db_embedding_model.status == IndexModelStatus.FUTURE),
+            ) as indexing_pipeline:
+                try:
+                    for doc_batch in doc_batch_generator:
+                        # Check if connector is disabled mid run and stop if so unless it's the secondary
+                        # index being built. We want to populate it even for paused connectors
+                        # Often paused connectors are sources that aren't updated frequently but the
+                        # contents still need to be initially pulled.
+                        db_session.refresh(db_connector)
+                        if (
+                            db_connector.disabled
+                            and db_embedding_model.status != IndexModelStatus.FUTURE
+                        ):
+                            # let the `except` block handle this
+                            raise RuntimeError("Connector was disabled mid run")
+
+                        db_session.refresh(index_attempt)
+                        if index_attempt.status != IndexingStatus.IN_PROGRESS:
+                            # Likely due to user manually disabling it or model swap
+                            raise RuntimeError("Index Attempt was canceled")
+
+                        logger.debug(
+                            f"Indexing batch of documents: {[doc.to_short_descriptor() for doc in doc_batch]}"
+                        )
+
+                        # Blocks while the pipeline is full
+                        indexing_pipeline.submit(doc_batch)
+                        _record_indexed_batches(indexing_pipeline.finished_results())
+
+                    _record_indexed_batches(indexing_pipeline.finish())
+                except Exception:
+                    # Record the batches that were fully indexed before the failure so
+                    # that the attempt's progress includes them
+                    _record_indexed_batches(
+                        indexing_pipeline.finished_results(raise_on_failure=False)
+                    )
+                    raise
 
             if is_listing_complete and not DISABLE_DOCUMENT_CLEANUP:
                 # clean up all documents from the index that have not been returned from the connector
@@ -330,12 +353,21 @@ def _run_indexing(
     )
 
 
+def _exit_on_sigterm(signum: int, frame: FrameType | None) -> None:
+    raise SystemExit(f"Indexing job received signal {signum}")
+
+
 def run_indexing_entrypoint(index_attempt_id: int, num_threads: int) -> None:
     """Entrypoint for indexing run when using dask distributed.
     Wraps the actual logic in a `try` block so that we can catch any exceptions
     and mark the attempt as failed."""
     import torch
 
+    # Cancelled jobs are terminated with SIGTERM, which by default exits without running
+    # the `finally` below and leaves the chunking pool's worker processes orphaned
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, _exit_on_sigterm)
+
     try:
         # set the indexing attempt ID so that all log messages from this process
         # will have it added as a prefix
@@ -371,3 +403,5 @@ def run_indexing_entrypoint(index_attempt_id: int, num_threads: int) -> None:
             )
     except Exception as e:
         logger.exception(f"Indexing job with ID '{index_attempt_id}' failed due to {e}")
+    finally:
+        shutdown_chunking_pool()
@@ -234,6 +234,10 @@ def get_chunks_for_qa(
             if CHUNK_SCORE_THRESHOLD and chunk.score < CHUNK_SCORE_THRESHOLD:
                 continue
 
+            # Retrieved without its content, past the top hits (see NUM_HYDRATED_CHUNKS)
+            if not chunk.content_hydrated:
+                continue
+
             # We calculate it live in case the user uses a different LLM + tokenizer
             chunk_token = check_number_of_tokens(chunk.content)
             if chunk_token > DOC_EMBEDDING_CONTEXT_SIZE + token_leeway:
@@ -1,3 +1,4 @@
+from dataclasses import replace
 from typing import List
 
 from danswer.configs.model_configs import DOC_EMBEDDING_CONTEXT_SIZE
@@ -11,10 +12,13 @@ from danswer.utils.timing import log_function_time
 
 def _extend_chunk(chunk: InferenceChunk, siblings: List[InferenceChunk], max_token: int,
                   max_length: int) -> List[InferenceChunk]:
+    """
+    Concatenates the chunk with its nearest contiguous neighbours: first to the left, then to the right.
+    Each sibling is tokenized once after truncation, the siblings passed in are not modified.
+    """
     if not siblings:
         return [chunk]
-    # concat content of chunk and siblings: begin from the current chunk, then left, and then right
-    # step1: find the position of the current chunk in the siblings
+    # step1: find the position of the current chunk in the siblings (sorted by chunk_id)
     current_chunk_pos = -1
     for ind, sibling in enumerate(siblings):
         if sibling.chunk_id == chunk.chunk_id:
@@ -24,26 +28,33 @@ def _extend_chunk(chunk: InferenceChunk, siblings: List[InferenceChunk], max_tok
     if current_chunk_pos == -1:
         return [chunk]
 
-    # step2: concatenate the content of the current chunk and the siblings
-    left_siblings = siblings[:current_chunk_pos]
-    right_siblings = siblings[current_chunk_pos + 1:]
-    extended_chunks = [chunk]
-    for sibling in left_siblings:
-        # if the length of the concatenated content is bigger than max_length, then stop
-        if len(extended_chunks) >= max_length \
-                or check_number_of_tokens(''.join([ck.content for ck in extended_chunks])) >= max_token:
-            break
-        sibling.content = truncate(content=sibling.content)
-        extended_chunks.insert(0, sibling)
-
-    for sibling in right_siblings:
-        if len(extended_chunks) >= max_length \
-                or check_number_of_tokens(''.join([ck.content for ck in extended_chunks])) >= max_token:
-            break
-        sibling.content = truncate(content=sibling.content, trunk_tail=True)
-        extended_chunks.append(sibling)
-
-    return extended_chunks
+    # step2: take the nearest siblings while the length and token budgets allow it
+    num_tokens = check_number_of_tokens(chunk.content)
+    left_chunks: List[InferenceChunk] = []
+    right_chunks: List[InferenceChunk] = []
+    for neighbors, expected_step, trunk_tail in [
+        (reversed(siblings[:current_chunk_pos]), -1, False),
+        (siblings[current_chunk_pos + 1 :], 1, True),
+    ]:
+        expected_chunk_id = chunk.chunk_id + expected_step
+        for sibling in neighbors:
+            # stop at gaps, e.g. chunks that were filtered out of the retrieval
+            if sibling.chunk_id != expected_chunk_id:
+                break
+            # if the concatenated content reaches max_length or max_token, then stop
+            if (
+                1 + len(left_chunks) + len(right_chunks) >= max_length
+                or num_tokens >= max_token
+            ):
+                break
+            content = truncate(content=sibling.content, trunk_tail=trunk_tail)
+            num_tokens += check_number_of_tokens(content)
+            (right_chunks if trunk_tail else left_chunks).append(
+                replace(sibling, content=content)
+            )
+            expected_chunk_id += expected_step
+
+    return list(reversed(left_chunks)) + [chunk] + right_chunks
 
 def truncate(content: str, trunk_tail: bool = False, max_len: int = 512):
     """
@@ -97,32 +108,28 @@ def extend_chunks(chunks: List[InferenceChunk], max_token: int = DOC_EMBEDDING_C
     if document_index is None:
         return chunks
 
-    chunk_siblings = []
-    for chunk in chunks:
-        document_id = chunk.document_id
-        # pass chunk_ind=None to fetch all chunks in the document
-        inference_chunks = document_index.id_based_retrieval(
-            document_id=document_id,
-            chunk_ind=None,
-            filters=None,
-        )
-        chunk_siblings.append(inference_chunks)
+    # fetch the neighbours of all the chunks with one batched retrieval
+    siblings_by_doc = document_index.neighbor_chunk_retrieval(
+        chunk_identifiers=[(chunk.document_id, chunk.chunk_id) for chunk in chunks],
+        window=max(max_length - 1, 0),
+    )
 
     result = []
-    previous_chunk_ids = []
-    for ind, siblings in enumerate(chunk_siblings):
+    previous_chunk_ids = set()
+    for chunk in chunks:
         # if the current chunk has been extended, then skip totally
-        chunk = chunks[ind]
-        if chunk.chunk_id in previous_chunk_ids:
+        if chunk.unique_id in previous_chunk_ids:
             continue
 
         # filter the extended_chunks, if the following chunks contains same chunk_id, then skip
-        extended_chunks = _extend_chunk(chunks[ind], siblings, max_token, max_length)
+        extended_chunks = _extend_chunk(
+            chunk, siblings_by_doc.get(chunk.document_id, []), max_token, max_length
+        )
         extended_chunks = [ck for ck in extended_chunks if ck.unique_id not in previous_chunk_ids]
         if len(extended_chunks) == 0:
-            continue;
+            continue
 
-        previous_chunk_ids.extend([ck.unique_id for ck in extended_chunks])
+        previous_chunk_ids.update([ck.unique_id for ck in extended_chunks])
 
         # concatenate the content of the current chunk and the siblings
         chunk.content = '\n'.join([ck.content for ck in extended_chunks])
@@ -40,6 +40,12 @@ class QADocsResponse(RetrievalDocs):
         return initial_dict
 
 
+# Sent after QADocsResponse when the documents were first sent in retrieval order and
+# reranking has since changed the order (see PROGRESSIVE_RERANK)
+class RerankedDocsResponse(RetrievalDocs):
+    is_final: bool
+
+
 # Second chunk of info for streaming QA
 class LLMRelevanceFilterResponse(BaseModel):
     relevant_chunk_indices: list[int]
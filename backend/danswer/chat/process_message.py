@@ -21,9 +21,12 @@ from danswer.chat.models import DanswerAnswerPiece
 from danswer.chat.models import LlmDoc
 from danswer.chat.models import LLMRelevanceFilterResponse
 from danswer.chat.models import QADocsResponse
+from danswer.chat.models import RerankedDocsResponse
 from danswer.chat.models import StreamingError
+from danswer.configs.chat_configs import ASYNC_SEARCH_PIPELINE
 from danswer.configs.chat_configs import CHAT_TARGET_CHUNK_PERCENTAGE
 from danswer.configs.chat_configs import MAX_CHUNKS_FED_TO_CHAT
+from danswer.configs.chat_configs import PROGRESSIVE_RERANK
 from danswer.configs.constants import DISABLED_GEN_AI_MSG
 from danswer.configs.constants import MessageType
 from danswer.configs.model_configs import DOC_EMBEDDING_CONTEXT_SIZE
@@ -34,6 +37,7 @@ from danswer.db.chat import get_chat_session_by_id
 from danswer.db.chat import get_db_search_doc_by_id
 from danswer.db.chat import get_doc_query_identifiers_from_model
 from danswer.db.chat import get_or_create_root_message
+from danswer.db.chat import reorder_db_search_docs
 from danswer.db.chat import translate_db_message_to_chat_message_detail
 from danswer.db.chat import translate_db_search_doc_to_server_search_doc
 from danswer.db.embedding_model import get_current_db_embedding_model
@@ -52,12 +56,15 @@ from danswer.llm.utils import get_max_input_tokens
 from danswer.llm.utils import tokenizer_trim_content
 from danswer.llm.utils import translate_history_to_basemessages
 from danswer.prompts.prompt_utils import build_doc_context_str
+from danswer.search.async_search_runner import async_backed_full_chunk_search_generator
 from danswer.search.models import OptionalSearchSetting
 from danswer.search.models import RetrievalDetails
 from danswer.search.request_preprocessing import retrieval_preprocessing
 from danswer.search.search_runner import chunks_to_search_docs
 from danswer.search.search_runner import full_chunk_search_generator
 from danswer.search.search_runner import inference_documents_from_ids
+from danswer.search.search_runner import progressive_chunk_search_generator
+from danswer.search.search_runner import RerankedChunkOrder
 from danswer.secondary_llm_flows.choose_search import check_if_need_search, SEARCH_NEED_TYPE
 from danswer.secondary_llm_flows.query_expansion import history_based_query_rephrase
 from danswer.server.query_and_chat.models import ChatMessageDetail
@@ -169,13 +176,15 @@ def stream_chat_message_objects(
 ) -> Iterator[
     StreamingError
     | QADocsResponse
+    | RerankedDocsResponse
     | LLMRelevanceFilterResponse
     | ChatMessageDetail
     | DanswerAnswerPiece
     | CitationInfo
 ]:
     """Streams in order:
-    1. [conditional] Retrieved documents if a search needs to be run
+    1. [conditional] Retrieved documents if a search needs to be run, followed by their
+       reranked orders if PROGRESSIVE_RERANK is on
     2. [conditional] LLM selected chunk indices if LLM chunk filtering is turned on
     3. [always] A set of streamed LLM tokens or an error anywhere along the line if something fails
     4. [always] Details on the final AI response message that is created
@@ -406,7 +415,18 @@ def stream_chat_message_objects(
                 db_session=db_session,
             )
 
-            documents_generator = full_chunk_search_generator(
+            # Progressive reranking only runs on the threaded pipeline and takes
+            # precedence over ASYNC_SEARCH_PIPELINE (a warning is logged at startup)
+            if PROGRESSIVE_RERANK:
+                search_generator_fn: Callable[
+                    ...,
+                    Iterator[list[InferenceChunk] | RerankedChunkOrder | list[bool]],
+                ] = progressive_chunk_search_generator
+            elif ASYNC_SEARCH_PIPELINE:
+                search_generator_fn = async_backed_full_chunk_search_generator
+            else:
+                search_generator_fn = full_chunk_search_generator
+            documents_generator = search_generator_fn(
                 search_query=retrieval_request,
                 document_index=document_index,
                 db_session=db_session,
@@ -447,8 +467,29 @@ def stream_chat_message_objects(
             )
             yield initial_response
 
+            # With progressive reranking, the final ordering arrives after the first one
+            search_result = next(documents_generator)
+            while isinstance(search_result, RerankedChunkOrder):
+                top_chunks = search_result.chunks
+                doc_id_to_rank_map = map_document_id_order(
+                    cast(list[InferenceChunk | LlmDoc], top_chunks)
+                )
+                reference_db_search_docs = reorder_db_search_docs(
+                    server_search_docs=chunks_to_search_docs(top_chunks),
+                    db_search_docs=reference_db_search_docs,
+                    db_session=db_session,
+                )
+                yield RerankedDocsResponse(
+                    top_documents=[
+                        translate_db_search_doc_to_server_search_doc(db_search_doc)
+                        for db_search_doc in reference_db_search_docs
+                    ],
+                    is_final=search_result.is_final,
+                )
+                search_result = next(documents_generator)
+
             # Get the final ordering of chunks for the LLM call
-            llm_chunk_selection = cast(list[bool], next(documents_generator))
+            llm_chunk_selection = cast(list[bool], search_result)
 
             # Yield the list of LLM selected chunks for showing the LLM selected icons in the UI
             llm_relevance_filtering_response = LLMRelevanceFilterResponse(
@@ -101,6 +101,30 @@ VESPA_TENANT_PORT = os.environ.get("VESPA_TENANT_PORT") or "19071"
 VESPA_DEPLOYMENT_ZIP = (
     os.environ.get("VESPA_DEPLOYMENT_ZIP") or "/app/danswer/vespa-app.zip"
 )
+# Builds HNSW graphs for the chunk and title embeddings so that vector search does not scan
+# every chunk. Changing this requires redeploying the Vespa schema, the graphs are then built
+# in the background from the existing embeddings
+VESPA_HNSW_INDEX = os.environ.get("VESPA_HNSW_INDEX", "").lower() == "true"
+# HNSW graph settings, higher values give better recall at the cost of memory and feed speed
+VESPA_HNSW_MAX_LINKS_PER_NODE = int(
+    os.environ.get("VESPA_HNSW_MAX_LINKS_PER_NODE") or 16
+)
+VESPA_HNSW_NEIGHBORS_TO_EXPLORE_AT_INSERT = int(
+    os.environ.get("VESPA_HNSW_NEIGHBORS_TO_EXPLORE_AT_INSERT") or 200
+)
+# Extra candidates explored per nearestNeighbor query on top of targetHits, trades query
+# latency for recall
+VESPA_HNSW_EXPLORE_ADDITIONAL_HITS = int(
+    os.environ.get("VESPA_HNSW_EXPLORE_ADDITIONAL_HITS") or 0
+)
+# Upper bound on the number of document operations (puts, updates, deletes) in flight to
+# Vespa at once. The actual number adapts to Vespa's latency and throttling below this
+VESPA_FEED_MAX_CONCURRENCY = int(os.environ.get("VESPA_FEED_MAX_CONCURRENCY") or 128)
+# Set to false to force exact nearest neighbor search even if the HNSW graphs exist, for
+# example to measure the recall of the approximate search
+VESPA_APPROXIMATE_NEAREST_NEIGHBOR = (
+    os.environ.get("VESPA_APPROXIMATE_NEAREST_NEIGHBOR", "").lower() != "false"
+)
 # Number of documents in a batch during indexing (further batching done by chunks before passing to bi-encoder)
 try:
     INDEX_BATCH_SIZE = int(os.environ.get("INDEX_BATCH_SIZE", 16))
@@ -191,6 +215,14 @@ DISABLE_INDEX_UPDATE_ON_SWAP = (
 # fairly large amount of memory in order to increase substantially, since
 # each worker loads the embedding models into memory.
 NUM_INDEXING_WORKERS = int(os.environ.get("NUM_INDEXING_WORKERS") or 1)
+# Number of worker processes used to chunk the documents of each indexing batch. The
+# pool is kept for the lifetime of the indexing process and each worker loads the
+# tokenizer once. 0 chunks the documents in the indexing process itself
+INDEXING_CHUNKER_PROCESSES = int(os.environ.get("INDEXING_CHUNKER_PROCESSES") or 0)
+# Background indexing chunks, embeds and writes consecutive document batches
+# concurrently, with at most this many batches waiting in front of each step. A larger
+# value smooths out uneven steps at the cost of memory, 0 processes one batch at a time
+INDEXING_PIPELINE_QUEUE_SIZE = int(os.environ.get("INDEXING_PIPELINE_QUEUE_SIZE") or 1)
 CHUNK_OVERLAP = 0
 # More accurate results at the expense of indexing speed and index size (stores additional 4 MINI_CHUNK vectors)
 ENABLE_MINI_CHUNK = os.environ.get("ENABLE_MINI_CHUNK", "").lower() == "true"
@@ -221,6 +253,36 @@ MODEL_SERVER_PORT = int(os.environ.get("MODEL_SERVER_PORT") or "9000")
 INDEXING_MODEL_SERVER_HOST = (
     os.environ.get("INDEXING_MODEL_SERVER_HOST") or MODEL_SERVER_HOST
 )
+# Embeddings and rerank scores are fetched from the model server in a compact binary encoding
+# (float32 or float16, optionally gzip / zstd compressed). Clients fall back to JSON when the
+# model server does not support it
+MODEL_SERVER_BINARY_PROTOCOL = (
+    os.environ.get("MODEL_SERVER_BINARY_PROTOCOL", "").lower() != "false"
+)
+MODEL_SERVER_BINARY_DTYPE = os.environ.get("MODEL_SERVER_BINARY_DTYPE") or "float32"
+MODEL_SERVER_BINARY_COMPRESSION = (
+    os.environ.get("MODEL_SERVER_BINARY_COMPRESSION") or "none"
+)
+# Connection pool shared by all calls to the model server (embedding, reranking, intent)
+MODEL_SERVER_HTTP2 = os.environ.get("MODEL_SERVER_HTTP2", "").lower() == "true"
+MODEL_SERVER_MAX_CONNECTIONS = int(os.environ.get("MODEL_SERVER_MAX_CONNECTIONS") or 64)
+MODEL_SERVER_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.environ.get("MODEL_SERVER_MAX_KEEPALIVE_CONNECTIONS") or 16
+)
+MODEL_SERVER_KEEPALIVE_EXPIRY = float(
+    os.environ.get("MODEL_SERVER_KEEPALIVE_EXPIRY") or 60
+)
+# Per endpoint timeouts (seconds) and number of retries on connection errors / 5xx responses
+# Embedding timeout is generous since the indexing flow sends large batches
+MODEL_SERVER_EMBED_TIMEOUT = float(os.environ.get("MODEL_SERVER_EMBED_TIMEOUT") or 60)
+MODEL_SERVER_EMBED_RETRIES = int(os.environ.get("MODEL_SERVER_EMBED_RETRIES") or 2)
+# Reranking falls back to the local models on failure, so keep this tight
+MODEL_SERVER_RERANK_TIMEOUT = float(
+    os.environ.get("MODEL_SERVER_RERANK_TIMEOUT") or 2.5
+)
+MODEL_SERVER_RERANK_RETRIES = int(os.environ.get("MODEL_SERVER_RERANK_RETRIES") or 0)
+MODEL_SERVER_INTENT_TIMEOUT = float(os.environ.get("MODEL_SERVER_INTENT_TIMEOUT") or 5)
+MODEL_SERVER_INTENT_RETRIES = int(os.environ.get("MODEL_SERVER_INTENT_RETRIES") or 1)
 
 
 #####
@@ -240,11 +302,32 @@ CURRENT_PROCESS_IS_AN_INDEXING_JOB = (
 LOG_ALL_MODEL_INTERACTIONS = (
     os.environ.get("LOG_ALL_MODEL_INTERACTIONS", "").lower() == "true"
 )
+# Sends query embeddings to Vespa as a hex dump of their float32 values rather than as a list
+# of decimals, which is less than half the size and cheaper for Vespa to parse
+VESPA_HEX_QUERY_TENSORS = (
+    os.environ.get("VESPA_HEX_QUERY_TENSORS", "").lower() != "false"
+)
+# Vespa search requests larger than this many bytes are sent gzip compressed, 0 to disable
+VESPA_GZIP_REQUEST_MIN_BYTES = int(
+    os.environ.get("VESPA_GZIP_REQUEST_MIN_BYTES") or 2048
+)
 # If set to `true` will enable additional logs about Vespa query performance
 # (time spent on finding the right docs + time spent fetching summaries from disk)
 LOG_VESPA_TIMING_INFORMATION = (
     os.environ.get("LOG_VESPA_TIMING_INFORMATION", "").lower() == "true"
 )
+# Sizes of the process-wide thread pools used by the parallel helpers in
+# danswer.utils.threadpool_concurrency. "io" is for index / DB / HTTP fan out, "llm" for
+# concurrent LLM calls (chunk filtering, query rephrasing) and "model" for local NLP models
+THREAD_POOL_IO_MAX_WORKERS = int(os.environ.get("THREAD_POOL_IO_MAX_WORKERS") or 32)
+THREAD_POOL_LLM_MAX_WORKERS = int(os.environ.get("THREAD_POOL_LLM_MAX_WORKERS") or 16)
+THREAD_POOL_MODEL_MAX_WORKERS = int(
+    os.environ.get("THREAD_POOL_MODEL_MAX_WORKERS") or 4
+)
+# Max number of tasks waiting for a worker (per pool) before submitters are blocked
+THREAD_POOL_MAX_QUEUED_TASKS = int(
+    os.environ.get("THREAD_POOL_MAX_QUEUED_TASKS") or 256
+)
 # Anonymous usage telemetry
 DISABLE_TELEMETRY = os.environ.get("DISABLE_TELEMETRY", "").lower() == "true"
 # notset, debug, info, warning, error, or critical
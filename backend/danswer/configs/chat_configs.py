@@ -6,6 +6,25 @@ PERSONAS_YAML = "./danswer/chat/personas.yaml"
 
 NUM_RETURNED_HITS = int(os.environ.get("NUM_RETURNED_HITS") or "50")
 NUM_RERANKED_RESULTS = int(os.environ.get("NUM_RERANKED_RESULTS") or "15")
+# Only the top NUM_HYDRATED_CHUNKS hits of a search are fetched with their full content, the
+# rest only carry what is needed to display them. Reranking and the LLM chunk filter always
+# get the content of the chunks they look at. Unset to fetch the content of every hit
+NUM_HYDRATED_CHUNKS = (
+    int(os.environ["NUM_HYDRATED_CHUNKS"])
+    if os.environ.get("NUM_HYDRATED_CHUNKS")
+    else None
+)
+# Chat streams the documents in retrieval order right away and follows up with the reranked
+# order, first once the top PROGRESSIVE_RERANK_FIRST_BATCH_SIZE chunks are scored then once all
+# of them are, instead of holding back the documents until reranking is done
+PROGRESSIVE_RERANK = os.environ.get("PROGRESSIVE_RERANK", "").lower() == "true"
+PROGRESSIVE_RERANK_FIRST_BATCH_SIZE = int(
+    os.environ.get("PROGRESSIVE_RERANK_FIRST_BATCH_SIZE") or 5
+)
+# Runs the search pipeline (retrieval, expansion, rerank, LLM chunk filter) as coroutines on a
+# shared event loop instead of fanning out to a new thread pool per search. Chat search does
+# not use it when PROGRESSIVE_RERANK is enabled, progressive reranking takes precedence
+ASYNC_SEARCH_PIPELINE = os.environ.get("ASYNC_SEARCH_PIPELINE", "").lower() == "true"
 
 MAX_TOKEN_LIMIT = int(os.environ.get("MAX_TOKEN_LIMIT") or "4096")
 
@@ -36,6 +55,12 @@ DISABLE_LLM_FILTER_EXTRACTION = (
 DISABLE_LLM_CHUNK_FILTER = (
     os.environ.get("DISABLE_LLM_CHUNK_FILTER", "").lower() == "true"
 )
+# Max number of chunks judged by a single LLM call of the chunk filter, set to 1 to make one
+# call per chunk. Batches are also capped by the number of tokens of chunk text they contain
+LLM_CHUNK_FILTER_BATCH_SIZE = int(os.environ.get("LLM_CHUNK_FILTER_BATCH_SIZE") or 10)
+LLM_CHUNK_FILTER_MAX_PROMPT_TOKENS = int(
+    os.environ.get("LLM_CHUNK_FILTER_MAX_PROMPT_TOKENS") or 4096
+)
 # Whether the LLM should be used to decide if a search would help given the chat history
 DISABLE_LLM_CHOOSE_SEARCH = (
     os.environ.get("DISABLE_LLM_CHOOSE_SEARCH", "").lower() == "true"
@@ -37,6 +37,31 @@ ASYM_QUERY_PREFIX = os.environ.get("ASYM_QUERY_PREFIX", "query: ")
 ASYM_PASSAGE_PREFIX = os.environ.get("ASYM_PASSAGE_PREFIX", "passage: ")
 # Purely an optimization, memory limitation consideration
 BATCH_SIZE_ENCODE_CHUNKS = 8
+# Repeated queries (Slack bot, chat regenerations, multilingual rephrases) reuse the query
+# embedding instead of making another round trip to the model server. Set size to 0 to disable
+QUERY_EMBEDDING_CACHE_SIZE = int(os.environ.get("QUERY_EMBEDDING_CACHE_SIZE") or 1024)
+QUERY_EMBEDDING_CACHE_TTL_SECONDS = int(
+    os.environ.get("QUERY_EMBEDDING_CACHE_TTL_SECONDS") or 60 * 60
+)
+# Indexing reuses the embeddings of chunk / mini-chunk texts that were embedded before with the
+# same model settings, so re-indexing a lightly edited document only embeds the changed chunks.
+# Stored in a local SQLite file, unset the path or set the size to 0 to disable
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH") or None
+EMBEDDING_CACHE_MAX_SIZE_MB = int(os.environ.get("EMBEDDING_CACHE_MAX_SIZE_MB") or 2048)
+# Title embeddings kept in memory by each indexing embedder across batches, 0 disables
+TITLE_EMBEDDING_CACHE_SIZE = int(os.environ.get("TITLE_EMBEDDING_CACHE_SIZE") or 4096)
+# Model server micro-batching: concurrent embed / rerank requests arriving within the wait
+# window are merged into a single forward pass of at most the max batch size (in texts or
+# query-passage pairs). Set a max batch size to 1 to disable batching for that model type
+MODEL_SERVER_BATCH_MAX_WAIT_MS = float(
+    os.environ.get("MODEL_SERVER_BATCH_MAX_WAIT_MS") or 5
+)
+MODEL_SERVER_EMBED_MAX_BATCH_SIZE = int(
+    os.environ.get("MODEL_SERVER_EMBED_MAX_BATCH_SIZE") or 64
+)
+MODEL_SERVER_RERANK_MAX_BATCH_SIZE = int(
+    os.environ.get("MODEL_SERVER_RERANK_MAX_BATCH_SIZE") or 128
+)
 # This controls the minimum number of pytorch "threads" to allocate to the embedding
 # model. If torch finds more threads on its own, this value is not used.
 MIN_THREADS_ML_MODELS = int(os.environ.get("MIN_THREADS_ML_MODELS") or 1)
@@ -53,6 +78,21 @@ CROSS_ENCODER_MODEL_ENSEMBLE = [os.environ.get("CROSS_ENCODER_MODEL")] if os.env
     "cross-encoder/ms-marco-MiniLM-L-4-v2",
     "cross-encoder/ms-marco-TinyBERT-L-2-v2",
 ]
+# Cross-encoder scores are cached per (query, chunk, chunk content, ensemble) so that chat
+# regenerations and repeated questions only score the chunks that were not seen before.
+# The cache lives in each API server / Slack bot process, it is not shared between them.
+# Size is in query-chunk pairs, set to 0 to disable
+RERANK_SCORE_CACHE_SIZE = int(os.environ.get("RERANK_SCORE_CACHE_SIZE") or 8192)
+RERANK_SCORE_CACHE_TTL_SECONDS = int(
+    os.environ.get("RERANK_SCORE_CACHE_TTL_SECONDS") or 60 * 60
+)
+# Optional second cache tier in the model server, the only one shared between processes: it
+# serves every process using the same model server (api server replicas, Slack bot), but is
+# local to each model server replica. There is no external shared backend (e.g. Redis).
+# Off by default. Size is in query-passage pairs, 0 disables
+MODEL_SERVER_RERANK_CACHE_SIZE = int(
+    os.environ.get("MODEL_SERVER_RERANK_CACHE_SIZE") or 0
+)
 # For score normalizing purposes, only way is to know the expected ranges
 CROSS_ENCODER_RANGE_MAX = 12
 CROSS_ENCODER_RANGE_MIN = -12
@@ -708,6 +708,39 @@ def create_db_search_doc(
     return db_search_doc
 
 
+def reorder_db_search_docs(
+    server_search_docs: list[ServerSearchDoc],
+    db_search_docs: list[SearchDoc],
+    db_session: Session,
+) -> list[SearchDoc]:
+    """Puts the already saved search docs in the order of `server_search_docs` (the same
+    chunks, e.g. after reranking) and updates their scores to match. Chunks that were
+    not saved are skipped."""
+    db_docs_by_chunk = {
+        (db_search_doc.document_id, db_search_doc.chunk_ind): db_search_doc
+        for db_search_doc in db_search_docs
+    }
+
+    reordered_db_search_docs = []
+    for server_search_doc in server_search_docs:
+        db_search_doc = db_docs_by_chunk.get(
+            (server_search_doc.document_id, server_search_doc.chunk_ind)
+        )
+        if db_search_doc is None:
+            logger.warning(
+                f"No saved search doc for chunk {server_search_doc.chunk_ind} of "
+                f"document {server_search_doc.document_id}, skipping it"
+            )
+            continue
+        if server_search_doc.score is not None:
+            db_search_doc.score = server_search_doc.score
+        reordered_db_search_docs.append(db_search_doc)
+
+    db_session.commit()
+
+    return reordered_db_search_docs
+
+
 def get_db_search_doc_by_id(doc_id: int, db_session: Session) -> DBSearchDoc | None:
     """There are no safety checks here like user permission etc., use with caution"""
     search_doc = db_session.query(SearchDoc).filter(SearchDoc.id == doc_id).first()
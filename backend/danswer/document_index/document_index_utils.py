@@ -23,6 +23,28 @@ def get_both_index_names(db_session: Session) -> tuple[str, str | None]:
     return model.index_name, model_new.index_name
 
 
+def merge_chunk_windows(
+    chunk_identifiers: list[tuple[str, int]], window: int
+) -> dict[str, list[tuple[int, int]]]:
+    """Maps each document to the sorted, non-overlapping inclusive chunk_id ranges that
+    cover all chunks within `window` of the given (document_id, chunk_id) pairs"""
+    chunk_ids_by_doc: dict[str, list[int]] = {}
+    for document_id, chunk_id in chunk_identifiers:
+        chunk_ids_by_doc.setdefault(document_id, []).append(chunk_id)
+
+    ranges_by_doc: dict[str, list[tuple[int, int]]] = {}
+    for document_id, chunk_ids in chunk_ids_by_doc.items():
+        ranges: list[tuple[int, int]] = []
+        for chunk_id in sorted(set(chunk_ids)):
+            start, end = max(chunk_id - window, 0), chunk_id + window
+            if ranges and start <= ranges[-1][1] + 1:
+                ranges[-1] = (ranges[-1][0], max(ranges[-1][1], end))
+            else:
+                ranges.append((start, end))
+        ranges_by_doc[document_id] = ranges
+    return ranges_by_doc
+
+
 def translate_boost_count_to_multiplier(boost: int) -> float:
     """Mapping boost integer values to a multiplier according to a sigmoid curve
     Piecewise such that at many downvotes, its 0.5x the score and with many upvotes
@@ -44,10 +66,16 @@ def get_uuid_from_chunk(
         if isinstance(chunk, InferenceChunk)
         else chunk.source_document.id
     )
+    return get_uuid_from_chunk_info(doc_str, chunk.chunk_id, mini_chunk_ind)
+
+
+def get_uuid_from_chunk_info(
+    document_id: str, chunk_id: int, mini_chunk_ind: int = 0
+) -> uuid.UUID:
+    """Same as `get_uuid_from_chunk`, for when only the chunk's position is known"""
+    doc_str = document_id
     # Web parsing URL duplicate catching
     if doc_str and doc_str[-1] == "/":
         doc_str = doc_str[:-1]
-    unique_identifier_string = "_".join(
-        [doc_str, str(chunk.chunk_id), str(mini_chunk_ind)]
-    )
+    unique_identifier_string = "_".join([doc_str, str(chunk_id), str(mini_chunk_ind)])
     return uuid.uuid5(uuid.NAMESPACE_X500, unique_identifier_string)
@@ -99,6 +99,54 @@ class IdRetrievalCapable(abc.ABC):
     ) -> list[InferenceChunk]:
         raise NotImplementedError
 
+    def neighbor_chunk_retrieval(
+        self,
+        chunk_identifiers: list[tuple[str, int]],
+        window: int,
+        filters: IndexFilters | None = None,
+    ) -> dict[str, list[InferenceChunk]]:
+        """Fetches the chunks within `window` chunks of each (document_id, chunk_id) pair.
+        Returns the chunks of each document sorted by chunk_id. Indices that can fetch
+        ranges of chunks directly should override this, by default each document is
+        fetched in full only once."""
+        chunk_ids_by_doc: dict[str, list[int]] = {}
+        for document_id, chunk_id in chunk_identifiers:
+            chunk_ids_by_doc.setdefault(document_id, []).append(chunk_id)
+
+        neighbors: dict[str, list[InferenceChunk]] = {}
+        for document_id, chunk_ids in chunk_ids_by_doc.items():
+            doc_chunks = self.id_based_retrieval(
+                document_id=document_id,
+                chunk_ind=None,
+                filters=filters,  # type: ignore
+            )
+            neighbors[document_id] = sorted(
+                [
+                    chunk
+                    for chunk in doc_chunks
+                    if any(abs(chunk.chunk_id - ind) <= window for ind in chunk_ids)
+                ],
+                key=lambda chunk: chunk.chunk_id,
+            )
+        return neighbors
+
+    def hydrate_chunks(self, chunks: list[InferenceChunk]) -> list[InferenceChunk]:
+        """Fills in the content of the chunks that were retrieved without it, in place.
+        Indices that can fetch the content of many chunks at once should override this, by
+        default each chunk is fetched on its own."""
+        for chunk in chunks:
+            if chunk.content_hydrated:
+                continue
+            full_chunks = self.id_based_retrieval(
+                document_id=chunk.document_id,
+                chunk_ind=chunk.chunk_id,
+                filters=IndexFilters(access_control_list=None),
+            )
+            if full_chunks:
+                chunk.content = full_chunks[0].content
+                chunk.content_hydrated = True
+        return chunks
+
 
 class KeywordCapable(abc.ABC):
     @abc.abstractmethod
@@ -138,7 +186,10 @@ class HybridCapable(abc.ABC):
         num_to_retrieve: int,
         offset: int = 0,
         hybrid_alpha: float | None = None,
+        include_content: bool = True,
     ) -> list[InferenceChunk]:
+        """If not `include_content`, the chunks are returned without their content
+        (`content_hydrated` False) for the caller to hydrate the ones it needs"""
         raise NotImplementedError
 
 
@@ -182,3 +233,51 @@ class VectorIndex(VectorCapable, BaseIndex, abc.ABC):
 
 class DocumentIndex(KeywordCapable, VectorCapable, HybridCapable, BaseIndex, abc.ABC):
     pass
+
+
+class AsyncRetrievalCapable(abc.ABC):
+    """Non-blocking counterparts of the retrieval methods, used by the asyncio based
+    search pipeline so that concurrent retrievals don't each pin an OS thread"""
+
+    @abc.abstractmethod
+    async def async_keyword_retrieval(
+        self,
+        query: str,
+        filters: IndexFilters,
+        time_decay_multiplier: float,
+        num_to_retrieve: int,
+        offset: int = 0,
+    ) -> list[InferenceChunk]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def async_semantic_retrieval(
+        self,
+        query: str,
+        query_embedding: list[float],
+        filters: IndexFilters,
+        time_decay_multiplier: float,
+        num_to_retrieve: int,
+        offset: int = 0,
+    ) -> list[InferenceChunk]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def async_hybrid_retrieval(
+        self,
+        query: str,
+        query_embedding: list[float],
+        filters: IndexFilters,
+        time_decay_multiplier: float,
+        num_to_retrieve: int,
+        offset: int = 0,
+        hybrid_alpha: float | None = None,
+        include_content: bool = True,
+    ) -> list[InferenceChunk]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def async_hydrate_chunks(
+        self, chunks: list[InferenceChunk]
+    ) -> list[InferenceChunk]:
+        raise NotImplementedError
@@ -0,0 +1,226 @@
+import asyncio
+import random
+import time
+import weakref
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+
+from danswer.configs.app_configs import VESPA_FEED_MAX_CONCURRENCY
+from danswer.utils.async_concurrency import run_coroutine_sync
+from danswer.utils.logger import setup_logger
+
+logger = setup_logger()
+
+# Vespa answers these when it can't keep up with the feed, the operation should be retried
+_THROTTLED_STATUS_CODES = {429, 503}
+_MIN_CONCURRENCY = 4
+_INITIAL_CONCURRENCY = 16
+# The concurrency keeps growing as long as the latency stays within this factor of the
+# lowest latency seen, beyond that Vespa is queueing the operations rather than handling
+# them in parallel
+_LATENCY_TOLERANCE = 2.0
+_MAX_RETRIES = 10
+_INITIAL_RETRY_DELAY = 0.5
+_MAX_RETRY_DELAY = 10.0
+_FEED_TIMEOUT = 60.0
+
+
+@dataclass
+class FeedOperation:
+    # One of POST (put a document), PUT (partial update) or DELETE
+    method: str
+    url: str
+    body: dict[str, Any] | None = None
+    # Identifies the operation in errors, typically the Danswer document id
+    description: str = ""
+
+
+class FeedError(RuntimeError):
+    pass
+
+
+class _AdaptiveConcurrencyLimit:
+    """Additive increase / multiplicative decrease of the number of in-flight operations.
+    Grows while the latency stays close to the best one seen and shrinks when Vespa throttles
+    or when the latency degrades."""
+
+    def __init__(self, initial: int, minimum: int, maximum: int) -> None:
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(max(minimum, min(initial, maximum)))
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+        self._min_latency = float("inf")
+        self._window_latencies: list[float] = []
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < int(self.limit))
+            self._in_flight += 1
+
+    async def release(self) -> None:
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def record_success(self, latency: float) -> None:
+        self._min_latency = min(self._min_latency, latency)
+        self._window_latencies.append(latency)
+        # Adjust once per "round" of in-flight operations
+        if len(self._window_latencies) < int(self.limit):
+            return
+
+        average_latency = sum(self._window_latencies) / len(self._window_latencies)
+        self._window_latencies.clear()
+        if average_latency <= self._min_latency * _LATENCY_TOLERANCE:
+            self.limit = min(self.maximum, self.limit + max(1.0, self.limit * 0.1))
+        else:
+            self.limit = max(self.minimum, self.limit * 0.9)
+
+    def record_throttled(self) -> None:
+        self.limit = max(self.minimum, self.limit / 2)
+        self._window_latencies.clear()
+
+
+@dataclass
+class _FeedSession:
+    http_client: httpx.AsyncClient
+    # By maximum concurrency. Kept between feeds so that each feed starts from the limit
+    # the previous ones settled on, and concurrent feeds share the limit between them
+    concurrency_limits: dict[int, _AdaptiveConcurrencyLimit]
+
+    def get_concurrency_limit(self, max_concurrency: int) -> _AdaptiveConcurrencyLimit:
+        concurrency_limit = self.concurrency_limits.get(max_concurrency)
+        if concurrency_limit is None:
+            concurrency_limit = _AdaptiveConcurrencyLimit(
+                initial=_INITIAL_CONCURRENCY,
+                minimum=_MIN_CONCURRENCY,
+                maximum=max_concurrency,
+            )
+            self.concurrency_limits[max_concurrency] = concurrency_limit
+        return concurrency_limit
+
+
+_FEED_SESSIONS: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, _FeedSession
+] = weakref.WeakKeyDictionary()
+
+
+def _get_feed_session() -> _FeedSession:
+    """Vespa serves HTTP/2 over cleartext, which httpx only speaks with prior knowledge
+    (it does not upgrade http:// connections). All the in-flight operations are then
+    multiplexed over a single connection, which is kept open for the next feed"""
+    loop = asyncio.get_running_loop()
+    session = _FEED_SESSIONS.get(loop)
+    if session is None:
+        session = _FeedSession(
+            http_client=httpx.AsyncClient(
+                http1=False,
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=VESPA_FEED_MAX_CONCURRENCY,
+                    max_keepalive_connections=VESPA_FEED_MAX_CONCURRENCY,
+                ),
+                timeout=_FEED_TIMEOUT,
+            ),
+            concurrency_limits={},
+        )
+        _FEED_SESSIONS[loop] = session
+    return session
+
+
+async def _run_operation(
+    operation: FeedOperation,
+    http_client: httpx.AsyncClient,
+    concurrency_limit: _AdaptiveConcurrencyLimit,
+) -> None:
+    retry_delay = _INITIAL_RETRY_DELAY
+    for attempt in range(_MAX_RETRIES + 1):
+        await concurrency_limit.acquire()
+        start = time.monotonic()
+        response: httpx.Response | None = None
+        try:
+            response = await http_client.request(
+                operation.method, operation.url, json=operation.body
+            )
+            failure = f"status {response.status_code}"
+        except httpx.TransportError as e:
+            failure = str(e) or type(e).__name__
+        finally:
+            await concurrency_limit.release()
+
+        if response is not None and response.status_code not in _THROTTLED_STATUS_CODES:
+            concurrency_limit.record_success(time.monotonic() - start)
+            if response.is_error:
+                raise FeedError(
+                    f"Failed to {operation.method} document '{operation.description}'. "
+                    f"Got response: '{response.text}'"
+                )
+            return
+
+        concurrency_limit.record_throttled()
+        if attempt < _MAX_RETRIES:
+            logger.debug(
+                f"Vespa feed operation for '{operation.description}' throttled "
+                f"({failure}), retrying in {retry_delay:.1f} seconds"
+            )
+            # Jitter so that throttled operations don't all come back at once
+            await asyncio.sleep(retry_delay * (0.5 + random.random()))
+            retry_delay = min(retry_delay * 2, _MAX_RETRY_DELAY)
+
+    raise FeedError(
+        f"Failed to {operation.method} document '{operation.description}' "
+        f"after {_MAX_RETRIES} retries, last failure: {failure}"
+    )
+
+
+async def feed_async(
+    operations: list[FeedOperation],
+    max_concurrency: int = VESPA_FEED_MAX_CONCURRENCY,
+) -> None:
+    """Sends the document operations to Vespa's /document/v1 API with as many of them in
+    flight as Vespa handles without its latency degrading. Stops at and raises the first
+    operation that fails after retries."""
+    if not operations:
+        return
+
+    session = _get_feed_session()
+    http_client = session.http_client
+    concurrency_limit = session.get_concurrency_limit(max_concurrency)
+    operation_iter: Iterator[FeedOperation] = iter(operations)
+
+    async def _worker() -> None:
+        # Workers share the iterator, the limit decides how many of them send at once
+        for operation in operation_iter:
+            await _run_operation(operation, http_client, concurrency_limit)
+
+    start = time.monotonic()
+    workers = [
+        asyncio.create_task(_worker())
+        for _ in range(min(max_concurrency, len(operations)))
+    ]
+    try:
+        done, _ = await asyncio.wait(workers, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            # Raises the failure, if any
+            task.result()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    logger.debug(
+        f"Fed {len(operations)} operations to Vespa in {time.monotonic() - start:.2f}s, "
+        f"final concurrency {int(concurrency_limit.limit)}"
+    )
+
+
+def feed(
+    operations: list[FeedOperation],
+    max_concurrency: int = VESPA_FEED_MAX_CONCURRENCY,
+) -> None:
+    """Blocking version of `feed_async`, runs the feed on the background event loop"""
+    run_coroutine_sync(feed_async(operations, max_concurrency))
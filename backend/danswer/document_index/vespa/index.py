@@ -1,9 +1,13 @@
+import asyncio
 import concurrent.futures
+import gzip
 import io
 import json
 import os
 import string
+import struct
 import time
+import weakref
 import zipfile
 from collections.abc import Callable
 from collections.abc import Mapping
@@ -20,6 +24,13 @@ import requests
 from retry import retry
 
 from danswer.configs.app_configs import LOG_VESPA_TIMING_INFORMATION
+from danswer.configs.app_configs import VESPA_APPROXIMATE_NEAREST_NEIGHBOR
+from danswer.configs.app_configs import VESPA_GZIP_REQUEST_MIN_BYTES
+from danswer.configs.app_configs import VESPA_HEX_QUERY_TENSORS
+from danswer.configs.app_configs import VESPA_HNSW_EXPLORE_ADDITIONAL_HITS
+from danswer.configs.app_configs import VESPA_HNSW_INDEX
+from danswer.configs.app_configs import VESPA_HNSW_MAX_LINKS_PER_NODE
+from danswer.configs.app_configs import VESPA_HNSW_NEIGHBORS_TO_EXPLORE_AT_INSERT
 from danswer.configs.app_configs import VESPA_HOST
 from danswer.configs.app_configs import VESPA_PORT
 from danswer.configs.app_configs import VESPA_TENANT_PORT
@@ -57,9 +68,14 @@ from danswer.connectors.cross_connector_utils.miscellaneous_utils import (
     get_experts_stores_representations,
 )
 from danswer.document_index.document_index_utils import get_uuid_from_chunk
+from danswer.document_index.document_index_utils import get_uuid_from_chunk_info
+from danswer.document_index.document_index_utils import merge_chunk_windows
+from danswer.document_index.interfaces import AsyncRetrievalCapable
 from danswer.document_index.interfaces import DocumentIndex
 from danswer.document_index.interfaces import DocumentInsertionRecord
 from danswer.document_index.interfaces import UpdateRequest
+from danswer.document_index.vespa.feed import feed
+from danswer.document_index.vespa.feed import FeedOperation
 from danswer.document_index.vespa.utils import remove_invalid_unicode_chars
 from danswer.indexing.models import DocMetadataAwareIndexChunk
 from danswer.indexing.models import InferenceChunk
@@ -76,6 +92,7 @@ VESPA_DIM_REPLACEMENT_PAT = "VARIABLE_DIM"
 DANSWER_CHUNK_REPLACEMENT_PAT = "DANSWER_CHUNK_NAME"
 DOCUMENT_REPLACEMENT_PAT = "DOCUMENT_REPLACEMENT"
 DATE_REPLACEMENT = "DATE_REPLACEMENT"
+EMBEDDING_INDEXING_REPLACEMENT_PAT = "EMBEDDING_INDEXING_REPLACEMENT"
 VESPA_CONFIG_SERVER_URL = f"http://{VESPA_HOST}:{VESPA_TENANT_PORT}"
 VESPA_APP_CONTAINER_URL = f"http://{VESPA_HOST}:{VESPA_PORT}"
 VESPA_APPLICATION_ENDPOINT = f"{VESPA_CONFIG_SERVER_URL}/application/v2"
@@ -85,15 +102,42 @@ DOCUMENT_ID_ENDPOINT = (
 )
 SEARCH_ENDPOINT = f"{VESPA_APP_CONTAINER_URL}/search/"
 _BATCH_SIZE = 100  # Specific to Vespa
-_NUM_THREADS = (
-    16  # since Vespa doesn't allow batching of inserts / updates, we use threads
-)
+# Threads for the existence checks and deletions, document puts and updates go through
+# the feed client instead
+_NUM_THREADS = 16
+# Documents deleted per feed, progress is reported after each of them
+_DELETE_BATCH_SIZE = 1000
 # up from 500ms for now, since we've seen quite a few timeouts
 # in the long term, we are looking to improve the performance of Vespa
 # so that we can bring this back to default
 _VESPA_TIMEOUT = "3s"
 # Specific to Vespa, needed for highlighting matching keywords / section
 CONTENT_SUMMARY = "content_summary"
+# Fields needed to build an InferenceChunk, `content_summary` is only needed on top of these
+# for match highlighting
+_INFERENCE_CHUNK_FIELDS = [
+    DOCUMENT_ID,
+    CHUNK_ID,
+    BLURB,
+    CONTENT,
+    SOURCE_TYPE,
+    SOURCE_LINKS,
+    SEMANTIC_IDENTIFIER,
+    SECTION_CONTINUATION,
+    BOOST,
+    HIDDEN,
+    DOC_UPDATED_AT,
+    PRIMARY_OWNERS,
+    SECONDARY_OWNERS,
+    METADATA,
+]
+# Document summary classes defined in vespa/app_config/schemas/danswer_chunk.sd, each
+# only reads the fields its callers need
+_IDS_ONLY_SUMMARY = "ids_only"
+# Everything needed to show a search result except the full content
+_DISPLAY_SUMMARY = "display"
+# Just the content, to hydrate the results fetched with the display summary
+_RERANK_SUMMARY = "rerank"
 
 
 @dataclass
@@ -103,27 +147,118 @@ class _VespaUpdateRequest:
     update_request: dict[str, dict]
 
 
+def _escape_yql_string(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
+
+@retry(tries=3, delay=1, backoff=2)
+def _get_existing_document_ids(
+    document_ids: list[str],
+    index_name: str,
+    http_client: httpx.Client,
+) -> set[str]:
+    """Returns which of the documents already have their first chunk in the index, with a
+    single query for the whole batch rather than fetching each chunk by its Vespa id"""
+    if not document_ids:
+        return set()
+
+    # Chunk ids ignore a trailing slash of the document id (see get_uuid_from_chunk), so
+    # a document also exists if its first chunk was indexed under the other spelling
+    ids_by_chunk_id_prefix: dict[str, set[str]] = {}
+    for document_id in document_ids:
+        prefix = document_id[:-1] if document_id.endswith("/") else document_id
+        ids_by_chunk_id_prefix.setdefault(prefix, set()).add(document_id)
+
+    document_id_clauses = " or ".join(
+        f"{DOCUMENT_ID} contains '{_escape_yql_string(spelling)}'"
+        for prefix in ids_by_chunk_id_prefix
+        for spelling in (prefix, prefix + "/")
+    )
+    params: dict[str, int | str] = {
+        "yql": f"select {DOCUMENT_ID} from {index_name} where "
+        f"{CHUNK_ID} = 0 and ({document_id_clauses})",
+        "hits": 2 * len(ids_by_chunk_id_prefix),
+        "timeout": "10s",
+        # Only need to know which documents matched, skip ranking entirely
+        "ranking.profile": "unranked",
+        "presentation.summary": _IDS_ONLY_SUMMARY,
+    }
+    response = http_client.post(SEARCH_ENDPOINT, json=params)
+    response.raise_for_status()
+
+    existing_ids: set[str] = set()
+    for hit in response.json()["root"].get("children", []):
+        hit_id = hit["fields"][DOCUMENT_ID]
+        prefix = hit_id[:-1] if hit_id.endswith("/") else hit_id
+        existing_ids.update(ids_by_chunk_id_prefix.get(prefix, set()))
+    return existing_ids
+
+
 @retry(tries=3, delay=1, backoff=2)
-def _does_document_exist(
-    doc_chunk_id: str,
+def _get_max_chunk_ids(
+    document_ids: list[str],
     index_name: str,
     http_client: httpx.Client,
-) -> bool:
-    """Returns whether the document already exists and the users/group whitelists
-    Specifically in this case, document refers to a vespa document which is equivalent to a Danswer
-    chunk. This checks for whether the chunk exists already in the index"""
-    doc_fetch_response = http_client.get(
-        f"{DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}/{doc_chunk_id}"
+) -> dict[str, int]:
+    """Highest chunk id each document has in the index, from a single grouping query for
+    the whole batch. Documents that are not in the index are left out."""
+    if not document_ids:
+        return {}
+
+    document_id_clauses = " or ".join(
+        f"{DOCUMENT_ID} contains '{_escape_yql_string(document_id)}'"
+        for document_id in document_ids
     )
-    if doc_fetch_response.status_code == 404:
-        return False
+    params: dict[str, int | str] = {
+        "yql": f"select {DOCUMENT_ID} from {index_name} where {document_id_clauses} "
+        f"limit 0 | all(group({DOCUMENT_ID}) max({len(document_ids)}) "
+        f"each(output(max({CHUNK_ID}))))",
+        "hits": 0,
+        "timeout": "10s",
+        "ranking.profile": "unranked",
+    }
+    response = http_client.post(SEARCH_ENDPOINT, json=params)
+    response.raise_for_status()
+
+    # root -> group:root -> grouplist:document_id -> one group per document
+    max_chunk_ids: dict[str, int] = {}
+    for group_root in response.json()["root"].get("children", []):
+        for group_list in group_root.get("children", []):
+            for group in group_list.get("children", []):
+                max_chunk_ids[str(group["value"])] = int(
+                    group["fields"][f"max({CHUNK_ID})"]
+                )
+    return max_chunk_ids
+
 
-    if doc_fetch_response.status_code != 200:
-        raise RuntimeError(
-            f"Unexpected fetch document by ID value from Vespa "
-            f"with error {doc_fetch_response.status_code}"
+def _get_vespa_chunk_ids_by_document_ids(
+    document_ids: list[str],
+    index_name: str,
+    http_client: httpx.Client,
+    executor: concurrent.futures.ThreadPoolExecutor,
+) -> dict[str, list[str]]:
+    """Chunk ids are derived from the document id and the chunk's position, so only the
+    highest chunk id of each document is looked up, in batches rather than one search
+    per document. A partially failed feed can leave gaps in a document's chunk ids, so
+    every id up to the highest one is returned, updating or deleting a chunk that does
+    not exist is a no-op for Vespa."""
+    max_chunk_ids: dict[str, int] = {}
+    max_chunk_id_futures = [
+        executor.submit(_get_max_chunk_ids, doc_id_batch, index_name, http_client)
+        for doc_id_batch in batch_generator(
+            list(dict.fromkeys(document_ids)), _BATCH_SIZE
         )
-    return True
+    ]
+    for future in concurrent.futures.as_completed(max_chunk_id_futures):
+        max_chunk_ids.update(future.result())
+
+    return {
+        document_id: [
+            str(get_uuid_from_chunk_info(document_id, chunk_id))
+            for chunk_id in range(max_chunk_id + 1)
+        ]
+        for document_id, max_chunk_id in max_chunk_ids.items()
+    }
 
 
 def _vespa_get_updated_at_attribute(t: datetime | None) -> int | None:
@@ -170,27 +305,15 @@ def _get_vespa_chunk_ids_by_document_id(
     return doc_chunk_ids
 
 
-@retry(tries=3, delay=1, backoff=2)
-def _delete_vespa_doc_chunks(
-    document_id: str, index_name: str, http_client: httpx.Client
-) -> None:
-    doc_chunk_ids = _get_vespa_chunk_ids_by_document_id(
-        document_id=document_id, index_name=index_name
-    )
-
-    for chunk_id in doc_chunk_ids:
-        res = http_client.delete(
-            f"{DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}/{chunk_id}"
-        )
-        res.raise_for_status()
-
-
 def _delete_vespa_docs(
     document_ids: list[str],
     index_name: str,
     http_client: httpx.Client,
     executor: concurrent.futures.ThreadPoolExecutor | None = None,
 ) -> None:
+    """Chunk ids are derived from the document id and the chunk's position, so only the
+    number of chunks of each document is looked up. The chunks are then deleted by id
+    through the feed client, which keeps Vespa from visiting the rest of the corpus"""
     external_executor = True
 
     if not executor:
@@ -198,20 +321,45 @@ def _delete_vespa_docs(
         executor = concurrent.futures.ThreadPoolExecutor(max_workers=_NUM_THREADS)
 
     try:
-        doc_deletion_future = {
-            executor.submit(
-                _delete_vespa_doc_chunks, doc_id, index_name, http_client
-            ): doc_id
-            for doc_id in document_ids
-        }
-        for future in concurrent.futures.as_completed(doc_deletion_future):
-            # Will raise exception if the deletion raised an exception
-            future.result()
-
+        chunk_ids_by_document_id = _get_vespa_chunk_ids_by_document_ids(
+            document_ids=document_ids,
+            index_name=index_name,
+            http_client=http_client,
+            executor=executor,
+        )
     finally:
         if not external_executor:
             executor.shutdown(wait=True)
 
+    document_id_endpoint = DOCUMENT_ID_ENDPOINT.format(index_name=index_name)
+    document_batches = list(
+        batch_generator(list(chunk_ids_by_document_id.items()), _DELETE_BATCH_SIZE)
+    )
+    num_chunks_deleted = 0
+    for batch_ind, document_batch in enumerate(document_batches, start=1):
+        delete_operations = [
+            FeedOperation(
+                method="DELETE",
+                url=f"{document_id_endpoint}/{chunk_id}",
+                description=document_id,
+            )
+            for document_id, chunk_ids in document_batch
+            for chunk_id in chunk_ids
+        ]
+        feed(delete_operations)
+        num_chunks_deleted += len(delete_operations)
+
+        if len(document_batches) > 1:
+            logger.info(
+                f"Deleting from {index_name}: {batch_ind}/{len(document_batches)} "
+                f"batches of documents done, {num_chunks_deleted} chunks deleted so far"
+            )
+
+    logger.debug(
+        f"Deleted {num_chunks_deleted} chunks of {len(document_ids)} documents "
+        f"from {index_name}"
+    )
+
 
 def _get_existing_documents_from_chunks(
     chunks: list[DocMetadataAwareIndexChunk],
@@ -225,22 +373,20 @@ def _get_existing_documents_from_chunks(
         external_executor = False
         executor = concurrent.futures.ThreadPoolExecutor(max_workers=_NUM_THREADS)
 
+    # Documents are looked up by their first chunk, one query per batch of documents
+    unique_document_ids = list(
+        dict.fromkeys(chunk.source_document.id for chunk in chunks)
+    )
     document_ids: set[str] = set()
     try:
-        chunk_existence_future = {
+        existence_futures = [
             executor.submit(
-                _does_document_exist,
-                str(get_uuid_from_chunk(chunk)),
-                index_name,
-                http_client,
-            ): chunk
-            for chunk in chunks
-        }
-        for future in concurrent.futures.as_completed(chunk_existence_future):
-            chunk = chunk_existence_future[future]
-            chunk_already_existed = future.result()
-            if chunk_already_existed:
-                document_ids.add(chunk.source_document.id)
+                _get_existing_document_ids, doc_id_batch, index_name, http_client
+            )
+            for doc_id_batch in batch_generator(unique_document_ids, _BATCH_SIZE)
+        ]
+        for future in concurrent.futures.as_completed(existence_futures):
+            document_ids.update(future.result())
 
     finally:
         if not external_executor:
@@ -249,22 +395,19 @@ def _get_existing_documents_from_chunks(
     return document_ids
 
 
-@retry(tries=3, delay=1, backoff=2)
-def _index_vespa_chunk(
-    chunk: DocMetadataAwareIndexChunk, index_name: str, http_client: httpx.Client
-) -> None:
-    json_header = {
-        "Content-Type": "application/json",
-    }
+def _build_vespa_chunk_feed_operation(
+    chunk: DocMetadataAwareIndexChunk, index_name: str
+) -> FeedOperation:
     document = chunk.source_document
     # No minichunk documents in vespa, minichunk vectors are stored in the chunk itself
     vespa_chunk_id = str(get_uuid_from_chunk(chunk))
 
     embeddings = chunk.embeddings
-    embeddings_name_vector_map = {"full_chunk": embeddings.full_embedding}
+    # Embeddings are kept as float32 arrays until they are serialized into the feed
+    embeddings_name_vector_map = {"full_chunk": embeddings.full_embedding.tolist()}
     if embeddings.mini_chunk_embeddings:
         for ind, m_c_embed in enumerate(embeddings.mini_chunk_embeddings):
-            embeddings_name_vector_map[f"mini_chunk_{ind}"] = m_c_embed
+            embeddings_name_vector_map[f"mini_chunk_{ind}"] = m_c_embed.tolist()
 
     title = document.get_title_for_document_index()
 
@@ -285,7 +428,9 @@ def _index_vespa_chunk(
         # Save as a list for efficient extraction as an Attribute
         METADATA_LIST: chunk.source_document.get_metadata_str_attributes(),
         EMBEDDINGS: embeddings_name_vector_map,
-        TITLE_EMBEDDING: chunk.title_embedding,
+        TITLE_EMBEDDING: chunk.title_embedding.tolist()
+        if chunk.title_embedding is not None
+        else None,
         BOOST: chunk.boost,
         DOC_UPDATED_AT: _vespa_get_updated_at_attribute(document.doc_updated_at),
         PRIMARY_OWNERS: get_experts_stores_representations(document.primary_owners),
@@ -297,43 +442,19 @@ def _index_vespa_chunk(
     }
 
     vespa_url = f"{DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}/{vespa_chunk_id}"
-    logger.debug(f'Indexing to URL "{vespa_url}"')
-    res = http_client.post(
-        vespa_url, headers=json_header, json={"fields": vespa_document_fields}
+    return FeedOperation(
+        method="POST",
+        url=vespa_url,
+        body={"fields": vespa_document_fields},
+        description=document.id,
     )
-    try:
-        res.raise_for_status()
-    except Exception as e:
-        logger.exception(
-            f"Failed to index document: '{document.id}'. Got response: '{res.text}'"
-        )
-        raise e
 
 
 def _batch_index_vespa_chunks(
     chunks: list[DocMetadataAwareIndexChunk],
     index_name: str,
-    http_client: httpx.Client,
-    executor: concurrent.futures.ThreadPoolExecutor | None = None,
 ) -> None:
-    external_executor = True
-
-    if not executor:
-        external_executor = False
-        executor = concurrent.futures.ThreadPoolExecutor(max_workers=_NUM_THREADS)
-
-    try:
-        chunk_index_future = {
-            executor.submit(_index_vespa_chunk, chunk, index_name, http_client): chunk
-            for chunk in chunks
-        }
-        for future in concurrent.futures.as_completed(chunk_index_future):
-            # Will raise exception if any indexing raised an exception
-            future.result()
-
-    finally:
-        if not external_executor:
-            executor.shutdown(wait=True)
+    feed([_build_vespa_chunk_feed_operation(chunk, index_name) for chunk in chunks])
 
 
 def _clear_and_index_vespa_chunks(
@@ -344,8 +465,6 @@ def _clear_and_index_vespa_chunks(
     with updating the associated permissions. Assumes that a document will not be split into
     multiple chunk batches calling this function multiple times, otherwise only the last set of
     chunks will be kept"""
-    existing_docs: set[str] = set()
-
     # NOTE: using `httpx` here since `requests` doesn't support HTTP2. This is beneficial for
     # indexing / updates / deletes since we have to make a large volume of requests.
     with (
@@ -354,32 +473,23 @@ def _clear_and_index_vespa_chunks(
     ):
         # Check for existing documents, existing documents need to have all of their chunks deleted
         # prior to indexing as the document size (num chunks) may have shrunk
-        first_chunks = [chunk for chunk in chunks if chunk.chunk_id == 0]
-        for chunk_batch in batch_generator(first_chunks, _BATCH_SIZE):
-            existing_docs.update(
-                _get_existing_documents_from_chunks(
-                    chunks=chunk_batch,
-                    index_name=index_name,
-                    http_client=http_client,
-                    executor=executor,
-                )
-            )
+        existing_docs = _get_existing_documents_from_chunks(
+            chunks=[chunk for chunk in chunks if chunk.chunk_id == 0],
+            index_name=index_name,
+            http_client=http_client,
+            executor=executor,
+        )
 
-        for doc_id_batch in batch_generator(existing_docs, _BATCH_SIZE):
+        if existing_docs:
             _delete_vespa_docs(
-                document_ids=doc_id_batch,
+                document_ids=list(existing_docs),
                 index_name=index_name,
                 http_client=http_client,
                 executor=executor,
             )
 
-        for chunk_batch in batch_generator(chunks, _BATCH_SIZE):
-            _batch_index_vespa_chunks(
-                chunks=chunk_batch,
-                index_name=index_name,
-                http_client=http_client,
-                executor=executor,
-            )
+    # All the chunks are fed at once, the feed client decides how many are in flight
+    _batch_index_vespa_chunks(chunks=chunks, index_name=index_name)
 
     all_doc_ids = {chunk.source_document.id for chunk in chunks}
 
@@ -488,7 +598,18 @@ def _process_dynamic_summary(
     return processed_summary
 
 
+def _remove_title_from_first_chunk(content: str, chunk_id: int) -> str:
+    """Every chunk already includes its semantic identifier for the LLM, so the title that
+    the first chunk is indexed with is dropped"""
+    if chunk_id != 0:
+        return content
+    parts = content.split(TITLE_SEPARATOR, maxsplit=1)
+    return parts[1] if len(parts) > 1 and "\n" not in parts[0] else content
+
+
 def _vespa_hit_to_inference_chunk(hit: dict[str, Any]) -> InferenceChunk:
+    """Hits fetched with the display summary come without their content, which is left
+    empty until the chunk is hydrated"""
     fields = cast(dict[str, Any], hit["fields"])
 
     # parse fields that are stored as strings, but are really json / datetime
@@ -503,7 +624,7 @@ def _vespa_hit_to_inference_chunk(hit: dict[str, Any]) -> InferenceChunk:
     match_highlights = _process_dynamic_summary(
         # fallback to regular `content` if the `content_summary` field
         # isn't present
-        dynamic_summary=hit["fields"].get(CONTENT_SUMMARY, hit["fields"][CONTENT]),
+        dynamic_summary=fields.get(CONTENT_SUMMARY, fields.get(CONTENT, "")),
     )
     semantic_identifier = fields.get(SEMANTIC_IDENTIFIER, "")
     if not semantic_identifier:
@@ -511,12 +632,12 @@ def _vespa_hit_to_inference_chunk(hit: dict[str, Any]) -> InferenceChunk:
             f"Chunk with blurb: {fields.get(BLURB, 'Unknown')[:50]}... has no Semantic Identifier"
         )
 
-    # Remove the title from the first chunk as every chunk already included
-    # its semantic identifier for LLM
-    content = fields[CONTENT]
-    if fields[CHUNK_ID] == 0:
-        parts = content.split(TITLE_SEPARATOR, maxsplit=1)
-        content = parts[1] if len(parts) > 1 and "\n" not in parts[0] else content
+    content_hydrated = CONTENT in fields
+    content = (
+        _remove_title_from_first_chunk(fields[CONTENT], fields[CHUNK_ID])
+        if content_hydrated
+        else ""
+    )
 
     # User ran into this, not sure why this could happen, error checking here
     blurb = fields.get(BLURB)
@@ -537,6 +658,7 @@ def _vespa_hit_to_inference_chunk(hit: dict[str, Any]) -> InferenceChunk:
         chunk_id=fields[CHUNK_ID],
         blurb=blurb,
         content=content,
+        content_hydrated=content_hydrated,
         source_links=source_links_dict,
         section_continuation=fields[SECTION_CONTINUATION],
         document_id=fields[DOCUMENT_ID],
@@ -554,28 +676,122 @@ def _vespa_hit_to_inference_chunk(hit: dict[str, Any]) -> InferenceChunk:
     )
 
 
-@retry(tries=3, delay=1, backoff=2)
-def _query_vespa(query_params: Mapping[str, str | int | float]) -> list[InferenceChunk]:
+def _encode_query_tensor(query_embedding: list[float]) -> str:
+    """Vespa parses a string of hex digits as the big-endian float32 cell values of a dense
+    tensor, 8 characters per value instead of ~20 for the list repr"""
+    if not VESPA_HEX_QUERY_TENSORS:
+        return str(query_embedding)
+    return struct.pack(f">{len(query_embedding)}f", *query_embedding).hex().upper()
+
+
+def _encode_query_body(
+    query_body: Mapping[str, str | int | float]
+) -> tuple[bytes, dict[str, str]]:
+    """Returns the request body and headers, the body is gzipped if it is large enough for
+    it to be worth it (queries with embeddings)"""
+    content = json.dumps(query_body).encode()
+    headers = {"Content-Type": "application/json"}
+    if 0 < VESPA_GZIP_REQUEST_MIN_BYTES <= len(content):
+        content = gzip.compress(content, compresslevel=1)
+        headers["Content-Encoding"] = "gzip"
+    return content, headers
+
+
+def _build_vespa_query_body(
+    query_params: Mapping[str, str | int | float]
+) -> dict[str, str | int | float]:
     if "query" in query_params and not cast(str, query_params["query"]).strip():
         raise ValueError("No/empty query received")
 
-    response = requests.post(
-        SEARCH_ENDPOINT,
-        json=dict(
-            **query_params,
-            **{
-                "presentation.timing": True,
-            }
-            if LOG_VESPA_TIMING_INFORMATION
-            else {},
-        ),
+    return dict(
+        **query_params,
+        **{
+            "presentation.timing": True,
+        }
+        if LOG_VESPA_TIMING_INFORMATION
+        else {},
     )
+
+
+@retry(tries=3, delay=1, backoff=2)
+def _query_vespa_json(query_params: Mapping[str, str | int | float]) -> dict[str, Any]:
+    content, headers = _encode_query_body(_build_vespa_query_body(query_params))
+    response = requests.post(SEARCH_ENDPOINT, data=content, headers=headers)
     response.raise_for_status()
+    return response.json()
 
-    response_json: dict[str, Any] = response.json()
+
+def _query_vespa(query_params: Mapping[str, str | int | float]) -> list[InferenceChunk]:
+    return _vespa_response_to_inference_chunks(
+        _query_vespa_json(query_params),
+        expect_content=query_params.get("presentation.summary") != _DISPLAY_SUMMARY,
+    )
+
+
+_ASYNC_HTTP_CLIENTS: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, httpx.AsyncClient
+] = weakref.WeakKeyDictionary()
+
+
+def _get_async_vespa_client() -> httpx.AsyncClient:
+    """httpx.AsyncClient connections are bound to the event loop they were opened on,
+    so keep one pooled client per running loop"""
+    loop = asyncio.get_running_loop()
+    client = _ASYNC_HTTP_CLIENTS.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(timeout=None)
+        _ASYNC_HTTP_CLIENTS[loop] = client
+    return client
+
+
+async def _query_vespa_json_async(
+    query_params: Mapping[str, str | int | float],
+    tries: int = 3,
+    delay: float = 1,
+    backoff: float = 2,
+) -> dict[str, Any]:
+    """Same as `_query_vespa_json` (including the retry policy) but does not block the
+    event loop"""
+    content, headers = _encode_query_body(_build_vespa_query_body(query_params))
+
+    attempt = 1
+    while True:
+        try:
+            response = await _get_async_vespa_client().post(
+                SEARCH_ENDPOINT, content=content, headers=headers
+            )
+            response.raise_for_status()
+            break
+        except httpx.HTTPError as e:
+            if attempt >= tries:
+                raise
+            logger.warning(f"{e}, retrying in {delay} seconds...")
+            await asyncio.sleep(delay)
+            attempt += 1
+            delay *= backoff
+
+    return response.json()
+
+
+async def _query_vespa_async(
+    query_params: Mapping[str, str | int | float]
+) -> list[InferenceChunk]:
+    return _vespa_response_to_inference_chunks(
+        await _query_vespa_json_async(query_params),
+        expect_content=query_params.get("presentation.summary") != _DISPLAY_SUMMARY,
+    )
+
+
+def _vespa_response_to_inference_chunks(
+    response_json: dict[str, Any], expect_content: bool = True
+) -> list[InferenceChunk]:
+    """Hits without content are dropped unless they were fetched with a summary class that
+    leaves it out on purpose"""
     if LOG_VESPA_TIMING_INFORMATION:
         logger.info("Vespa timing info: %s", response_json.get("timing"))
     hits = response_json["root"].get("children", [])
+    if not expect_content:
+        return [_vespa_hit_to_inference_chunk(hit) for hit in hits]
 
     for hit in hits:
         if hit["fields"].get(CONTENT) is None:
@@ -593,10 +809,64 @@ def _query_vespa(query_params: Mapping[str, str | int | float]) -> list[Inferenc
     return inference_chunks
 
 
+def _build_hydration_query_params(
+    chunks: list[InferenceChunk], index_name: str
+) -> list[dict[str, str | int | float]]:
+    """One query per batch of chunks, fetching only their content through the rerank
+    summary. Ranking is skipped, the hits are matched back to the chunks by their
+    ids."""
+    query_params: list[dict[str, str | int | float]] = []
+    for chunk_batch in batch_generator(chunks, _BATCH_SIZE):
+        chunk_clauses = " or ".join(
+            f"({DOCUMENT_ID} contains '{_escape_yql_string(chunk.document_id)}' "
+            f"and {CHUNK_ID} = {chunk.chunk_id})"
+            for chunk in chunk_batch
+        )
+        query_params.append(
+            {
+                "yql": f"select {DOCUMENT_ID}, {CHUNK_ID}, {CONTENT} "
+                f"from {index_name} where {chunk_clauses}",
+                "hits": len(chunk_batch),
+                "ranking.profile": "unranked",
+                "presentation.summary": _RERANK_SUMMARY,
+                "timeout": _VESPA_TIMEOUT,
+            }
+        )
+    return query_params
+
+
+def _fill_hydrated_content(
+    chunks: list[InferenceChunk], response_jsons: list[dict[str, Any]]
+) -> None:
+    contents: dict[tuple[str, int], str] = {}
+    for response_json in response_jsons:
+        for hit in response_json["root"].get("children", []):
+            fields = hit["fields"]
+            if fields.get(CONTENT) is None:
+                continue
+            chunk_key = (fields[DOCUMENT_ID], fields[CHUNK_ID])
+            contents[chunk_key] = _remove_title_from_first_chunk(
+                fields[CONTENT], fields[CHUNK_ID]
+            )
+
+    for chunk in chunks:
+        content = contents.get((chunk.document_id, chunk.chunk_id))
+        if content is None:
+            # Deleted since it was retrieved, it keeps its display fields only
+            logger.warning(
+                f"Could not hydrate chunk {chunk.chunk_id} of document {chunk.document_id}"
+            )
+            continue
+        chunk.content = content
+        chunk.content_hydrated = True
+
+
 @retry(tries=3, delay=1, backoff=2)
 def _inference_chunk_by_vespa_id(vespa_id: str, index_name: str) -> InferenceChunk:
+    # Leave out the embeddings, which make up most of the document
     res = requests.get(
-        f"{DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}/{vespa_id}"
+        f"{DOCUMENT_ID_ENDPOINT.format(index_name=index_name)}/{vespa_id}",
+        params={"fieldSet": f"{index_name}:{','.join(_INFERENCE_CHUNK_FIELDS)}"},
     )
     res.raise_for_status()
 
@@ -612,6 +882,23 @@ def in_memory_zip_from_file_bytes(file_contents: dict[str, bytes]) -> BinaryIO:
     return zip_buffer
 
 
+def _build_embedding_indexing(hnsw_index: bool) -> str:
+    """Indexing statement of the embedding fields in the schema, the embeddings stay
+    attributes either way so exact nearest neighbor search is always possible"""
+    if not hnsw_index:
+        return "indexing: attribute"
+    return (
+        "indexing: attribute | index\n"
+        "            index {\n"
+        "                hnsw {\n"
+        f"                    max-links-per-node: {VESPA_HNSW_MAX_LINKS_PER_NODE}\n"
+        "                    neighbors-to-explore-at-insert: "
+        f"{VESPA_HNSW_NEIGHBORS_TO_EXPLORE_AT_INSERT}\n"
+        "                }\n"
+        "            }"
+    )
+
+
 def _create_document_xml_lines(doc_names: list[str | None]) -> str:
     doc_lines = [
         f'<document type="{doc_name}" mode="index" />'
@@ -621,31 +908,38 @@ def _create_document_xml_lines(doc_names: list[str | None]) -> str:
     return "\n".join(doc_lines)
 
 
-class VespaIndex(DocumentIndex):
+class VespaIndex(DocumentIndex, AsyncRetrievalCapable):
     yql_base = (
-        f"select "
-        f"documentid, "
-        f"{DOCUMENT_ID}, "
-        f"{CHUNK_ID}, "
-        f"{BLURB}, "
-        f"{CONTENT}, "
-        f"{SOURCE_TYPE}, "
-        f"{SOURCE_LINKS}, "
-        f"{SEMANTIC_IDENTIFIER}, "
-        f"{SECTION_CONTINUATION}, "
-        f"{BOOST}, "
-        f"{HIDDEN}, "
-        f"{DOC_UPDATED_AT}, "
-        f"{PRIMARY_OWNERS}, "
-        f"{SECONDARY_OWNERS}, "
-        f"{METADATA}, "
-        f"{CONTENT_SUMMARY} "
+        f"select documentid, {', '.join(_INFERENCE_CHUNK_FIELDS)}, {CONTENT_SUMMARY} "
         f"from {{index_name}} where "
     )
+    # For retrievals that don't match the query text, where there is nothing to highlight
+    yql_base_without_highlights = (
+        f"select documentid, {', '.join(_INFERENCE_CHUNK_FIELDS)} "
+        f"from {{index_name}} where "
+    )
+    # Matches the fields of the display summary, the content is fetched afterwards for the
+    # top chunks only
+    yql_base_display = (
+        f"select {', '.join(field for field in _INFERENCE_CHUNK_FIELDS if field != CONTENT)}, "
+        f"{CONTENT_SUMMARY} from {{index_name}} where "
+    )
 
-    def __init__(self, index_name: str, secondary_index_name: str | None) -> None:
+    def __init__(
+        self,
+        index_name: str,
+        secondary_index_name: str | None,
+        hnsw_index: bool = VESPA_HNSW_INDEX,
+        approximate_nearest_neighbor: bool = VESPA_APPROXIMATE_NEAREST_NEIGHBOR,
+        hnsw_explore_additional_hits: int = VESPA_HNSW_EXPLORE_ADDITIONAL_HITS,
+    ) -> None:
         self.index_name = index_name
         self.secondary_index_name = secondary_index_name
+        # Whether the schema deployed by `ensure_indices_exist` has HNSW graphs
+        self.hnsw_index = hnsw_index
+        # Without HNSW graphs Vespa falls back to exact search regardless of this
+        self.approximate_nearest_neighbor = approximate_nearest_neighbor
+        self.hnsw_explore_additional_hits = hnsw_explore_additional_hits
 
     def ensure_indices_exist(
         self,
@@ -687,6 +981,10 @@ class VespaIndex(DocumentIndex):
         with open(schema_file, "r") as schema_f:
             schema_template = schema_f.read()
 
+        schema_template = schema_template.replace(
+            EMBEDDING_INDEXING_REPLACEMENT_PAT,
+            _build_embedding_indexing(self.hnsw_index),
+        )
         schema = schema_template.replace(
             DANSWER_CHUNK_REPLACEMENT_PAT, self.index_name
         ).replace(VESPA_DIM_REPLACEMENT_PAT, str(index_embedding_dim))
@@ -715,50 +1013,48 @@ class VespaIndex(DocumentIndex):
         return _clear_and_index_vespa_chunks(chunks=chunks, index_name=self.index_name)
 
     @staticmethod
-    def _apply_updates_batched(
-        updates: list[_VespaUpdateRequest],
-        batch_size: int = _BATCH_SIZE,
-    ) -> None:
-        """Runs a batch of updates in parallel via the ThreadPoolExecutor."""
+    def _apply_updates_batched(updates: list[_VespaUpdateRequest]) -> None:
+        """Sends all the partial updates through the feed client"""
+        feed(
+            [
+                FeedOperation(
+                    method="PUT",
+                    url=update.url,
+                    body=update.update_request,
+                    description=update.document_id,
+                )
+                for update in updates
+            ]
+        )
 
-        def _update_chunk(
-            update: _VespaUpdateRequest, http_client: httpx.Client
-        ) -> httpx.Response:
-            logger.debug(
-                f"Updating with request to {update.url} with body {update.update_request}"
-            )
-            return http_client.put(
-                update.url,
-                headers={"Content-Type": "application/json"},
-                json=update.update_request,
-            )
+    def update(self, update_requests: list[UpdateRequest]) -> None:
+        logger.info(f"Updating {len(update_requests)} documents in Vespa")
+        start = time.time()
 
-        # NOTE: using `httpx` here since `requests` doesn't support HTTP2. This is beneficient for
-        # indexing / updates / deletes since we have to make a large volume of requests.
+        index_names = [self.index_name]
+        if self.secondary_index_name:
+            index_names.append(self.secondary_index_name)
+
+        # The indices may hold different versions of a document, so the chunks are looked
+        # up per index
+        all_document_ids = [
+            document_id
+            for update_request in update_requests
+            for document_id in update_request.document_ids
+        ]
         with (
             concurrent.futures.ThreadPoolExecutor(max_workers=_NUM_THREADS) as executor,
             httpx.Client(http2=True) as http_client,
         ):
-            for update_batch in batch_generator(updates, batch_size):
-                future_to_document_id = {
-                    executor.submit(
-                        _update_chunk,
-                        update,
-                        http_client,
-                    ): update.document_id
-                    for update in update_batch
-                }
-                for future in concurrent.futures.as_completed(future_to_document_id):
-                    res = future.result()
-                    try:
-                        res.raise_for_status()
-                    except requests.HTTPError as e:
-                        failure_msg = f"Failed to update document: {future_to_document_id[future]}"
-                        raise requests.HTTPError(failure_msg) from e
-
-    def update(self, update_requests: list[UpdateRequest]) -> None:
-        logger.info(f"Updating {len(update_requests)} documents in Vespa")
-        start = time.time()
+            chunk_ids_by_index = {
+                index_name: _get_vespa_chunk_ids_by_document_ids(
+                    document_ids=all_document_ids,
+                    index_name=index_name,
+                    http_client=http_client,
+                    executor=executor,
+                )
+                for index_name in index_names
+            }
 
         processed_updates_requests: list[_VespaUpdateRequest] = []
         for update_request in update_requests:
@@ -784,15 +1080,9 @@ class VespaIndex(DocumentIndex):
                 logger.error("Update request received but nothing to update")
                 continue
 
-            index_names = [self.index_name]
-            if self.secondary_index_name:
-                index_names.append(self.secondary_index_name)
-
-            for index_name in index_names:
+            for index_name, chunk_ids_by_document_id in chunk_ids_by_index.items():
                 for document_id in update_request.document_ids:
-                    for doc_chunk_id in _get_vespa_chunk_ids_by_document_id(
-                        document_id=document_id, index_name=index_name
-                    ):
+                    for doc_chunk_id in chunk_ids_by_document_id.get(document_id, []):
                         processed_updates_requests.append(
                             _VespaUpdateRequest(
                                 document_id=document_id,
@@ -854,12 +1144,101 @@ class VespaIndex(DocumentIndex):
         else:
             filters_str = _build_vespa_filters(filters=filters, include_hidden=True)
             yql = (
-                VespaIndex.yql_base.format(index_name=self.index_name)
+                VespaIndex.yql_base_without_highlights.format(
+                    index_name=self.index_name
+                )
                 + filters_str
                 + f"({DOCUMENT_ID} contains '{document_id}' and {CHUNK_ID} contains '{chunk_ind}')"
             )
         return _query_vespa({"yql": yql})
 
+    def neighbor_chunk_retrieval(
+        self,
+        chunk_identifiers: list[tuple[str, int]],
+        window: int,
+        filters: IndexFilters | None = None,
+    ) -> dict[str, list[InferenceChunk]]:
+        filters_str = (
+            _build_vespa_filters(filters=filters, include_hidden=True)
+            if filters is not None
+            else ""
+        )
+
+        # Group the chunk ranges so that each query returns at most a batch of hits
+        range_clauses: list[str] = []
+        range_groups: list[tuple[list[str], int]] = []
+        group_hits = 0
+        for document_id, chunk_ranges in merge_chunk_windows(
+            chunk_identifiers, window
+        ).items():
+            escaped_document_id = _escape_yql_string(document_id)
+            for start, end in chunk_ranges:
+                num_hits = end - start + 1
+                if range_clauses and group_hits + num_hits > _BATCH_SIZE:
+                    range_groups.append((range_clauses, group_hits))
+                    range_clauses, group_hits = [], 0
+                range_clauses.append(
+                    f"({DOCUMENT_ID} contains '{escaped_document_id}' and "
+                    f"{CHUNK_ID} >= {start} and {CHUNK_ID} <= {end})"
+                )
+                group_hits += num_hits
+        if range_clauses:
+            range_groups.append((range_clauses, group_hits))
+
+        yql_base = (
+            VespaIndex.yql_base_without_highlights.format(index_name=self.index_name)
+            + filters_str
+        )
+        functions_with_args: list[tuple[Callable, tuple]] = [
+            (
+                _query_vespa,
+                ({"yql": yql_base + f"({' or '.join(clauses)})", "hits": hits},),
+            )
+            for clauses, hits in range_groups
+        ]
+        neighbors: dict[str, list[InferenceChunk]] = {}
+        for chunks in run_functions_tuples_in_parallel(functions_with_args):
+            for chunk in chunks:
+                neighbors.setdefault(chunk.document_id, []).append(chunk)
+
+        for doc_chunks in neighbors.values():
+            doc_chunks.sort(key=lambda chunk: chunk.chunk_id)
+        return neighbors
+
+    def hydrate_chunks(self, chunks: list[InferenceChunk]) -> list[InferenceChunk]:
+        to_hydrate = [chunk for chunk in chunks if not chunk.content_hydrated]
+        if not to_hydrate:
+            return chunks
+
+        functions_with_args: list[tuple[Callable, tuple]] = [
+            (_query_vespa_json, (query_params,))
+            for query_params in _build_hydration_query_params(
+                to_hydrate, self.index_name
+            )
+        ]
+        _fill_hydrated_content(
+            to_hydrate, run_functions_tuples_in_parallel(functions_with_args)
+        )
+        return chunks
+
+    async def async_hydrate_chunks(
+        self, chunks: list[InferenceChunk]
+    ) -> list[InferenceChunk]:
+        to_hydrate = [chunk for chunk in chunks if not chunk.content_hydrated]
+        if not to_hydrate:
+            return chunks
+
+        response_jsons = await asyncio.gather(
+            *(
+                _query_vespa_json_async(query_params)
+                for query_params in _build_hydration_query_params(
+                    to_hydrate, self.index_name
+                )
+            )
+        )
+        _fill_hydrated_content(to_hydrate, list(response_jsons))
+        return chunks
+
     def keyword_retrieval(
         self,
         query: str,
@@ -869,6 +1248,46 @@ class VespaIndex(DocumentIndex):
         offset: int = 0,
         edit_keyword_query: bool = EDIT_KEYWORD_QUERY,
     ) -> list[InferenceChunk]:
+        return _query_vespa(
+            self._build_keyword_query_params(
+                query=query,
+                filters=filters,
+                time_decay_multiplier=time_decay_multiplier,
+                num_to_retrieve=num_to_retrieve,
+                offset=offset,
+                edit_keyword_query=edit_keyword_query,
+            )
+        )
+
+    async def async_keyword_retrieval(
+        self,
+        query: str,
+        filters: IndexFilters,
+        time_decay_multiplier: float,
+        num_to_retrieve: int = NUM_RETURNED_HITS,
+        offset: int = 0,
+        edit_keyword_query: bool = EDIT_KEYWORD_QUERY,
+    ) -> list[InferenceChunk]:
+        return await _query_vespa_async(
+            self._build_keyword_query_params(
+                query=query,
+                filters=filters,
+                time_decay_multiplier=time_decay_multiplier,
+                num_to_retrieve=num_to_retrieve,
+                offset=offset,
+                edit_keyword_query=edit_keyword_query,
+            )
+        )
+
+    def _build_keyword_query_params(
+        self,
+        query: str,
+        filters: IndexFilters,
+        time_decay_multiplier: float,
+        num_to_retrieve: int,
+        offset: int,
+        edit_keyword_query: bool,
+    ) -> dict[str, str | int | float]:
         # IMPORTANT: THIS FUNCTION IS NOT UP TO DATE, DOES NOT WORK CORRECTLY
         vespa_where_clauses = _build_vespa_filters(filters)
         yql = (
@@ -883,7 +1302,7 @@ class VespaIndex(DocumentIndex):
 
         final_query = query_processing(query) if edit_keyword_query else query
 
-        params: dict[str, str | int] = {
+        return {
             "yql": yql,
             "query": final_query,
             "input.query(decay_factor)": str(DOC_TIME_DECAY * time_decay_multiplier),
@@ -893,8 +1312,6 @@ class VespaIndex(DocumentIndex):
             "timeout": _VESPA_TIMEOUT,
         }
 
-        return _query_vespa(params)
-
     def semantic_retrieval(
         self,
         query: str,
@@ -906,12 +1323,68 @@ class VespaIndex(DocumentIndex):
         distance_cutoff: float | None = SEARCH_DISTANCE_CUTOFF,
         edit_keyword_query: bool = EDIT_KEYWORD_QUERY,
     ) -> list[InferenceChunk]:
+        return _query_vespa(
+            self._build_semantic_query_params(
+                query=query,
+                query_embedding=query_embedding,
+                filters=filters,
+                time_decay_multiplier=time_decay_multiplier,
+                num_to_retrieve=num_to_retrieve,
+                offset=offset,
+                edit_keyword_query=edit_keyword_query,
+            )
+        )
+
+    async def async_semantic_retrieval(
+        self,
+        query: str,
+        query_embedding: list[float],
+        filters: IndexFilters,
+        time_decay_multiplier: float,
+        num_to_retrieve: int = NUM_RETURNED_HITS,
+        offset: int = 0,
+        distance_cutoff: float | None = SEARCH_DISTANCE_CUTOFF,
+        edit_keyword_query: bool = EDIT_KEYWORD_QUERY,
+    ) -> list[InferenceChunk]:
+        return await _query_vespa_async(
+            self._build_semantic_query_params(
+                query=query,
+                query_embedding=query_embedding,
+                filters=filters,
+                time_decay_multiplier=time_decay_multiplier,
+                num_to_retrieve=num_to_retrieve,
+                offset=offset,
+                edit_keyword_query=edit_keyword_query,
+            )
+        )
+
+    def _nearest_neighbor_annotation(self, target_hits: int) -> str:
+        if not self.approximate_nearest_neighbor:
+            return f"{{targetHits: {target_hits}, approximate: false}}"
+        if self.hnsw_explore_additional_hits > 0:
+            return (
+                f"{{targetHits: {target_hits}, "
+                f"hnsw.exploreAdditionalHits: {self.hnsw_explore_additional_hits}}}"
+            )
+        return f"{{targetHits: {target_hits}}}"
+
+    def _build_semantic_query_params(
+        self,
+        query: str,
+        query_embedding: list[float],
+        filters: IndexFilters,
+        time_decay_multiplier: float,
+        num_to_retrieve: int,
+        offset: int,
+        edit_keyword_query: bool,
+    ) -> dict[str, str | int | float]:
         # IMPORTANT: THIS FUNCTION IS NOT UP TO DATE, DOES NOT WORK CORRECTLY
         vespa_where_clauses = _build_vespa_filters(filters)
         yql = (
             VespaIndex.yql_base.format(index_name=self.index_name)
             + vespa_where_clauses
-            + f"(({{targetHits: {10 * num_to_retrieve}}}nearestNeighbor(embeddings, query_embedding)) "
+            + f"(({self._nearest_neighbor_annotation(10 * num_to_retrieve)}"
+            + "nearestNeighbor(embeddings, query_embedding)) "
             # `({defaultIndex: "content_summary"}userInput(@query))` section is
             # needed for highlighting while the N-gram highlighting is broken /
             # not working as desired
@@ -924,10 +1397,10 @@ class VespaIndex(DocumentIndex):
             else query
         )
 
-        params: dict[str, str | int] = {
+        return {
             "yql": yql,
             "query": query_keywords,  # Needed for highlighting
-            "input.query(query_embedding)": str(query_embedding),
+            "input.query(query_embedding)": _encode_query_tensor(query_embedding),
             "input.query(decay_factor)": str(DOC_TIME_DECAY * time_decay_multiplier),
             "hits": num_to_retrieve,
             "offset": offset,
@@ -935,8 +1408,6 @@ class VespaIndex(DocumentIndex):
             "timeout": _VESPA_TIMEOUT,
         }
 
-        return _query_vespa(params)
-
     def hybrid_retrieval(
         self,
         query: str,
@@ -946,18 +1417,82 @@ class VespaIndex(DocumentIndex):
         num_to_retrieve: int,
         offset: int = 0,
         hybrid_alpha: float | None = HYBRID_ALPHA,
+        include_content: bool = True,
         title_content_ratio: float | None = TITLE_CONTENT_RATIO,
         distance_cutoff: float | None = SEARCH_DISTANCE_CUTOFF,
         edit_keyword_query: bool = EDIT_KEYWORD_QUERY,
     ) -> list[InferenceChunk]:
+        return _query_vespa(
+            self._build_hybrid_query_params(
+                query=query,
+                query_embedding=query_embedding,
+                filters=filters,
+                time_decay_multiplier=time_decay_multiplier,
+                num_to_retrieve=num_to_retrieve,
+                offset=offset,
+                hybrid_alpha=hybrid_alpha,
+                title_content_ratio=title_content_ratio,
+                edit_keyword_query=edit_keyword_query,
+                include_content=include_content,
+            )
+        )
+
+    async def async_hybrid_retrieval(
+        self,
+        query: str,
+        query_embedding: list[float],
+        filters: IndexFilters,
+        time_decay_multiplier: float,
+        num_to_retrieve: int,
+        offset: int = 0,
+        hybrid_alpha: float | None = HYBRID_ALPHA,
+        include_content: bool = True,
+        title_content_ratio: float | None = TITLE_CONTENT_RATIO,
+        distance_cutoff: float | None = SEARCH_DISTANCE_CUTOFF,
+        edit_keyword_query: bool = EDIT_KEYWORD_QUERY,
+    ) -> list[InferenceChunk]:
+        return await _query_vespa_async(
+            self._build_hybrid_query_params(
+                query=query,
+                query_embedding=query_embedding,
+                filters=filters,
+                time_decay_multiplier=time_decay_multiplier,
+                num_to_retrieve=num_to_retrieve,
+                offset=offset,
+                hybrid_alpha=hybrid_alpha,
+                title_content_ratio=title_content_ratio,
+                edit_keyword_query=edit_keyword_query,
+                include_content=include_content,
+            )
+        )
+
+    def _build_hybrid_query_params(
+        self,
+        query: str,
+        query_embedding: list[float],
+        filters: IndexFilters,
+        time_decay_multiplier: float,
+        num_to_retrieve: int,
+        offset: int,
+        hybrid_alpha: float | None,
+        title_content_ratio: float | None,
+        edit_keyword_query: bool,
+        include_content: bool = True,
+    ) -> dict[str, str | int | float]:
         vespa_where_clauses = _build_vespa_filters(filters)
         # Needs to be at least as much as the value set in Vespa schema config
         target_hits = max(10 * num_to_retrieve, 1000)
+        nearest_neighbor_annotation = self._nearest_neighbor_annotation(target_hits)
+        # If the caller only hydrates the chunks that need their content, the hits leave
+        # it out
+        yql_base = (
+            VespaIndex.yql_base if include_content else VespaIndex.yql_base_display
+        )
         yql = (
-            VespaIndex.yql_base.format(index_name=self.index_name)
+            yql_base.format(index_name=self.index_name)
             + vespa_where_clauses
-            + f"(({{targetHits: {target_hits}}}nearestNeighbor(embeddings, query_embedding)) "
-            + f"or ({{targetHits: {target_hits}}}nearestNeighbor(title_embedding, query_embedding)) "
+            + f"(({nearest_neighbor_annotation}nearestNeighbor(embeddings, query_embedding)) "
+            + f"or ({nearest_neighbor_annotation}nearestNeighbor(title_embedding, query_embedding)) "
             + 'or ({grammar: "weakAnd"}userInput(@query)) '
             + f'or ({{defaultIndex: "{CONTENT_SUMMARY}"}}userInput(@query)))'
         )
@@ -968,10 +1503,10 @@ class VespaIndex(DocumentIndex):
             else query
         )
 
-        params: dict[str, str | int | float] = {
+        return {
             "yql": yql,
             "query": query_keywords,
-            "input.query(query_embedding)": str(query_embedding),
+            "input.query(query_embedding)": _encode_query_tensor(query_embedding),
             "input.query(decay_factor)": str(DOC_TIME_DECAY * time_decay_multiplier),
             "input.query(alpha)": hybrid_alpha
             if hybrid_alpha is not None
@@ -983,10 +1518,9 @@ class VespaIndex(DocumentIndex):
             "offset": offset,
             "ranking.profile": f"hybrid_search{len(query_embedding)}",
             "timeout": _VESPA_TIMEOUT,
+            **({} if include_content else {"presentation.summary": _DISPLAY_SUMMARY}),
         }
 
-        return _query_vespa(params)
-
     def admin_retrieval(
         self,
         query: str,
@@ -1,9 +1,17 @@
 import abc
+import multiprocessing
+import os
+import threading
 from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from itertools import chain
 from typing import TYPE_CHECKING
 
 from danswer.configs.app_configs import BLURB_SIZE
 from danswer.configs.app_configs import CHUNK_OVERLAP
+from danswer.configs.app_configs import INDEXING_CHUNKER_PROCESSES
 from danswer.configs.app_configs import MINI_CHUNK_SIZE
 from danswer.configs.constants import SECTION_SEPARATOR
 from danswer.configs.constants import TITLE_SEPARATOR
@@ -11,26 +19,73 @@ from danswer.configs.model_configs import DOC_EMBEDDING_CONTEXT_SIZE
 from danswer.connectors.models import Document
 from danswer.indexing.models import DocAwareChunk
 from danswer.search.search_nlp_models import get_default_tokenizer
+from danswer.utils.logger import setup_logger
 from danswer.utils.text_processing import shared_precompare_cleanup
 
 
 if TYPE_CHECKING:
+    from llama_index.text_splitter import SentenceSplitter  # type:ignore
     from transformers import AutoTokenizer  # type:ignore
 
+logger = setup_logger()
+
 ChunkFunc = Callable[[Document], list[DocAwareChunk]]
 
+# Generous estimate of the characters per token, used to size the first prefix of the
+# text that is split when extracting a blurb
+_BLURB_PREFIX_CHARS_PER_TOKEN = 8
+# Number of blurbs the first prefix is sized for so that it usually yields 3+ pieces
+_BLURB_PREFIX_PIECES = 4
 
-def extract_blurb(text: str, blurb_size: int) -> str:
+
+@lru_cache(maxsize=16)
+def get_sentence_splitter(
+    tokenize: Callable[[str], list], chunk_size: int, chunk_overlap: int = 0
+) -> "SentenceSplitter":
+    """Constructing a SentenceSplitter is expensive so one is shared per tokenizer, size
+    and overlap. Splitting text does not modify the splitter so it is safe to share"""
     from llama_index.text_splitter import SentenceSplitter
 
-    token_count_func = get_default_tokenizer().tokenize
-    blurb_splitter = SentenceSplitter(
-        tokenizer=token_count_func, chunk_size=blurb_size, chunk_overlap=0
+    return SentenceSplitter(
+        tokenizer=tokenize, chunk_size=chunk_size, chunk_overlap=chunk_overlap
     )
 
+
+def extract_blurb(text: str, blurb_size: int) -> str:
+    """Returns the first piece of splitting the text into blurb_size token pieces. Only a
+    prefix of long text is split, it is grown until it yields at least 3 pieces so that the
+    first piece does not depend on where the prefix was cut off. Text within twice the
+    prefix length is split whole, in a single pass"""
+    blurb_splitter = get_sentence_splitter(get_default_tokenizer().tokenize, blurb_size)
+
+    prefix_len = blurb_size * _BLURB_PREFIX_CHARS_PER_TOKEN * _BLURB_PREFIX_PIECES
+    while 2 * prefix_len < len(text):
+        pieces = blurb_splitter.split_text(text[:prefix_len])
+        if len(pieces) >= 3:
+            return pieces[0]
+        prefix_len *= 2
+
     return blurb_splitter.split_text(text)[0]
 
 
+def tokenizer_splits_on_whitespace(tokenizer: "AutoTokenizer") -> bool:
+    """Whether the tokenizer drops the whitespace between words before tokenizing them
+    (e.g. WordPiece), in which case the token count of two texts joined by whitespace is
+    the sum of their token counts. BPE and SentencePiece tokenizers instead fold the
+    whitespace into the following token"""
+    backend_tokenizer = getattr(tokenizer, "backend_tokenizer", None)
+    pre_tokenizer = getattr(backend_tokenizer, "pre_tokenizer", None)
+    if pre_tokenizer is None:
+        return False
+
+    probe = "a b" + SECTION_SEPARATOR + "c"
+    return not any(
+        char.isspace()
+        for _, (start, end) in pre_tokenizer.pre_tokenize_str(probe)
+        for char in probe[start:end]
+    )
+
+
 def chunk_large_section(
     section_text: str,
     section_link_text: str,
@@ -41,12 +96,10 @@ def chunk_large_section(
     chunk_overlap: int = CHUNK_OVERLAP,
     blurb_size: int = BLURB_SIZE,
 ) -> list[DocAwareChunk]:
-    from llama_index.text_splitter import SentenceSplitter
-
     blurb = extract_blurb(section_text, blurb_size)
 
-    sentence_aware_splitter = SentenceSplitter(
-        tokenizer=tokenizer.tokenize, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+    sentence_aware_splitter = get_sentence_splitter(
+        tokenizer.tokenize, chunk_size, chunk_overlap
     )
 
     split_texts = sentence_aware_splitter.split_text(section_text)
@@ -75,16 +128,26 @@ def chunk_document(
     title_prefix = title.replace("\n", " ") + TITLE_SEPARATOR if title else ""
     tokenizer = get_default_tokenizer()
 
+    # Running token count and cleaned text length of chunk_text. Tracking these as
+    # sections are added, rather than re-processing chunk_text for every section, keeps
+    # chunking linear in the number of sections. The cleanup works character by character
+    # so its length is additive across SECTION_SEPARATOR. The token count is only additive
+    # for tokenizers that pre-split on whitespace (e.g. WordPiece, as used by the default
+    # embedding models), with any other tokenizer each candidate chunk is re-tokenized.
+    additive_tok_lengths = tokenizer_splits_on_whitespace(tokenizer)
+    separator_tok_length = len(tokenizer.tokenize(SECTION_SEPARATOR))
+    separator_offset_len = len(shared_precompare_cleanup(SECTION_SEPARATOR))
+
     chunks: list[DocAwareChunk] = []
     link_offsets: dict[int, str] = {}
     chunk_text = ""
+    current_tok_length = 0
+    curr_offset_len = 0
     for ind, section in enumerate(document.sections):
         section_text = title_prefix + section.text if ind == 0 else section.text
         section_link_text = section.link or ""
 
         section_tok_length = len(tokenizer.tokenize(section_text))
-        current_tok_length = len(tokenizer.tokenize(chunk_text))
-        curr_offset_len = len(shared_precompare_cleanup(chunk_text))
 
         # Large sections are considered self-contained/unique therefore they start a new chunk and are not concatenated
         # at the end by other sections
@@ -102,6 +165,8 @@ def chunk_document(
                 )
                 link_offsets = {}
                 chunk_text = ""
+                current_tok_length = 0
+                curr_offset_len = 0
 
             large_section_chunks = chunk_large_section(
                 section_text=section_text,
@@ -117,16 +182,30 @@ def chunk_document(
             continue
 
         # In the case where the whole section is shorter than a chunk, either adding to chunk or start a new one
-        if (
-            current_tok_length
-            + len(tokenizer.tokenize(SECTION_SEPARATOR))
-            + section_tok_length
-            <= chunk_tok_size
-        ):
-            chunk_text += (
-                SECTION_SEPARATOR + section_text if chunk_text else section_text
+        if additive_tok_lengths:
+            candidate_tok_length = (
+                current_tok_length + separator_tok_length + section_tok_length
             )
+        else:
+            candidate_tok_length = len(
+                tokenizer.tokenize(
+                    chunk_text + SECTION_SEPARATOR + section_text
+                    if chunk_text
+                    else section_text
+                )
+            )
+        if candidate_tok_length <= chunk_tok_size:
             link_offsets[curr_offset_len] = section_link_text
+            if chunk_text:
+                chunk_text += SECTION_SEPARATOR + section_text
+                current_tok_length = candidate_tok_length
+                curr_offset_len += separator_offset_len + len(
+                    shared_precompare_cleanup(section_text)
+                )
+            else:
+                chunk_text = section_text
+                current_tok_length = section_tok_length
+                curr_offset_len = len(shared_precompare_cleanup(section_text))
         else:
             chunks.append(
                 DocAwareChunk(
@@ -140,6 +219,8 @@ def chunk_document(
             )
             link_offsets = {0: section_link_text}
             chunk_text = section_text
+            current_tok_length = section_tok_length
+            curr_offset_len = len(shared_precompare_cleanup(section_text))
 
     # Once we hit the end, if we're still in the process of building a chunk, add what we have
     # NOTE: if it's just whitespace, ignore it.
@@ -160,11 +241,8 @@ def chunk_document(
 def split_chunk_text_into_mini_chunks(
     chunk_text: str, mini_chunk_size: int = MINI_CHUNK_SIZE
 ) -> list[str]:
-    from llama_index.text_splitter import SentenceSplitter
-
-    token_count_func = get_default_tokenizer().tokenize
-    sentence_aware_splitter = SentenceSplitter(
-        tokenizer=token_count_func, chunk_size=mini_chunk_size, chunk_overlap=0
+    sentence_aware_splitter = get_sentence_splitter(
+        get_default_tokenizer().tokenize, mini_chunk_size
     )
 
     return sentence_aware_splitter.split_text(chunk_text)
@@ -175,7 +253,86 @@ class Chunker:
     def chunk(self, document: Document) -> list[DocAwareChunk]:
         raise NotImplementedError
 
+    def chunk_batch(self, documents: list[Document]) -> list[DocAwareChunk]:
+        """Chunks of all of the documents, in the order of the documents"""
+        return list(chain(*[self.chunk(document=document) for document in documents]))
+
 
 class DefaultChunker(Chunker):
     def chunk(self, document: Document) -> list[DocAwareChunk]:
         return chunk_document(document)
+
+
+_CHUNKING_POOL: ProcessPoolExecutor | None = None
+_CHUNKING_POOL_PID: int | None = None
+_CHUNKING_POOL_LOCK = threading.Lock()
+# The pool is started from a pipeline thread while other threads (the event loop, the
+# shared executors, the other pipeline steps) may hold locks, which a forked worker would
+# inherit in their locked state. Workers are instead forked from a clean server process
+_CHUNKING_POOL_START_METHOD = "forkserver"
+
+
+def _init_chunking_worker() -> None:
+    # Load the tokenizer once per worker rather than with the first document
+    get_default_tokenizer()
+
+
+def _get_chunking_pool(num_processes: int) -> ProcessPoolExecutor:
+    """Returns the process-wide chunking pool, the pool does not survive a fork so it is
+    rebuilt if called from a different process than the one that created it"""
+    global _CHUNKING_POOL, _CHUNKING_POOL_PID
+    pid = os.getpid()
+    with _CHUNKING_POOL_LOCK:
+        if _CHUNKING_POOL is None or _CHUNKING_POOL_PID != pid:
+            _CHUNKING_POOL = ProcessPoolExecutor(
+                max_workers=num_processes,
+                mp_context=multiprocessing.get_context(_CHUNKING_POOL_START_METHOD),
+                initializer=_init_chunking_worker,
+            )
+            _CHUNKING_POOL_PID = pid
+        return _CHUNKING_POOL
+
+
+def shutdown_chunking_pool(wait: bool = True) -> None:
+    """Stops the worker processes of this process's chunking pool, if it started one. The
+    next batch chunked with a ProcessPoolChunker starts a new pool"""
+    global _CHUNKING_POOL
+    with _CHUNKING_POOL_LOCK:
+        pool = _CHUNKING_POOL if _CHUNKING_POOL_PID == os.getpid() else None
+        _CHUNKING_POOL = None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+class ProcessPoolChunker(DefaultChunker):
+    """Chunks the documents of a batch concurrently on a pool of worker processes that is
+    reused across batches. Chunk ids only depend on the document being chunked, so the
+    chunks are the same as when chunking serially"""
+
+    def __init__(self, num_processes: int = INDEXING_CHUNKER_PROCESSES) -> None:
+        self.num_processes = num_processes
+
+    def chunk_batch(self, documents: list[Document]) -> list[DocAwareChunk]:
+        # Daemonic processes (e.g. Dask workers) are not allowed to start child processes
+        if (
+            self.num_processes <= 0
+            or len(documents) <= 1
+            or multiprocessing.current_process().daemon
+        ):
+            return super().chunk_batch(documents)
+
+        pool = _get_chunking_pool(self.num_processes)
+        try:
+            chunks_per_doc = list(pool.map(chunk_document, documents))
+        except BrokenProcessPool:
+            logger.exception("Chunking pool broke, chunking the batch serially")
+            shutdown_chunking_pool(wait=False)
+            return super().chunk_batch(documents)
+
+        chunks: list[DocAwareChunk] = []
+        for document, doc_chunks in zip(documents, chunks_per_doc):
+            for chunk in doc_chunks:
+                # Point back to the original rather than the copy made by pickling
+                chunk.source_document = document
+            chunks.extend(doc_chunks)
+        return chunks
@@ -1,5 +1,6 @@
 from abc import ABC
 from abc import abstractmethod
+from typing import cast
 
 from sqlalchemy.orm import Session
 
@@ -8,17 +9,21 @@ from danswer.configs.app_configs import INDEXING_MODEL_SERVER_HOST
 from danswer.configs.app_configs import MODEL_SERVER_PORT
 from danswer.configs.model_configs import BATCH_SIZE_ENCODE_CHUNKS
 from danswer.configs.model_configs import DOC_EMBEDDING_CONTEXT_SIZE
+from danswer.configs.model_configs import TITLE_EMBEDDING_CACHE_SIZE
 from danswer.db.embedding_model import get_current_db_embedding_model
 from danswer.db.embedding_model import get_secondary_db_embedding_model
 from danswer.db.models import EmbeddingModel as DbEmbeddingModel
 from danswer.db.models import IndexModelStatus
 from danswer.indexing.chunker import split_chunk_text_into_mini_chunks
+from danswer.indexing.embedding_cache import get_embedding_cache
 from danswer.indexing.models import ChunkEmbedding
 from danswer.indexing.models import DocAwareChunk
+from danswer.indexing.models import Embedding
 from danswer.indexing.models import IndexChunk
 from danswer.search.search_nlp_models import EmbeddingModel
 from danswer.search.search_nlp_models import EmbedTextType
 from danswer.utils.logger import setup_logger
+from danswer.utils.lru_cache import LRUTTLCache
 
 
 logger = setup_logger()
@@ -62,6 +67,69 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
             server_host=INDEXING_MODEL_SERVER_HOST,
             server_port=MODEL_SERVER_PORT,
         )
+        # Documents of a connector often share titles (e.g. a Confluence page split into
+        # several documents), so title embeddings are kept across batches
+        self.title_embedding_cache: LRUTTLCache[str, Embedding] = LRUTTLCache(
+            max_size=TITLE_EMBEDDING_CACHE_SIZE
+        )
+        self.embedding_cache = get_embedding_cache(
+            model_name=model_name, normalize=normalize, passage_prefix=passage_prefix
+        )
+
+    def _embed_texts(self, texts: list[str], batch_size: int) -> list[Embedding]:
+        text_batches = [
+            texts[i : i + batch_size] for i in range(0, len(texts), batch_size)
+        ]
+
+        embeddings: list[Embedding] = []
+        len_text_batches = len(text_batches)
+        for idx, text_batch in enumerate(text_batches, start=1):
+            logger.debug(f"Embedding text batch {idx} of {len_text_batches}")
+            # Normalize embeddings is only configured via model_configs.py, be sure to use right value for the set loss
+            # The rows are views of one float32 matrix per batch
+            embeddings.extend(
+                self.embedding_model.encode_array(
+                    text_batch, text_type=EmbedTextType.PASSAGE
+                )
+            )
+
+            # Replace line above with the line below for easy debugging of indexing flow, skipping the actual model
+            # embeddings.extend(numpy.zeros((len(text_batch), 384), dtype=numpy.float32))
+        return embeddings
+
+    def _embed_texts_with_cache(
+        self, texts: list[str], batch_size: int
+    ) -> list[Embedding]:
+        """Only the texts which are not in the embedding cache are sent to the model"""
+        if self.embedding_cache is None:
+            return self._embed_texts(texts, batch_size)
+
+        cache_keys = self.embedding_cache.build_keys(texts)
+        embeddings = self.embedding_cache.get_many(cache_keys)
+
+        # The same text may show up more than once (e.g. boilerplate mini-chunks)
+        miss_key_to_inds: dict[bytes, list[int]] = {}
+        for ind, embedding in enumerate(embeddings):
+            if embedding is None:
+                miss_key_to_inds.setdefault(cache_keys[ind], []).append(ind)
+
+        if miss_key_to_inds:
+            miss_keys = list(miss_key_to_inds)
+            miss_embeddings = self._embed_texts(
+                [texts[miss_key_to_inds[key][0]] for key in miss_keys], batch_size
+            )
+            for key, embedding in zip(miss_keys, miss_embeddings):
+                for ind in miss_key_to_inds[key]:
+                    embeddings[ind] = embedding
+            self.embedding_cache.put_many(miss_keys, miss_embeddings)
+
+        cache_stats = self.embedding_cache.stats()
+        logger.info(
+            f"Embedding cache: {len(texts) - sum(len(inds) for inds in miss_key_to_inds.values())} "
+            f"of {len(texts)} texts reused, hit ratio so far {cache_stats.hit_ratio:.2f}, "
+            f"size {cache_stats.size / (1024 * 1024):.1f} MB"
+        )
+        return cast(list[Embedding], embeddings)
 
     def embed_chunks(
         self,
@@ -69,8 +137,6 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
         batch_size: int = BATCH_SIZE_ENCODE_CHUNKS,
         enable_mini_chunk: bool = ENABLE_MINI_CHUNK,
     ) -> list[IndexChunk]:
-        # Cache the Title embeddings to only have to do it once
-        title_embed_dict: dict[str, list[float]] = {}
         embedded_chunks: list[IndexChunk] = []
 
         chunk_texts = []
@@ -85,22 +151,28 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
             chunk_texts.extend(mini_chunk_texts)
             chunk_mini_chunks_count[chunk_ind] = 1 + len(mini_chunk_texts)
 
-        text_batches = [
-            chunk_texts[i : i + batch_size]
-            for i in range(0, len(chunk_texts), batch_size)
-        ]
-
-        embeddings: list[list[float]] = []
-        len_text_batches = len(text_batches)
-        for idx, text_batch in enumerate(text_batches, start=1):
-            logger.debug(f"Embedding text batch {idx} of {len_text_batches}")
-            # Normalize embeddings is only configured via model_configs.py, be sure to use right value for the set loss
-            embeddings.extend(
-                self.embedding_model.encode(text_batch, text_type=EmbedTextType.PASSAGE)
-            )
-
-            # Replace line above with the line below for easy debugging of indexing flow, skipping the actual model
-            # embeddings.extend([[0.0] * 384 for _ in range(len(text_batch))])
+        # Titles are embedded in the same requests as the content, titles seen in earlier
+        # batches of this embedder are reused
+        title_embed_dict: dict[str, Embedding] = {}
+        new_titles: list[str] = []
+        new_title_set: set[str] = set()
+        for chunk in chunks:
+            title = chunk.source_document.get_title_for_document_index()
+            if not title or title in title_embed_dict or title in new_title_set:
+                continue
+            cached_title_embedding = self.title_embedding_cache.get(title)
+            if cached_title_embedding is not None:
+                title_embed_dict[title] = cached_title_embedding
+            else:
+                new_titles.append(title)
+                new_title_set.add(title)
+
+        embeddings = self._embed_texts_with_cache(chunk_texts + new_titles, batch_size)
+        for title, new_title_embedding in zip(
+            new_titles, embeddings[len(chunk_texts) :]
+        ):
+            title_embed_dict[title] = new_title_embedding
+            self.title_embedding_cache.put(title, new_title_embedding)
 
         embedding_ind_start = 0
         for chunk_ind, chunk in enumerate(chunks):
@@ -111,16 +183,7 @@ class DefaultIndexingEmbedder(IndexingEmbedder):
 
             title = chunk.source_document.get_title_for_document_index()
 
-            title_embedding = None
-            if title:
-                if title in title_embed_dict:
-                    # Using cached value for speedup
-                    title_embedding = title_embed_dict[title]
-                else:
-                    title_embedding = self.embedding_model.encode(
-                        [title], text_type=EmbedTextType.PASSAGE
-                    )[0]
-                    title_embed_dict[title] = title_embedding
+            title_embedding = title_embed_dict[title] if title else None
 
             new_embedded_chunk = IndexChunk(
                 **{k: getattr(chunk, k) for k in chunk.__dataclass_fields__},
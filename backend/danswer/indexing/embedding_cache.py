@@ -0,0 +1,189 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy
+
+from danswer.configs.model_configs import EMBEDDING_CACHE_MAX_SIZE_MB
+from danswer.configs.model_configs import EMBEDDING_CACHE_PATH
+from danswer.indexing.models import Embedding
+from danswer.utils.logger import setup_logger
+from danswer.utils.lru_cache import CacheStats
+
+logger = setup_logger()
+
+# SQLite limits the number of parameters of a statement
+_MAX_KEYS_PER_QUERY = 500
+# Once over the max size, evict down to this fraction of it so that eviction does not
+# run on every write
+_EVICT_TO_FRACTION = 0.9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    key BLOB PRIMARY KEY,
+    embedding BLOB NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+CREATE TABLE IF NOT EXISTS cache_size (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    total_bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_size (id, total_bytes) VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS embeddings_insert AFTER INSERT ON embeddings BEGIN
+    UPDATE cache_size SET total_bytes = total_bytes + LENGTH(NEW.embedding) WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS embeddings_delete AFTER DELETE ON embeddings BEGIN
+    UPDATE cache_size SET total_bytes = total_bytes - LENGTH(OLD.embedding) WHERE id = 0;
+END;
+"""
+
+
+class EmbeddingCache:
+    """Persistent cache of passage embeddings stored in a local SQLite file, so that
+    re-indexing a document only embeds the chunks whose text changed. The key is a hash of
+    everything that determines the embedding: the model, whether it is normalized, the
+    passage prefix and the text. The file may be shared by several indexing processes,
+    the least recently used embeddings are evicted once it grows over `max_size_bytes`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        model_name: str,
+        normalize: bool,
+        passage_prefix: str | None,
+        max_size_bytes: int = EMBEDDING_CACHE_MAX_SIZE_MB * 1024 * 1024,
+    ) -> None:
+        self.path = path
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._key_prefix = f"{model_name}\0{normalize}\0{passage_prefix or ''}\0"
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+        self._connection_pid: int | None = None
+
+    def _get_connection(self) -> sqlite3.Connection:
+        # SQLite connections must not be used across a fork
+        pid = os.getpid()
+        if self._connection is None or self._connection_pid != pid:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            # WAL lets other indexing processes read while one is writing
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+            self._connection_pid = pid
+        return self._connection
+
+    def build_keys(self, texts: list[str]) -> list[bytes]:
+        return [
+            hashlib.sha256((self._key_prefix + text).encode()).digest()
+            for text in texts
+        ]
+
+    def get_many(self, keys: list[bytes]) -> list[Embedding | None]:
+        found: dict[bytes, Embedding] = {}
+        with self._lock:
+            connection = self._get_connection()
+            unique_keys = list(set(keys))
+            for ind in range(0, len(unique_keys), _MAX_KEYS_PER_QUERY):
+                key_batch = unique_keys[ind : ind + _MAX_KEYS_PER_QUERY]
+                placeholders = ",".join("?" * len(key_batch))
+                rows = connection.execute(
+                    f"SELECT key, embedding FROM embeddings WHERE key IN ({placeholders})",
+                    key_batch,
+                ).fetchall()
+                for key, embedding_bytes in rows:
+                    found[key] = numpy.frombuffer(embedding_bytes, dtype="<f4")
+
+            if found:
+                found_keys = list(found)
+                now = time.time()
+                with connection:
+                    for ind in range(0, len(found_keys), _MAX_KEYS_PER_QUERY):
+                        key_batch = found_keys[ind : ind + _MAX_KEYS_PER_QUERY]
+                        placeholders = ",".join("?" * len(key_batch))
+                        connection.execute(
+                            f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})",
+                            [now, *key_batch],
+                        )
+
+            results = [found.get(key) for key in keys]
+            num_hits = sum(result is not None for result in results)
+            self.hits += num_hits
+            self.misses += len(keys) - num_hits
+            return results
+
+    def put_many(self, keys: list[bytes], embeddings: list[Embedding]) -> None:
+        now = time.time()
+        with self._lock:
+            connection = self._get_connection()
+            with connection:
+                # Embeddings are stored as float32, which is what the models produce
+                connection.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, embedding, last_used) VALUES (?, ?, ?)",
+                    [
+                        (key, numpy.asarray(embedding, dtype="<f4").tobytes(), now)
+                        for key, embedding in zip(keys, embeddings)
+                    ],
+                )
+                self._evict_if_needed(connection)
+
+    def _evict_if_needed(self, connection: sqlite3.Connection) -> None:
+        total_bytes = self._total_bytes(connection)
+        if total_bytes <= self.max_size_bytes:
+            return
+
+        target_bytes = self.max_size_bytes * _EVICT_TO_FRACTION
+        num_entries = connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[
+            0
+        ]
+        avg_entry_bytes = total_bytes / max(num_entries, 1)
+        num_to_evict = int((total_bytes - target_bytes) / max(avg_entry_bytes, 1)) + 1
+        connection.execute(
+            "DELETE FROM embeddings WHERE key IN "
+            "(SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (num_to_evict,),
+        )
+        self.evictions += num_to_evict
+        logger.info(
+            f"Evicted {num_to_evict} embeddings from the embedding cache at {self.path}"
+        )
+
+    @staticmethod
+    def _total_bytes(connection: sqlite3.Connection) -> int:
+        return connection.execute(
+            "SELECT total_bytes FROM cache_size WHERE id = 0"
+        ).fetchone()[0]
+
+    def stats(self) -> CacheStats:
+        """Sizes are in bytes"""
+        with self._lock:
+            return CacheStats(
+                size=self._total_bytes(self._get_connection()),
+                max_size=self.max_size_bytes,
+                hits=self.hits,
+                misses=self.misses,
+            )
+
+
+def get_embedding_cache(
+    model_name: str, normalize: bool, passage_prefix: str | None
+) -> EmbeddingCache | None:
+    """None if no cache path is configured"""
+    if not EMBEDDING_CACHE_PATH or EMBEDDING_CACHE_MAX_SIZE_MB <= 0:
+        return None
+    return EmbeddingCache(
+        path=EMBEDDING_CACHE_PATH,
+        model_name=model_name,
+        normalize=normalize,
+        passage_prefix=passage_prefix,
+    )
@@ -1,10 +1,12 @@
+from dataclasses import dataclass
 from functools import partial
-from itertools import chain
 from typing import Protocol
 
 from sqlalchemy.orm import Session
 
 from danswer.access.access import get_access_for_documents
+from danswer.configs.app_configs import INDEXING_CHUNKER_PROCESSES
+from danswer.configs.app_configs import INDEXING_PIPELINE_QUEUE_SIZE
 from danswer.configs.constants import DEFAULT_BOOST
 from danswer.connectors.cross_connector_utils.miscellaneous_utils import (
     get_experts_stores_representations,
@@ -24,10 +26,13 @@ from danswer.document_index.interfaces import DocumentIndex
 from danswer.document_index.interfaces import DocumentMetadata
 from danswer.indexing.chunker import Chunker
 from danswer.indexing.chunker import DefaultChunker
+from danswer.indexing.chunker import ProcessPoolChunker
 from danswer.indexing.embedder import IndexingEmbedder
 from danswer.indexing.models import DocAwareChunk
 from danswer.indexing.models import DocMetadataAwareIndexChunk
+from danswer.indexing.models import IndexChunk
 from danswer.utils.logger import setup_logger
+from danswer.utils.staged_pipeline import StagedPipeline
 from danswer.utils.timing import log_function_time
 
 logger = setup_logger()
@@ -117,26 +122,43 @@ def get_doc_ids_to_update(
     return updatable_docs
 
 
+@dataclass
+class ChunkedDocBatch:
+    documents: list[Document]
+    # The documents which are new or changed, only these are chunked and indexed
+    updatable_docs: list[Document]
+    chunks: list[DocAwareChunk]
+
+
+@dataclass
+class EmbeddedDocBatch:
+    documents: list[Document]
+    updatable_docs: list[Document]
+    chunks_with_embeddings: list[IndexChunk]
+
+
+@dataclass
+class IndexedDocBatch:
+    documents: list[Document]
+    new_docs: int
+    total_chunks: int
+
+
 @log_function_time()
-def index_doc_batch(
+def chunk_doc_batch(
+    documents: list[Document],
     *,
     chunker: Chunker,
-    embedder: IndexingEmbedder,
-    document_index: DocumentIndex,
-    documents: list[Document],
     index_attempt_metadata: IndexAttemptMetadata,
     ignore_time_skip: bool = False,
-) -> tuple[int, int]:
-    """Takes different pieces of the indexing pipeline and applies it to a batch of documents
-    Note that the documents should already be batched at this point so that it does not inflate the
-    memory requirements"""
+) -> ChunkedDocBatch:
+    """First stage of indexing a batch: records the documents in Postgres and chunks the
+    ones which need to be (re)indexed"""
     with Session(get_sqlalchemy_engine()) as db_session:
-        document_ids = [document.id for document in documents]
         db_docs = get_documents_by_ids(
-            document_ids=document_ids,
+            document_ids=[document.id for document in documents],
             db_session=db_session,
         )
-        id_to_db_doc_map = {doc.id: doc for doc in db_docs}
 
         # Skip indexing docs that don't have a newer updated at
         # Shortcuts the time-consuming flow on connector index retries
@@ -145,7 +167,6 @@ def index_doc_batch(
             if not ignore_time_skip
             else documents
         )
-        updatable_ids = [doc.id for doc in updatable_docs]
 
         # Create records in the source of truth about these documents,
         # does not include doc_updated_at which is also used to indicate a successful update
@@ -155,21 +176,50 @@ def index_doc_batch(
             db_session=db_session,
         )
 
-        logger.debug("Starting chunking")
+    logger.debug("Starting chunking")
+
+    # The first chunk additionally contains the Title of the Document
+    chunks: list[DocAwareChunk] = chunker.chunk_batch(documents=updatable_docs)
+
+    return ChunkedDocBatch(
+        documents=documents, updatable_docs=updatable_docs, chunks=chunks
+    )
 
-        # The first chunk additionally contains the Title of the Document
-        chunks: list[DocAwareChunk] = list(
-            chain(*[chunker.chunk(document=document) for document in updatable_docs])
-        )
 
-        logger.debug("Starting embedding")
-        chunks_with_embeddings = embedder.embed_chunks(chunks=chunks)
+@log_function_time()
+def embed_doc_batch(
+    chunked_batch: ChunkedDocBatch, *, embedder: IndexingEmbedder
+) -> EmbeddedDocBatch:
+    logger.debug("Starting embedding")
+    return EmbeddedDocBatch(
+        documents=chunked_batch.documents,
+        updatable_docs=chunked_batch.updatable_docs,
+        chunks_with_embeddings=embedder.embed_chunks(chunks=chunked_batch.chunks),
+    )
 
+
+@log_function_time()
+def write_doc_batch(
+    embedded_batch: EmbeddedDocBatch, *, document_index: DocumentIndex
+) -> IndexedDocBatch:
+    """Last stage of indexing a batch: writes the chunks to the document index and marks
+    the successfully indexed documents as up to date in Postgres"""
+    updatable_docs = embedded_batch.updatable_docs
+    updatable_ids = [doc.id for doc in updatable_docs]
+    chunks_with_embeddings = embedded_batch.chunks_with_embeddings
+    with Session(get_sqlalchemy_engine()) as db_session:
         # Acquires a lock on the documents so that no other process can modify them
         # NOTE: don't need to acquire till here, since this is when the actual race condition
         # with Vespa can occur.
         prepare_to_modify_documents(db_session=db_session, document_ids=updatable_ids)
 
+        id_to_db_doc_map = {
+            doc.id: doc
+            for doc in get_documents_by_ids(
+                document_ids=updatable_ids, db_session=db_session
+            )
+        }
+
         # Attach the latest status from Postgres (source of truth for access) to each
         # chunk. This access status will be attached to each chunk in the document index
         # TODO: attach document sets to the chunk based on the status of Postgres as well
@@ -199,7 +249,7 @@ def index_doc_batch(
         ]
 
         logger.debug(
-            f"Indexing the following chunks: {[chunk.to_short_descriptor() for chunk in chunks]}"
+            f"Indexing the following chunks: {[chunk.to_short_descriptor() for chunk in chunks_with_embeddings]}"
         )
         # A document will not be spread across different batches, so all the
         # documents with chunks in this set, are fully represented by the chunks
@@ -222,11 +272,37 @@ def index_doc_batch(
             ids_to_new_updated_at_and_md5=ids_to_new_updated_at_and_md5, db_session=db_session
         )
 
-    return len([r for r in insertion_records if r.already_existed is False]), len(
-        chunks
+    return IndexedDocBatch(
+        documents=embedded_batch.documents,
+        new_docs=len([r for r in insertion_records if r.already_existed is False]),
+        total_chunks=len(chunks_with_embeddings),
     )
 
 
+@log_function_time()
+def index_doc_batch(
+    *,
+    chunker: Chunker,
+    embedder: IndexingEmbedder,
+    document_index: DocumentIndex,
+    documents: list[Document],
+    index_attempt_metadata: IndexAttemptMetadata,
+    ignore_time_skip: bool = False,
+) -> tuple[int, int]:
+    """Takes different pieces of the indexing pipeline and applies it to a batch of documents
+    Note that the documents should already be batched at this point so that it does not inflate the
+    memory requirements"""
+    chunked_batch = chunk_doc_batch(
+        documents,
+        chunker=chunker,
+        index_attempt_metadata=index_attempt_metadata,
+        ignore_time_skip=ignore_time_skip,
+    )
+    embedded_batch = embed_doc_batch(chunked_batch, embedder=embedder)
+    indexed_batch = write_doc_batch(embedded_batch, document_index=document_index)
+    return indexed_batch.new_docs, indexed_batch.total_chunks
+
+
 def build_indexing_pipeline(
     *,
     embedder: IndexingEmbedder,
@@ -235,7 +311,9 @@ def build_indexing_pipeline(
     ignore_time_skip: bool = False,
 ) -> IndexingPipelineProtocol:
     """Builds a pipline which takes in a list (batch) of docs and indexes them."""
-    chunker = chunker or DefaultChunker()
+    chunker = chunker or (
+        ProcessPoolChunker() if INDEXING_CHUNKER_PROCESSES > 0 else DefaultChunker()
+    )
 
     return partial(
         index_doc_batch,
@@ -244,3 +322,38 @@ def build_indexing_pipeline(
         document_index=document_index,
         ignore_time_skip=ignore_time_skip,
     )
+
+
+def build_staged_indexing_pipeline(
+    *,
+    embedder: IndexingEmbedder,
+    document_index: DocumentIndex,
+    index_attempt_metadata: IndexAttemptMetadata,
+    chunker: Chunker | None = None,
+    ignore_time_skip: bool = False,
+    queue_size: int = INDEXING_PIPELINE_QUEUE_SIZE,
+) -> StagedPipeline[list[Document], IndexedDocBatch]:
+    """Same steps as `build_indexing_pipeline`, but the chunking, embedding and writing of
+    consecutive batches overlap: each runs on its own thread with a queue of at most
+    `queue_size` batches in front of it. Batches are written in the order they were
+    submitted. Must be used as a context manager."""
+    chunker = chunker or (
+        ProcessPoolChunker() if INDEXING_CHUNKER_PROCESSES > 0 else DefaultChunker()
+    )
+
+    return StagedPipeline(
+        stages=[
+            (
+                "chunk",
+                partial(
+                    chunk_doc_batch,
+                    chunker=chunker,
+                    index_attempt_metadata=index_attempt_metadata,
+                    ignore_time_skip=ignore_time_skip,
+                ),
+            ),
+            ("embed", partial(embed_doc_batch, embedder=embedder)),
+            ("write", partial(write_doc_batch, document_index=document_index)),
+        ],
+        queue_size=queue_size,
+    )
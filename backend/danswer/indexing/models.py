@@ -2,6 +2,7 @@ from dataclasses import dataclass
 from dataclasses import fields
 from datetime import datetime
 
+import numpy
 from pydantic import BaseModel
 
 from danswer.access.models import DocumentAccess
@@ -13,7 +14,8 @@ from danswer.utils.logger import setup_logger
 logger = setup_logger()
 
 
-Embedding = list[float]
+# float32 vector, converted to the index's format only when the chunk is written
+Embedding = numpy.ndarray
 
 
 @dataclass
@@ -106,6 +108,9 @@ class InferenceChunk(BaseChunk):
     updated_at: datetime | None
     primary_owners: list[str] | None = None
     secondary_owners: list[str] | None = None
+    # False if only the fields needed to display the chunk were fetched from the index, the
+    # `content` is then empty until the chunk is hydrated (see `hydrate_chunks`)
+    content_hydrated: bool = True
 
     @property
     def unique_id(self) -> str:
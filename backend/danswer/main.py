@@ -34,7 +34,9 @@ from danswer.configs.app_configs import OAUTH_CLIENT_ID
 from danswer.configs.app_configs import OAUTH_CLIENT_SECRET
 from danswer.configs.app_configs import SECRET
 from danswer.configs.app_configs import WEB_DOMAIN
+from danswer.configs.chat_configs import ASYNC_SEARCH_PIPELINE
 from danswer.configs.chat_configs import MULTILINGUAL_QUERY_EXPANSION
+from danswer.configs.chat_configs import PROGRESSIVE_RERANK
 from danswer.configs.constants import AuthType
 from danswer.configs.model_configs import ENABLE_RERANKING_REAL_TIME_FLOW
 from danswer.configs.model_configs import GEN_AI_API_ENDPOINT
@@ -168,6 +170,12 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
             f"Using multilingual flow with languages: {MULTILINGUAL_QUERY_EXPANSION}"
         )
 
+    if PROGRESSIVE_RERANK and ASYNC_SEARCH_PIPELINE:
+        logger.warning(
+            "Both PROGRESSIVE_RERANK and ASYNC_SEARCH_PIPELINE are enabled, chat search "
+            "uses progressive reranking on the threaded pipeline"
+        )
+
     with Session(engine) as db_session:
         db_embedding_model = get_current_db_embedding_model(db_session)
         secondary_db_embedding_model = get_secondary_db_embedding_model(db_session)
@@ -24,6 +24,7 @@ from danswer.chat.models import LLMMetricsContainer
 from danswer.chat.models import LLMRelevanceFilterResponse
 from danswer.chat.models import QADocsResponse
 from danswer.chat.models import StreamingError
+from danswer.configs.chat_configs import ASYNC_SEARCH_PIPELINE
 from danswer.configs.chat_configs import MAX_CHUNKS_FED_TO_CHAT
 from danswer.configs.chat_configs import QA_TIMEOUT
 from danswer.configs.constants import MessageType
@@ -52,6 +53,7 @@ from danswer.one_shot_answer.qa_utils import combine_message_thread
 from danswer.prompts.direct_qa_prompts import CITATIONS_PROMPT
 from danswer.prompts.prompt_utils import build_complete_context_str
 from danswer.prompts.prompt_utils import build_task_prompt_reminders
+from danswer.search.async_search_runner import async_backed_full_chunk_search_generator
 from danswer.search.models import RerankMetricsContainer
 from danswer.search.models import RetrievalMetricsContainer
 from danswer.search.models import SavedSearchDoc
@@ -257,7 +259,12 @@ def stream_answer_objects(
         bypass_acl=bypass_acl,
     )
 
-    documents_generator = full_chunk_search_generator(
+    search_generator_fn = (
+        async_backed_full_chunk_search_generator
+        if ASYNC_SEARCH_PIPELINE
+        else full_chunk_search_generator
+    )
+    documents_generator = search_generator_fn(
         search_query=retrieval_request,
         document_index=document_index,
         db_session=db_session,
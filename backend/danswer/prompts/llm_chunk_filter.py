@@ -25,6 +25,41 @@ Respond with EXACTLY AND ONLY: "{USEFUL_PAT}" or "{NONUSEFUL_PAT}"
 """.strip()
 
 
+# Scores several chunks with a single LLM call, see llm_batch_eval_chunks
+USEFUL_SECTIONS_KEY = "useful_sections"
+BATCH_CHUNK_FILTER_PROMPT = f"""
+Determine which of the numbered reference sections are USEFUL for answering the user query.
+It is NOT enough for a section to be related to the query, \
+it must contain information that is USEFUL for answering the query.
+If a section contains ANY useful information, that is good enough, \
+it does not need to fully answer the every part of the user query.
+Judge each section on its own, independently of the other sections.
+
+Reference Sections:
+{{numbered_sections}}
+
+User Query:
+```
+{{user_query}}
+```
+
+ALWAYS answer with ONLY a json with the key "{USEFUL_SECTIONS_KEY}". \
+The value for "{USEFUL_SECTIONS_KEY}" must be a list of the numbers of the useful sections \
+(an empty list if none of them are useful).
+
+Sample Response:
+{{{{"{USEFUL_SECTIONS_KEY}": [1, 3]}}}}
+""".strip()
+BATCH_CHUNK_FILTER_SECTION = """
+Section {section_num}:
+```
+{chunk_text}
+```
+""".strip()
+
+
 # Use the following for easy viewing of prompts
 if __name__ == "__main__":
     print(CHUNK_FILTER_PROMPT)
+    print("\n\n")
+    print(BATCH_CHUNK_FILTER_PROMPT)
@@ -0,0 +1,357 @@
+import asyncio
+from collections.abc import AsyncGenerator
+from collections.abc import Callable
+from collections.abc import Iterator
+from functools import partial
+from typing import cast
+
+from sqlalchemy.orm import Session
+
+from danswer.configs.chat_configs import HYBRID_ALPHA
+from danswer.configs.chat_configs import MULTILINGUAL_QUERY_EXPANSION
+from danswer.document_index.interfaces import AsyncRetrievalCapable
+from danswer.document_index.interfaces import DocumentIndex
+from danswer.indexing.models import InferenceChunk
+from danswer.search.models import RerankMetricsContainer
+from danswer.search.models import RetrievalMetricsContainer
+from danswer.search.models import SearchQuery
+from danswer.search.models import SearchType
+from danswer.search.search_nlp_models import CrossEncoderEnsembleModel
+from danswer.search.search_nlp_models import EmbeddingModel
+from danswer.search.search_nlp_models import EmbedTextType
+from danswer.search.search_runner import combine_retrieval_results
+from danswer.search.search_runner import filter_chunks
+from danswer.search.search_runner import get_expanded_queries
+from danswer.search.search_runner import get_num_hydrated
+from danswer.search.search_runner import get_query_embedding_model
+from danswer.search.search_runner import get_rerank_window
+from danswer.search.search_runner import is_expandable_query
+from danswer.search.search_runner import log_top_chunk_links
+from danswer.search.search_runner import report_retrieval_results
+from danswer.search.search_runner import rerank_chunks
+from danswer.search.search_runner import should_apply_llm_based_relevance_filter
+from danswer.search.search_runner import should_rerank
+from danswer.utils.async_concurrency import iterate_async_generator_sync
+from danswer.utils.async_concurrency import run_coroutine_sync
+from danswer.utils.logger import setup_logger
+from danswer.utils.threadpool_concurrency import ExecutorPoolName
+from danswer.utils.threadpool_concurrency import run_in_pool_async
+
+logger = setup_logger()
+
+
+async def async_doc_index_retrieval(
+    query: SearchQuery,
+    document_index: DocumentIndex,
+    embedding_model: EmbeddingModel | None,
+    hybrid_alpha: float = HYBRID_ALPHA,
+) -> list[InferenceChunk]:
+    """asyncio version of `doc_index_retrieval`. Indices which don't support async
+    retrieval are queried from a worker thread."""
+    async_index = (
+        document_index if isinstance(document_index, AsyncRetrievalCapable) else None
+    )
+
+    if query.search_type == SearchType.KEYWORD:
+        if async_index:
+            return await async_index.async_keyword_retrieval(
+                query=query.query,
+                filters=query.filters,
+                time_decay_multiplier=query.recency_bias_multiplier,
+                num_to_retrieve=query.num_hits,
+            )
+        return await run_in_pool_async(
+            ExecutorPoolName.IO,
+            partial(
+                document_index.keyword_retrieval,
+                query=query.query,
+                filters=query.filters,
+                time_decay_multiplier=query.recency_bias_multiplier,
+                num_to_retrieve=query.num_hits,
+            ),
+        )
+
+    if embedding_model is None:
+        raise ValueError("An embedding model is required for non-keyword searches")
+
+    query_embedding = (
+        await embedding_model.async_encode([query.query], text_type=EmbedTextType.QUERY)
+    )[0]
+
+    if query.search_type == SearchType.SEMANTIC:
+        if async_index:
+            return await async_index.async_semantic_retrieval(
+                query=query.query,
+                query_embedding=query_embedding,
+                filters=query.filters,
+                time_decay_multiplier=query.recency_bias_multiplier,
+                num_to_retrieve=query.num_hits,
+            )
+        return await run_in_pool_async(
+            ExecutorPoolName.IO,
+            partial(
+                document_index.semantic_retrieval,
+                query=query.query,
+                query_embedding=query_embedding,
+                filters=query.filters,
+                time_decay_multiplier=query.recency_bias_multiplier,
+                num_to_retrieve=query.num_hits,
+            ),
+        )
+
+    if query.search_type == SearchType.HYBRID:
+        if async_index:
+            return await async_index.async_hybrid_retrieval(
+                query=query.query,
+                query_embedding=query_embedding,
+                filters=query.filters,
+                time_decay_multiplier=query.recency_bias_multiplier,
+                num_to_retrieve=query.num_hits,
+                offset=query.offset,
+                hybrid_alpha=hybrid_alpha,
+                include_content=query.num_hydrated is None,
+            )
+        return await run_in_pool_async(
+            ExecutorPoolName.IO,
+            partial(
+                document_index.hybrid_retrieval,
+                query=query.query,
+                query_embedding=query_embedding,
+                filters=query.filters,
+                time_decay_multiplier=query.recency_bias_multiplier,
+                num_to_retrieve=query.num_hits,
+                offset=query.offset,
+                hybrid_alpha=hybrid_alpha,
+                include_content=query.num_hydrated is None,
+            ),
+        )
+
+    raise RuntimeError("Invalid Search Flow")
+
+
+async def async_retrieve_chunks(
+    query: SearchQuery,
+    document_index: DocumentIndex,
+    embedding_model: EmbeddingModel | None,
+    hybrid_alpha: float = HYBRID_ALPHA,  # Only applicable to hybrid search
+    multilingual_expansion_str: str | None = MULTILINGUAL_QUERY_EXPANSION,
+    retrieval_metrics_callback: Callable[[RetrievalMetricsContainer], None]
+    | None = None,
+) -> list[InferenceChunk]:
+    """asyncio version of `retrieve_chunks`, the retrievals for each query rephrase are
+    run concurrently on the event loop"""
+    if not multilingual_expansion_str or not is_expandable_query(query):
+        top_chunks = await async_doc_index_retrieval(
+            query=query,
+            document_index=document_index,
+            embedding_model=embedding_model,
+            hybrid_alpha=hybrid_alpha,
+        )
+    else:
+        # Query expansion is a (blocking) LLM call
+        expanded_queries = await run_in_pool_async(
+            ExecutorPoolName.LLM,
+            get_expanded_queries,
+            query,
+            multilingual_expansion_str,
+        )
+        search_results = await asyncio.gather(
+            *[
+                async_doc_index_retrieval(
+                    query=q_copy,
+                    document_index=document_index,
+                    embedding_model=embedding_model,
+                    hybrid_alpha=hybrid_alpha,
+                )
+                for q_copy in expanded_queries
+            ]
+        )
+        top_chunks = combine_retrieval_results(list(search_results))
+
+    num_hydrated = get_num_hydrated(query)
+    if num_hydrated is not None:
+        if isinstance(document_index, AsyncRetrievalCapable):
+            await document_index.async_hydrate_chunks(top_chunks[:num_hydrated])
+        else:
+            await run_in_pool_async(
+                ExecutorPoolName.IO,
+                document_index.hydrate_chunks,
+                top_chunks[:num_hydrated],
+            )
+
+    report_retrieval_results(query, top_chunks, retrieval_metrics_callback)
+    return top_chunks
+
+
+async def async_rerank_chunks(
+    query: SearchQuery,
+    chunks_to_rerank: list[InferenceChunk],
+    rerank_metrics_callback: Callable[[RerankMetricsContainer], None] | None = None,
+) -> list[InferenceChunk]:
+    window = get_rerank_window(query, chunks_to_rerank)
+    sim_scores = await CrossEncoderEnsembleModel().async_predict(
+        query=query.query,
+        passages=[chunk.content for chunk in window],
+        passage_ids=[chunk.unique_id for chunk in window],
+    )
+    return rerank_chunks(
+        query=query,
+        chunks_to_rerank=chunks_to_rerank,
+        rerank_metrics_callback=rerank_metrics_callback,
+        sim_scores_floats=sim_scores,
+    )
+
+
+async def async_full_chunk_search_generator(
+    search_query: SearchQuery,
+    document_index: DocumentIndex,
+    embedding_model: EmbeddingModel | None,
+    hybrid_alpha: float = HYBRID_ALPHA,  # Only applicable to hybrid search
+    multilingual_expansion_str: str | None = MULTILINGUAL_QUERY_EXPANSION,
+    retrieval_metrics_callback: Callable[[RetrievalMetricsContainer], None]
+    | None = None,
+    rerank_metrics_callback: Callable[[RerankMetricsContainer], None] | None = None,
+) -> AsyncGenerator[list[InferenceChunk] | list[bool], None]:
+    """asyncio version of `full_chunk_search_generator` with the same yield contract.
+    Always yields twice. Once with the selected chunks and once with the LLM relevance
+    filter result. Reranking and LLM filtering run concurrently."""
+    retrieved_chunks = await async_retrieve_chunks(
+        query=search_query,
+        document_index=document_index,
+        embedding_model=embedding_model,
+        hybrid_alpha=hybrid_alpha,
+        multilingual_expansion_str=multilingual_expansion_str,
+        retrieval_metrics_callback=retrieval_metrics_callback,
+    )
+
+    if not retrieved_chunks:
+        yield cast(list[InferenceChunk], [])
+        yield cast(list[bool], [])
+        return
+
+    rerank_task: asyncio.Task[list[InferenceChunk]] | None = None
+    llm_filter_task: asyncio.Task[list[str]] | None = None
+    try:
+        if should_rerank(search_query):
+            rerank_task = asyncio.create_task(
+                async_rerank_chunks(
+                    search_query, retrieved_chunks, rerank_metrics_callback
+                )
+            )
+
+        if should_apply_llm_based_relevance_filter(search_query):
+            # The LLM clients are blocking, so the filter runs in a worker thread
+            llm_filter_task = asyncio.create_task(
+                run_in_pool_async(
+                    ExecutorPoolName.LLM,
+                    filter_chunks,
+                    search_query,
+                    retrieved_chunks[: search_query.max_llm_filter_chunks],
+                )
+            )
+
+        if rerank_task is None:
+            # NOTE: if we don't rerank, we can return the chunks immediately
+            # since we know this is the final order
+            log_top_chunk_links(search_query.search_type.value, retrieved_chunks)
+            yield retrieved_chunks
+            reranked_chunks = None
+        else:
+            reranked_chunks = await rerank_task
+            log_top_chunk_links(search_query.search_type.value, reranked_chunks)
+            yield reranked_chunks
+
+        if llm_filter_task is not None:
+            llm_chunk_selection = await llm_filter_task
+            yield [
+                chunk.unique_id in llm_chunk_selection
+                for chunk in reranked_chunks or retrieved_chunks
+            ]
+        else:
+            yield [False for _ in reranked_chunks or retrieved_chunks]
+    finally:
+        # If the consumer stops early or a task failed, don't leave work running
+        for task in (rerank_task, llm_filter_task):
+            if task is not None and not task.done():
+                task.cancel()
+
+
+async def async_full_chunk_search(
+    query: SearchQuery,
+    document_index: DocumentIndex,
+    embedding_model: EmbeddingModel | None,
+    hybrid_alpha: float = HYBRID_ALPHA,  # Only applicable to hybrid search
+    multilingual_expansion_str: str | None = MULTILINGUAL_QUERY_EXPANSION,
+    retrieval_metrics_callback: Callable[[RetrievalMetricsContainer], None]
+    | None = None,
+    rerank_metrics_callback: Callable[[RerankMetricsContainer], None] | None = None,
+) -> tuple[list[InferenceChunk], list[bool]]:
+    """asyncio version of `full_chunk_search`"""
+    search_generator = async_full_chunk_search_generator(
+        search_query=query,
+        document_index=document_index,
+        embedding_model=embedding_model,
+        hybrid_alpha=hybrid_alpha,
+        multilingual_expansion_str=multilingual_expansion_str,
+        retrieval_metrics_callback=retrieval_metrics_callback,
+        rerank_metrics_callback=rerank_metrics_callback,
+    )
+    top_chunks = cast(list[InferenceChunk], await search_generator.__anext__())
+    llm_chunk_selection = cast(list[bool], await search_generator.__anext__())
+    await search_generator.aclose()
+    return top_chunks, llm_chunk_selection
+
+
+def get_search_embedding_model(
+    search_query: SearchQuery, db_session: Session
+) -> EmbeddingModel | None:
+    """DB access is blocking so the query embedding model is resolved before handing the
+    search off to the event loop"""
+    if search_query.search_type == SearchType.KEYWORD:
+        return None
+    return get_query_embedding_model(db_session)
+
+
+def async_backed_full_chunk_search_generator(
+    search_query: SearchQuery,
+    document_index: DocumentIndex,
+    db_session: Session,
+    hybrid_alpha: float = HYBRID_ALPHA,  # Only applicable to hybrid search
+    multilingual_expansion_str: str | None = MULTILINGUAL_QUERY_EXPANSION,
+    retrieval_metrics_callback: Callable[[RetrievalMetricsContainer], None]
+    | None = None,
+    rerank_metrics_callback: Callable[[RerankMetricsContainer], None] | None = None,
+) -> Iterator[list[InferenceChunk] | list[bool]]:
+    """Drop-in replacement for `full_chunk_search_generator` for the sync (streaming)
+    endpoints. The search itself runs on the shared background event loop, so the calling
+    thread is the only thread held by the request."""
+    yield from iterate_async_generator_sync(
+        async_full_chunk_search_generator(
+            search_query=search_query,
+            document_index=document_index,
+            embedding_model=get_search_embedding_model(search_query, db_session),
+            hybrid_alpha=hybrid_alpha,
+            multilingual_expansion_str=multilingual_expansion_str,
+            retrieval_metrics_callback=retrieval_metrics_callback,
+            rerank_metrics_callback=rerank_metrics_callback,
+        )
+    )
+
+
+def async_backed_full_chunk_search(
+    query: SearchQuery,
+    document_index: DocumentIndex,
+    db_session: Session,
+    hybrid_alpha: float = HYBRID_ALPHA,  # Only applicable to hybrid search
+    multilingual_expansion_str: str | None = MULTILINGUAL_QUERY_EXPANSION,
+) -> tuple[list[InferenceChunk], list[bool]]:
+    """Drop-in replacement for `full_chunk_search`, see `async_backed_full_chunk_search_generator`"""
+    return run_coroutine_sync(
+        async_full_chunk_search(
+            query=query,
+            document_index=document_index,
+            embedding_model=get_search_embedding_model(query, db_session),
+            hybrid_alpha=hybrid_alpha,
+            multilingual_expansion_str=multilingual_expansion_str,
+        )
+    )
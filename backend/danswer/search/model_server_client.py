@@ -0,0 +1,290 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any
+
+import httpx
+import numpy
+
+from danswer.configs.app_configs import MODEL_SERVER_BINARY_COMPRESSION
+from danswer.configs.app_configs import MODEL_SERVER_BINARY_DTYPE
+from danswer.configs.app_configs import MODEL_SERVER_BINARY_PROTOCOL
+from danswer.configs.app_configs import MODEL_SERVER_EMBED_RETRIES
+from danswer.configs.app_configs import MODEL_SERVER_EMBED_TIMEOUT
+from danswer.configs.app_configs import MODEL_SERVER_HTTP2
+from danswer.configs.app_configs import MODEL_SERVER_INTENT_RETRIES
+from danswer.configs.app_configs import MODEL_SERVER_INTENT_TIMEOUT
+from danswer.configs.app_configs import MODEL_SERVER_KEEPALIVE_EXPIRY
+from danswer.configs.app_configs import MODEL_SERVER_MAX_CONNECTIONS
+from danswer.configs.app_configs import MODEL_SERVER_MAX_KEEPALIVE_CONNECTIONS
+from danswer.configs.app_configs import MODEL_SERVER_RERANK_RETRIES
+from danswer.configs.app_configs import MODEL_SERVER_RERANK_TIMEOUT
+from danswer.utils.logger import setup_logger
+from shared_models.binary_tensor import BINARY_TENSOR_MEDIA_TYPE
+from shared_models.binary_tensor import decode_matrix
+from shared_models.binary_tensor import TensorCompression
+from shared_models.binary_tensor import TensorDType
+from shared_models.binary_tensor import zstd_available
+
+logger = setup_logger()
+
+
+class ModelServerEndpoint(str, Enum):
+    EMBED = "embed"
+    RERANK = "rerank"
+    INTENT = "intent"
+
+
+@dataclass(frozen=True)
+class EndpointPolicy:
+    timeout: float
+    retries: int
+    backoff: float = 0.1
+
+
+DEFAULT_ENDPOINT_POLICIES: dict[ModelServerEndpoint, EndpointPolicy] = {
+    ModelServerEndpoint.EMBED: EndpointPolicy(
+        timeout=MODEL_SERVER_EMBED_TIMEOUT, retries=MODEL_SERVER_EMBED_RETRIES
+    ),
+    ModelServerEndpoint.RERANK: EndpointPolicy(
+        timeout=MODEL_SERVER_RERANK_TIMEOUT, retries=MODEL_SERVER_RERANK_RETRIES
+    ),
+    ModelServerEndpoint.INTENT: EndpointPolicy(
+        timeout=MODEL_SERVER_INTENT_TIMEOUT, retries=MODEL_SERVER_INTENT_RETRIES
+    ),
+}
+
+
+def _is_retryable(e: httpx.HTTPError) -> bool:
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code >= 500
+    return isinstance(e, httpx.TransportError)
+
+
+def binary_url(url: str) -> str:
+    return url + "-binary"
+
+
+def binary_tensor_params() -> dict[str, str]:
+    compression = TensorCompression(MODEL_SERVER_BINARY_COMPRESSION)
+    if compression == TensorCompression.ZSTD and not zstd_available():
+        compression = TensorCompression.NONE
+    return {
+        "dtype": TensorDType(MODEL_SERVER_BINARY_DTYPE).value,
+        "compression": compression.value,
+    }
+
+
+def binary_protocol_enabled(url: str, unsupported_urls: set[str]) -> bool:
+    return MODEL_SERVER_BINARY_PROTOCOL and url not in unsupported_urls
+
+
+def _is_binary_unsupported(e: httpx.HTTPStatusError) -> bool:
+    """Model servers from before the binary endpoints answer 404 / 405. Any other error
+    is transient as far as we can tell, so it must not disable binary responses"""
+    return e.response.status_code in (404, 405)
+
+
+def decode_binary_response(
+    response: httpx.Response, url: str, unsupported_urls: set[str]
+) -> numpy.ndarray | None:
+    """A proxy or fallback route in front of the model server may answer the binary
+    endpoint with something else (e.g. JSON or an HTML page), in which case the JSON
+    endpoint is used from then on"""
+    content_type = response.headers.get("content-type", "")
+    if not content_type.startswith(BINARY_TENSOR_MEDIA_TYPE):
+        logger.info(
+            f"Model server at {url} answered with '{content_type}' instead of a binary "
+            "response, falling back to JSON"
+        )
+        unsupported_urls.add(url)
+        return None
+    return decode_matrix(response.content)
+
+
+class ModelServerClient:
+    """Connection-pooled HTTP client shared by every caller of the model server in this
+    process (query time search, the Slack bot and the indexing embedder). Keeps
+    connections alive between calls so that the TCP (and optionally HTTP/2) setup is
+    only paid once per connection rather than once per request."""
+
+    def __init__(
+        self,
+        http2: bool = MODEL_SERVER_HTTP2,
+        max_connections: int = MODEL_SERVER_MAX_CONNECTIONS,
+        max_keepalive_connections: int = MODEL_SERVER_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = MODEL_SERVER_KEEPALIVE_EXPIRY,
+        endpoint_policies: dict[ModelServerEndpoint, EndpointPolicy] | None = None,
+    ) -> None:
+        self.endpoint_policies = endpoint_policies or DEFAULT_ENDPOINT_POLICIES
+        self._binary_unsupported_urls: set[str] = set()
+        self._client = httpx.Client(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+
+    def post(
+        self,
+        endpoint: ModelServerEndpoint,
+        url: str,
+        payload: dict[str, Any],
+        params: dict[str, str] | None = None,
+    ) -> httpx.Response:
+        """POSTs the payload as JSON, retrying connection errors and 5xx responses up to
+        the endpoint's retry budget. Raises the last httpx.HTTPError if all attempts
+        fail."""
+        policy = self.endpoint_policies[endpoint]
+
+        attempt = 0
+        while True:
+            try:
+                response = self._client.post(
+                    url, json=payload, params=params, timeout=policy.timeout
+                )
+                response.raise_for_status()
+                return response
+            except httpx.HTTPError as e:
+                if attempt >= policy.retries or not _is_retryable(e):
+                    raise
+                attempt += 1
+                logger.warning(
+                    f"Model server {endpoint.value} request failed, "
+                    f"retrying ({attempt}/{policy.retries}): {e}"
+                )
+                time.sleep(policy.backoff * 2 ** (attempt - 1))
+
+    def post_binary(
+        self, endpoint: ModelServerEndpoint, url: str, payload: dict[str, Any]
+    ) -> numpy.ndarray | None:
+        """POSTs to the binary counterpart of the JSON endpoint at `url` and decodes the
+        returned matrix. Returns None if binary responses are disabled or the model server
+        does not support them, which is remembered so later calls skip straight to
+        JSON."""
+        if not binary_protocol_enabled(url, self._binary_unsupported_urls):
+            return None
+
+        try:
+            response = self.post(
+                endpoint, binary_url(url), payload, params=binary_tensor_params()
+            )
+        except httpx.HTTPStatusError as e:
+            if not _is_binary_unsupported(e):
+                raise
+            logger.info(f"Model server at {url} does not support binary responses")
+            self._binary_unsupported_urls.add(url)
+            return None
+        return decode_binary_response(response, url, self._binary_unsupported_urls)
+
+    def close(self) -> None:
+        self._client.close()
+
+
+_CLIENT: tuple[ModelServerClient, int] | None = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_model_server_client() -> ModelServerClient:
+    """Returns the process-wide client. Connection pools must not be shared across a
+    fork, so a new client is built if this is called from a different process than the
+    one that created the current client (e.g. Celery / Dask workers)."""
+    global _CLIENT
+    pid = os.getpid()
+    with _CLIENT_LOCK:
+        if _CLIENT is None or _CLIENT[1] != pid:
+            _CLIENT = (ModelServerClient(), pid)
+        return _CLIENT[0]
+
+
+class AsyncModelServerClient:
+    """asyncio counterpart of ModelServerClient with the same pooling, timeout and
+    retry behavior. Must only be used from the event loop it was created on."""
+
+    def __init__(
+        self,
+        http2: bool = MODEL_SERVER_HTTP2,
+        max_connections: int = MODEL_SERVER_MAX_CONNECTIONS,
+        max_keepalive_connections: int = MODEL_SERVER_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = MODEL_SERVER_KEEPALIVE_EXPIRY,
+        endpoint_policies: dict[ModelServerEndpoint, EndpointPolicy] | None = None,
+    ) -> None:
+        self.endpoint_policies = endpoint_policies or DEFAULT_ENDPOINT_POLICIES
+        self._binary_unsupported_urls: set[str] = set()
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+
+    async def post(
+        self,
+        endpoint: ModelServerEndpoint,
+        url: str,
+        payload: dict[str, Any],
+        params: dict[str, str] | None = None,
+    ) -> httpx.Response:
+        policy = self.endpoint_policies[endpoint]
+
+        attempt = 0
+        while True:
+            try:
+                response = await self._client.post(
+                    url, json=payload, params=params, timeout=policy.timeout
+                )
+                response.raise_for_status()
+                return response
+            except httpx.HTTPError as e:
+                if attempt >= policy.retries or not _is_retryable(e):
+                    raise
+                attempt += 1
+                logger.warning(
+                    f"Model server {endpoint.value} request failed, "
+                    f"retrying ({attempt}/{policy.retries}): {e}"
+                )
+                await asyncio.sleep(policy.backoff * 2 ** (attempt - 1))
+
+    async def post_binary(
+        self, endpoint: ModelServerEndpoint, url: str, payload: dict[str, Any]
+    ) -> numpy.ndarray | None:
+        if not binary_protocol_enabled(url, self._binary_unsupported_urls):
+            return None
+
+        try:
+            response = await self.post(
+                endpoint, binary_url(url), payload, params=binary_tensor_params()
+            )
+        except httpx.HTTPStatusError as e:
+            if not _is_binary_unsupported(e):
+                raise
+            logger.info(f"Model server at {url} does not support binary responses")
+            self._binary_unsupported_urls.add(url)
+            return None
+        return decode_binary_response(response, url, self._binary_unsupported_urls)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+_ASYNC_CLIENTS: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, AsyncModelServerClient
+] = weakref.WeakKeyDictionary()
+
+
+def get_async_model_server_client() -> AsyncModelServerClient:
+    """Returns the client for the running event loop, creating it on first use"""
+    loop = asyncio.get_running_loop()
+    client = _ASYNC_CLIENTS.get(loop)
+    if client is None:
+        client = AsyncModelServerClient()
+        _ASYNC_CLIENTS[loop] = client
+    return client
@@ -5,6 +5,7 @@ from typing import Any
 from pydantic import BaseModel
 
 from danswer.configs.chat_configs import DISABLE_LLM_CHUNK_FILTER
+from danswer.configs.chat_configs import NUM_HYDRATED_CHUNKS
 from danswer.configs.chat_configs import NUM_RERANKED_RESULTS
 from danswer.configs.chat_configs import NUM_RETURNED_HITS
 from danswer.configs.constants import DocumentSource
@@ -77,6 +78,8 @@ class SearchQuery(BaseModel):
     skip_llm_chunk_filter: bool = DISABLE_LLM_CHUNK_FILTER
     # Only used if not skip_llm_chunk_filter
     max_llm_filter_chunks: int = NUM_RERANKED_RESULTS
+    # Chunks past the top num_hydrated are returned without their content, None for all
+    num_hydrated: int | None = NUM_HYDRATED_CHUNKS
 
     class Config:
         frozen = True
@@ -21,6 +21,7 @@ from danswer.search.models import SearchType
 from danswer.secondary_llm_flows.source_filter import extract_source_filter
 from danswer.secondary_llm_flows.time_filter import extract_time_filter
 from danswer.utils.logger import setup_logger
+from danswer.utils.threadpool_concurrency import ExecutorPoolName
 from danswer.utils.threadpool_concurrency import FunctionCall
 from danswer.utils.threadpool_concurrency import run_functions_in_parallel
 from danswer.utils.timing import log_function_time
@@ -111,7 +112,9 @@ def retrieval_preprocessing(
         ]
         if filter_fn
     ]
-    parallel_results = run_functions_in_parallel(functions_to_run)
+    parallel_results = run_functions_in_parallel(
+        functions_to_run, pool=ExecutorPoolName.LLM
+    )
 
     predicted_time_cutoff, predicted_favor_recent = (
         parallel_results[run_time_filters.result_id]
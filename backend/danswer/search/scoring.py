@@ -0,0 +1,152 @@
+from dataclasses import dataclass
+
+import numpy
+
+from danswer.indexing.models import InferenceChunk
+
+
+@dataclass
+class ChunkScoreColumns:
+    """Per-chunk scores of a scoring stage, stored as parallel arrays indexed by the
+    position of the chunk in the input list. `order` holds those positions sorted by
+    descending final score (ties keep their input order)."""
+
+    raw: numpy.ndarray
+    boost: numpy.ndarray
+    recency: numpy.ndarray
+    final: numpy.ndarray
+    order: numpy.ndarray
+
+    @classmethod
+    def from_final_scores(
+        cls,
+        raw: numpy.ndarray,
+        boost: numpy.ndarray,
+        recency: numpy.ndarray,
+        final: numpy.ndarray,
+    ) -> "ChunkScoreColumns":
+        return cls(
+            raw=raw,
+            boost=boost,
+            recency=recency,
+            final=final,
+            order=numpy.argsort(-final, kind="stable"),
+        )
+
+    def ranked_final_scores(self) -> list[float]:
+        return self.final[self.order].tolist()
+
+    def ranked_raw_scores(self) -> list[float]:
+        return self.raw[self.order].tolist()
+
+    def apply(self, chunks: list[InferenceChunk]) -> list[InferenceChunk]:
+        """Sorts the chunks by final score and sets their scores to it. This is the only
+        step that touches the chunk objects, note that it updates them in place."""
+        ranked_chunks = [chunks[ind] for ind in self.order.tolist()]
+        for chunk, score in zip(ranked_chunks, self.ranked_final_scores()):
+            chunk.score = score
+        return ranked_chunks
+
+
+def translate_boost_counts_to_multipliers(boosts: numpy.ndarray) -> numpy.ndarray:
+    """Vectorized `translate_boost_count_to_multiplier`"""
+    # 3 in the equation below stretches it out to hit asymptotes slower
+    sigmoid = 1 / (1 + numpy.exp(-boosts / 3))
+    # 0.5 + sigmoid -> range of 0.5 to 1 for downvotes, 2 x sigmoid -> range of 1 to 2
+    return numpy.where(boosts < 0, 0.5 + sigmoid, 2 * sigmoid)
+
+
+def chunk_boost_multipliers(chunks: list[InferenceChunk]) -> numpy.ndarray:
+    boost_counts = numpy.fromiter(
+        (chunk.boost for chunk in chunks), dtype=numpy.float64, count=len(chunks)
+    )
+    return translate_boost_counts_to_multipliers(boost_counts)
+
+
+def chunk_recency_multipliers(chunks: list[InferenceChunk]) -> numpy.ndarray:
+    return numpy.fromiter(
+        (chunk.recency_bias for chunk in chunks),
+        dtype=numpy.float64,
+        count=len(chunks),
+    )
+
+
+def chunk_retrieval_scores(chunks: list[InferenceChunk]) -> numpy.ndarray:
+    return numpy.fromiter(
+        (chunk.score or 0.0 for chunk in chunks), dtype=numpy.float64, count=len(chunks)
+    )
+
+
+def score_cross_encoder_results(
+    sim_scores: numpy.ndarray,
+    boosts: numpy.ndarray,
+    recency: numpy.ndarray,
+    model_min: float,
+    model_max: float,
+) -> ChunkScoreColumns:
+    """`sim_scores` has one row per cross-encoder model and one column per chunk.
+    The ensemble's scores are averaged after shifting them to be non-negative so that the
+    boost and recency multipliers can be applied, then the result is shifted back and
+    normalized to the expected range of the models."""
+    cross_models_min = sim_scores.min()
+    raw = sim_scores.mean(axis=0)
+    shifted = raw - cross_models_min
+    boosted = shifted * boosts * recency
+    final = (boosted + cross_models_min - model_min) / (model_max - model_min)
+    return ChunkScoreColumns.from_final_scores(
+        raw=raw, boost=boosts, recency=recency, final=final
+    )
+
+
+def score_boosted_retrieval_results(
+    scores: numpy.ndarray,
+    boosts: numpy.ndarray,
+    recency: numpy.ndarray,
+    norm_cutoff: int,
+    norm_min: float,
+    norm_max: float,
+) -> ChunkScoreColumns:
+    # Need the range of values to not be too spread out for applying boost
+    # therefore norm across only the top few results
+    top_scores = scores[:norm_cutoff]
+    norm_min = min(norm_min, float(top_scores.min()))
+    norm_max = max(norm_max, float(top_scores.max()))
+    # This should never be 0 unless user has done some weird/wrong settings
+    norm_range = norm_max - norm_min
+
+    final = numpy.maximum(0, (scores - norm_min) * boosts * recency / norm_range)
+    return ChunkScoreColumns.from_final_scores(
+        raw=scores, boost=boosts, recency=recency, final=final
+    )
+
+
+def score_boosted_retrieval_results_legacy(
+    scores: numpy.ndarray,
+    boosts: numpy.ndarray,
+    norm_min: float,
+    norm_max: float,
+) -> ChunkScoreColumns:
+    score_min = float(scores.min())
+    score_max = float(scores.max())
+    score_range = score_max - score_min
+
+    if score_range != 0:
+        boosted = ((scores - score_min) / score_range) * boosts
+        unnormed_boosted = boosted * score_range + score_min
+    else:
+        unnormed_boosted = scores * boosts
+
+    norm_min = min(norm_min, score_min)
+    norm_max = max(norm_max, score_max)
+    # This should never be 0 unless user has done some weird/wrong settings
+    norm_range = norm_max - norm_min
+
+    # For score display purposes
+    final = (
+        (unnormed_boosted - norm_min) / norm_range
+        if norm_range != 0
+        else unnormed_boosted
+    )
+    return ChunkScoreColumns.from_final_scores(
+        raw=scores, boost=boosts, recency=numpy.ones_like(scores), final=final
+    )
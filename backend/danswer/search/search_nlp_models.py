@@ -1,12 +1,14 @@
 import gc
+import hashlib
 import os
 import threading
 from enum import Enum
+from typing import cast
 from typing import Optional
 from typing import TYPE_CHECKING
 
+import httpx
 import numpy as np
-import requests
 from transformers import logging as transformer_logging  # type:ignore
 
 from danswer.configs.app_configs import MODEL_SERVER_HOST
@@ -16,8 +18,19 @@ from danswer.configs.model_configs import CROSS_ENCODER_MODEL_ENSEMBLE
 from danswer.configs.model_configs import DOC_EMBEDDING_CONTEXT_SIZE
 from danswer.configs.model_configs import DOCUMENT_ENCODER_MODEL
 from danswer.configs.model_configs import INTENT_MODEL_VERSION
+from danswer.configs.model_configs import QUERY_EMBEDDING_CACHE_SIZE
+from danswer.configs.model_configs import QUERY_EMBEDDING_CACHE_TTL_SECONDS
 from danswer.configs.model_configs import QUERY_MAX_CONTEXT_SIZE
+from danswer.configs.model_configs import RERANK_SCORE_CACHE_SIZE
+from danswer.configs.model_configs import RERANK_SCORE_CACHE_TTL_SECONDS
+from danswer.search.model_server_client import get_async_model_server_client
+from danswer.search.model_server_client import get_model_server_client
+from danswer.search.model_server_client import ModelServerEndpoint
 from danswer.utils.logger import setup_logger
+from danswer.utils.lru_cache import CacheStats
+from danswer.utils.lru_cache import LRUTTLCache
+from danswer.utils.threadpool_concurrency import ExecutorPoolName
+from danswer.utils.threadpool_concurrency import run_in_pool_async
 from shared_models.model_server_models import EmbedRequest
 from shared_models.model_server_models import EmbedResponse
 from shared_models.model_server_models import IntentRequest
@@ -53,6 +66,128 @@ class EmbedTextType(str, Enum):
     PASSAGE = "passage"
 
 
+# (model_name, prefix, normalize, text)
+QueryEmbeddingCacheKey = tuple[str, str | None, bool, str]
+
+
+class QueryEmbeddingCache:
+    """Process-wide cache of query embeddings. Entries are keyed by everything that
+    affects the resulting vector so the same cache can be shared by all EmbeddingModels.
+    The cache is additionally dropped whenever the current embedding model in the DB
+    changes so that stale vectors are never served after a model swap."""
+
+    def __init__(
+        self,
+        max_size: int = QUERY_EMBEDDING_CACHE_SIZE,
+        ttl_seconds: float = QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+    ) -> None:
+        self._cache: LRUTTLCache[QueryEmbeddingCacheKey, list[float]] = LRUTTLCache(
+            max_size=max_size, ttl_seconds=ttl_seconds
+        )
+        self._model_identity: tuple | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._cache.enabled
+
+    def sync_model(self, model_identity: tuple) -> None:
+        with self._lock:
+            if self._model_identity == model_identity:
+                return
+            if self._model_identity is not None:
+                logger.info("Embedding model changed, clearing query embedding cache")
+            self._cache.clear()
+            self._model_identity = model_identity
+
+    def get(self, key: QueryEmbeddingCacheKey) -> list[float] | None:
+        return self._cache.get(key)
+
+    def put(self, key: QueryEmbeddingCacheKey, embedding: list[float]) -> None:
+        self._cache.put(key, embedding)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> CacheStats:
+        return self._cache.stats()
+
+
+_QUERY_EMBEDDING_CACHE = QueryEmbeddingCache()
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    return _QUERY_EMBEDDING_CACHE
+
+
+# (ensemble identity, normalized query, chunk unique_id, chunk content hash)
+RerankScoreCacheKey = tuple[tuple[str, ...], str, str, str]
+
+
+def normalize_rerank_query(query: str) -> str:
+    return " ".join(query.split())
+
+
+class RerankScoreCache:
+    """Process-wide cache of cross-encoder scores for query-chunk pairs. The value is the
+    score from each model of the ensemble. The chunk content hash is part of the key so
+    that a re-indexed chunk is never served its old score. Not shared with other processes,
+    see MODEL_SERVER_RERANK_CACHE_SIZE for the cache shared through the model server."""
+
+    def __init__(
+        self,
+        max_size: int = RERANK_SCORE_CACHE_SIZE,
+        ttl_seconds: float = RERANK_SCORE_CACHE_TTL_SECONDS,
+    ) -> None:
+        self._cache: LRUTTLCache[RerankScoreCacheKey, list[float]] = LRUTTLCache(
+            max_size=max_size, ttl_seconds=ttl_seconds
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self._cache.enabled
+
+    @staticmethod
+    def build_keys(
+        ensemble_identity: tuple[str, ...],
+        query: str,
+        passages: list[str],
+        passage_ids: list[str],
+    ) -> list[RerankScoreCacheKey]:
+        normalized_query = normalize_rerank_query(query)
+        return [
+            (
+                ensemble_identity,
+                normalized_query,
+                passage_id,
+                hashlib.sha256(passage.encode()).hexdigest(),
+            )
+            for passage, passage_id in zip(passages, passage_ids)
+        ]
+
+    def get_many(self, keys: list[RerankScoreCacheKey]) -> list[list[float] | None]:
+        return [self._cache.get(key) for key in keys]
+
+    def put_many(
+        self, keys: list[RerankScoreCacheKey], pair_scores: list[list[float]]
+    ) -> None:
+        for key, scores in zip(keys, pair_scores):
+            self._cache.put(key, scores)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> CacheStats:
+        return self._cache.stats()
+
+
+_RERANK_SCORE_CACHE = RerankScoreCache()
+
+
+def get_rerank_score_cache() -> RerankScoreCache:
+    return _RERANK_SCORE_CACHE
+
+
 def clean_model_name(model_str: str) -> str:
     return model_str.replace("/", "_").replace("-", "_").replace(".", "_")
 
@@ -205,14 +340,124 @@ class EmbeddingModel:
             model_name=self.model_name, max_context_length=self.max_seq_length
         )
 
-    def encode(self, texts: list[str], text_type: EmbedTextType) -> list[list[float]]:
+    def _prefix_texts(self, texts: list[str], text_type: EmbedTextType) -> list[str]:
         if text_type == EmbedTextType.QUERY and self.query_prefix:
-            prefixed_texts = [self.query_prefix + text for text in texts]
+            return [self.query_prefix + text for text in texts]
         elif text_type == EmbedTextType.PASSAGE and self.passage_prefix:
-            prefixed_texts = [self.passage_prefix + text for text in texts]
-        else:
-            prefixed_texts = texts
+            return [self.passage_prefix + text for text in texts]
+        return texts
+
+    def _lookup_query_cache(
+        self, texts: list[str]
+    ) -> tuple[list[QueryEmbeddingCacheKey], list[list[float] | None], list[int]]:
+        """Returns the cache keys, the cached embeddings (None on miss) and the indices
+        of the texts which were not found in the cache"""
+        query_cache = get_query_embedding_cache()
+        cache_keys: list[QueryEmbeddingCacheKey] = [
+            (self.model_name, self.query_prefix, self.normalize, text) for text in texts
+        ]
+        embeddings: list[list[float] | None] = [
+            query_cache.get(key) for key in cache_keys
+        ]
+        miss_inds = [
+            ind for ind, embedding in enumerate(embeddings) if embedding is None
+        ]
+        return cache_keys, embeddings, miss_inds
+
+    @staticmethod
+    def _fill_query_cache_misses(
+        cache_keys: list[QueryEmbeddingCacheKey],
+        embeddings: list[list[float] | None],
+        miss_inds: list[int],
+        new_embeddings: list[list[float]],
+    ) -> list[list[float]]:
+        query_cache = get_query_embedding_cache()
+        for ind, embedding in zip(miss_inds, new_embeddings):
+            embeddings[ind] = embedding
+            query_cache.put(cache_keys[ind], embedding)
+        return cast(list[list[float]], embeddings)
+
+    def encode_array(self, texts: list[str], text_type: EmbedTextType) -> np.ndarray:
+        """Same as `encode` but returns a float32 matrix with one row per text, used by
+        indexing to avoid materializing the embeddings as Python floats"""
+        if text_type == EmbedTextType.QUERY and get_query_embedding_cache().enabled:
+            return np.asarray(self.encode(texts, text_type), dtype=np.float32)
+        return self._encode_prefixed_array(self._prefix_texts(texts, text_type))
+
+    def encode(self, texts: list[str], text_type: EmbedTextType) -> list[list[float]]:
+        prefixed_texts = self._prefix_texts(texts, text_type)
+
+        if text_type != EmbedTextType.QUERY or not get_query_embedding_cache().enabled:
+            return self._encode_prefixed(prefixed_texts)
+
+        cache_keys, embeddings, miss_inds = self._lookup_query_cache(texts)
+        new_embeddings = (
+            self._encode_prefixed([prefixed_texts[ind] for ind in miss_inds])
+            if miss_inds
+            else []
+        )
+        return self._fill_query_cache_misses(
+            cache_keys, embeddings, miss_inds, new_embeddings
+        )
+
+    async def async_encode(
+        self, texts: list[str], text_type: EmbedTextType
+    ) -> list[list[float]]:
+        prefixed_texts = self._prefix_texts(texts, text_type)
 
+        if text_type != EmbedTextType.QUERY or not get_query_embedding_cache().enabled:
+            return await self._async_encode_prefixed(prefixed_texts)
+
+        cache_keys, embeddings, miss_inds = self._lookup_query_cache(texts)
+        new_embeddings = (
+            await self._async_encode_prefixed(
+                [prefixed_texts[ind] for ind in miss_inds]
+            )
+            if miss_inds
+            else []
+        )
+        return self._fill_query_cache_misses(
+            cache_keys, embeddings, miss_inds, new_embeddings
+        )
+
+    async def _async_encode_prefixed(
+        self, prefixed_texts: list[str]
+    ) -> list[list[float]]:
+        if not self.embed_server_endpoint:
+            # Local models are CPU bound, keep them off of the event loop
+            return await run_in_pool_async(
+                ExecutorPoolName.MODEL, self._encode_prefixed, prefixed_texts
+            )
+
+        embed_request = EmbedRequest(
+            texts=prefixed_texts,
+            model_name=self.model_name,
+            normalize_embeddings=self.normalize,
+        )
+        try:
+            client = get_async_model_server_client()
+            embeddings = await client.post_binary(
+                ModelServerEndpoint.EMBED,
+                self.embed_server_endpoint,
+                embed_request.dict(),
+            )
+            if embeddings is not None:
+                return embeddings.tolist()
+
+            response = await client.post(
+                ModelServerEndpoint.EMBED,
+                self.embed_server_endpoint,
+                embed_request.dict(),
+            )
+            return EmbedResponse(**response.json()).embeddings
+        except httpx.HTTPError as e:
+            logger.exception(f"Failed to get Embedding: {e}")
+            raise
+
+    def _encode_prefixed(self, prefixed_texts: list[str]) -> list[list[float]]:
+        return self._encode_prefixed_array(prefixed_texts).tolist()
+
+    def _encode_prefixed_array(self, prefixed_texts: list[str]) -> np.ndarray:
         if self.embed_server_endpoint:
             embed_request = EmbedRequest(
                 texts=prefixed_texts,
@@ -221,13 +466,25 @@ class EmbeddingModel:
             )
 
             try:
-                response = requests.post(
-                    self.embed_server_endpoint, json=embed_request.dict()
+                client = get_model_server_client()
+                embeddings = client.post_binary(
+                    ModelServerEndpoint.EMBED,
+                    self.embed_server_endpoint,
+                    embed_request.dict(),
                 )
-                response.raise_for_status()
+                if embeddings is not None:
+                    return embeddings
 
-                return EmbedResponse(**response.json()).embeddings
-            except requests.RequestException as e:
+                response = client.post(
+                    ModelServerEndpoint.EMBED,
+                    self.embed_server_endpoint,
+                    embed_request.dict(),
+                )
+
+                return np.asarray(
+                    EmbedResponse(**response.json()).embeddings, dtype=np.float32
+                )
+            except httpx.HTTPError as e:
                 logger.exception(f"Failed to get Embedding: {e}")
                 raise
 
@@ -236,9 +493,10 @@ class EmbeddingModel:
         if local_model is None:
             raise RuntimeError("Failed to load local Embedding Model")
 
-        return local_model.encode(
-            prefixed_texts, normalize_embeddings=self.normalize
-        ).tolist()
+        return np.asarray(
+            local_model.encode(prefixed_texts, normalize_embeddings=self.normalize),
+            dtype=np.float32,
+        )
 
 
 class CrossEncoderEnsembleModel:
@@ -268,28 +526,201 @@ class CrossEncoderEnsembleModel:
             model_names=self.model_names, max_context_length=self.max_seq_length
         )
 
-    def predict(self, query: str, passages: list[str]) -> list[list[float]]:
+    @property
+    def ensemble_identity(self) -> tuple[str, ...]:
+        return (CROSS_ENCODDER_ENDPOINT or "", *self.model_names)
+
+    def _lookup_score_cache(
+        self, query: str, passages: list[str], passage_ids: list[str]
+    ) -> tuple[list[RerankScoreCacheKey], list[list[float] | None], list[int]]:
+        keys = RerankScoreCache.build_keys(
+            self.ensemble_identity, query, passages, passage_ids
+        )
+        pair_scores = get_rerank_score_cache().get_many(keys)
+        miss_inds = [ind for ind, scores in enumerate(pair_scores) if scores is None]
+        return keys, pair_scores, miss_inds
+
+    @staticmethod
+    def _fill_score_cache_misses(
+        keys: list[RerankScoreCacheKey],
+        pair_scores: list[list[float] | None],
+        miss_inds: list[int],
+        miss_model_scores: list[list[float]],
+        cache_misses: bool = True,
+    ) -> list[list[float]]:
+        """Merges the scores of the cache misses (one list per model) with the cached
+        scores (one list per passage) and returns one list of scores per model. The
+        scores of the misses are only cached if `cache_misses`."""
+        miss_pair_scores = [list(scores) for scores in zip(*miss_model_scores)]
+        if cache_misses:
+            get_rerank_score_cache().put_many(
+                [keys[ind] for ind in miss_inds], miss_pair_scores
+            )
+        for ind, scores in zip(miss_inds, miss_pair_scores):
+            pair_scores[ind] = scores
+        return [list(model_scores) for model_scores in zip(*pair_scores)]  # type: ignore
+
+    def predict(
+        self, query: str, passages: list[str], passage_ids: list[str] | None = None
+    ) -> list[list[float]]:
+        """Returns one list of scores per model of the ensemble. If `passage_ids` (the
+        chunk unique_ids) are given, cached scores are reused and only the passages
+        without one are scored by the models."""
+        if passage_ids is None or not passages or not get_rerank_score_cache().enabled:
+            return self._predict_uncached(query, passages)[0]
+
+        query = normalize_rerank_query(query)
+        keys, pair_scores, miss_inds = self._lookup_score_cache(
+            query, passages, passage_ids
+        )
+        miss_model_scores, cache_misses = (
+            self._predict_uncached(query, [passages[ind] for ind in miss_inds])
+            if miss_inds
+            else ([], True)
+        )
+        return self._fill_score_cache_misses(
+            keys, pair_scores, miss_inds, miss_model_scores, cache_misses
+        )
+
+    async def async_predict(
+        self, query: str, passages: list[str], passage_ids: list[str] | None = None
+    ) -> list[list[float]]:
+        if passage_ids is None or not passages or not get_rerank_score_cache().enabled:
+            return (await self._async_predict_uncached(query, passages))[0]
+
+        query = normalize_rerank_query(query)
+        keys, pair_scores, miss_inds = self._lookup_score_cache(
+            query, passages, passage_ids
+        )
+        miss_model_scores, cache_misses = (
+            await self._async_predict_uncached(
+                query, [passages[ind] for ind in miss_inds]
+            )
+            if miss_inds
+            else ([], True)
+        )
+        return self._fill_score_cache_misses(
+            keys, pair_scores, miss_inds, miss_model_scores, cache_misses
+        )
+
+    def _predict_uncached(
+        self, query: str, passages: list[str]
+    ) -> tuple[list[list[float]], bool]:
+        """Also returns whether the scores come from the models of `ensemble_identity`. If
+        the rerank endpoint fails, the local models that score the passages instead may be
+        different ones and their scores must not be cached under the endpoint."""
         if self.rerank_server_endpoint or CROSS_ENCODDER_ENDPOINT:
             rerank_request = RerankRequest(query=query, documents=passages)
 
             start_time = time.time()
             try:
-                endpoint = CROSS_ENCODDER_ENDPOINT if CROSS_ENCODDER_ENDPOINT else self.rerank_server_endpoint
-                response = requests.post(
-                    endpoint, json=rerank_request.dict(), timeout=2.5
+                client = get_model_server_client()
+                # Only the Danswer model server has the binary endpoints
+                sim_scores = (
+                    client.post_binary(
+                        ModelServerEndpoint.RERANK,
+                        self.rerank_server_endpoint,
+                        rerank_request.dict(),
+                    )
+                    if self.rerank_server_endpoint and not CROSS_ENCODDER_ENDPOINT
+                    else None
+                )
+                if sim_scores is not None:
+                    logger.info(
+                        "[Rerank-Endpoint] CrossEncoderEnsembleModel took "
+                        f"{time.time() - start_time} seconds"
+                    )
+                    return sim_scores.tolist(), True
+
+                endpoint = CROSS_ENCODDER_ENDPOINT or self.rerank_server_endpoint
+                response = client.post(
+                    ModelServerEndpoint.RERANK,
+                    cast(str, endpoint),
+                    rerank_request.dict(),
+                )
+                logger.info(
+                    "[Rerank-Endpoint] CrossEncoderEnsembleModel took "
+                    f"{time.time() - start_time} seconds"
                 )
-                response.raise_for_status()
-                logger.info(f"[Rerank-Endpoint] CrossEncoderEnsembleModel took {time.time() - start_time} seconds")
 
-                return RerankResponse(**response.json()).scores
-            except requests.RequestException as e:
-                logger.exception(f"[Rerank-Endpoint] Failed to get Reranking Scores: {e}")
-                logger.info(f"[Rerank-Endpoint] CrossEncoderEnsembleModel Failed in {time.time() - start_time} seconds")
+                return RerankResponse(**response.json()).scores, True
+            except httpx.HTTPError as e:
+                logger.exception(
+                    f"[Rerank-Endpoint] Failed to get Reranking Scores: {e}"
+                )
+                logger.info(
+                    "[Rerank-Endpoint] CrossEncoderEnsembleModel Failed in "
+                    f"{time.time() - start_time} seconds"
+                )
                 # resume to process with local model
                 logger.info("Resume reranking via local model")
+                return self._local_predict(query, passages), False
 
-        local_models = self.load_model()
+        return self._local_predict(query, passages), True
 
+    async def _async_predict_uncached(
+        self, query: str, passages: list[str]
+    ) -> tuple[list[list[float]], bool]:
+        if self.rerank_server_endpoint or CROSS_ENCODDER_ENDPOINT:
+            rerank_request = RerankRequest(query=query, documents=passages)
+
+            start_time = time.time()
+            try:
+                client = get_async_model_server_client()
+                # Only the Danswer model server has the binary endpoints
+                sim_scores = (
+                    await client.post_binary(
+                        ModelServerEndpoint.RERANK,
+                        self.rerank_server_endpoint,
+                        rerank_request.dict(),
+                    )
+                    if self.rerank_server_endpoint and not CROSS_ENCODDER_ENDPOINT
+                    else None
+                )
+                if sim_scores is not None:
+                    logger.info(
+                        "[Rerank-Endpoint] CrossEncoderEnsembleModel took "
+                        f"{time.time() - start_time} seconds"
+                    )
+                    return sim_scores.tolist(), True
+
+                endpoint = CROSS_ENCODDER_ENDPOINT or self.rerank_server_endpoint
+                response = await client.post(
+                    ModelServerEndpoint.RERANK,
+                    cast(str, endpoint),
+                    rerank_request.dict(),
+                )
+                logger.info(
+                    "[Rerank-Endpoint] CrossEncoderEnsembleModel took "
+                    f"{time.time() - start_time} seconds"
+                )
+
+                return RerankResponse(**response.json()).scores, True
+            except httpx.HTTPError as e:
+                logger.exception(
+                    f"[Rerank-Endpoint] Failed to get Reranking Scores: {e}"
+                )
+                logger.info(
+                    "[Rerank-Endpoint] CrossEncoderEnsembleModel Failed in "
+                    f"{time.time() - start_time} seconds"
+                )
+                # resume to process with local model
+                logger.info("Resume reranking via local model")
+                fallback_scores = await run_in_pool_async(
+                    ExecutorPoolName.MODEL, self._local_predict, query, passages
+                )
+                return fallback_scores, False
+
+        # Local models are CPU bound, keep them off of the event loop
+        return (
+            await run_in_pool_async(
+                ExecutorPoolName.MODEL, self._local_predict, query, passages
+            ),
+            True,
+        )
+
+    def _local_predict(self, query: str, passages: list[str]) -> list[list[float]]:
+        local_models = self.load_model()
 
         if local_models is None:
             raise RuntimeError("Failed to load local Reranking Model Ensemble")
@@ -342,13 +773,14 @@ class IntentModel:
             intent_request = IntentRequest(query=query)
 
             try:
-                response = requests.post(
-                    self.intent_server_endpoint, json=intent_request.dict()
+                response = get_model_server_client().post(
+                    ModelServerEndpoint.INTENT,
+                    self.intent_server_endpoint,
+                    intent_request.dict(),
                 )
-                response.raise_for_status()
 
                 return IntentResponse(**response.json()).class_probs
-            except requests.RequestException as e:
+            except httpx.HTTPError as e:
                 logger.exception(f"Failed to get Embedding: {e}")
                 raise
 
@@ -1,6 +1,8 @@
+import copy
 import string
 from collections.abc import Callable
 from collections.abc import Iterator
+from dataclasses import dataclass
 from typing import cast
 
 import numpy
@@ -15,14 +17,12 @@ from danswer.configs.app_configs import MODEL_SERVER_PORT
 from danswer.configs.chat_configs import HYBRID_ALPHA
 from danswer.configs.chat_configs import MULTILINGUAL_QUERY_EXPANSION
 from danswer.configs.chat_configs import NUM_RERANKED_RESULTS
+from danswer.configs.chat_configs import PROGRESSIVE_RERANK_FIRST_BATCH_SIZE
 from danswer.configs.model_configs import CROSS_ENCODER_RANGE_MAX
 from danswer.configs.model_configs import CROSS_ENCODER_RANGE_MIN
 from danswer.configs.model_configs import SIM_SCORE_RANGE_HIGH
 from danswer.configs.model_configs import SIM_SCORE_RANGE_LOW
 from danswer.db.embedding_model import get_current_db_embedding_model
-from danswer.document_index.document_index_utils import (
-    translate_boost_count_to_multiplier,
-)
 from danswer.document_index.interfaces import DocumentIndex
 from danswer.indexing.models import InferenceChunk
 from danswer.search.models import ChunkMetric
@@ -33,13 +33,21 @@ from danswer.search.models import RetrievalMetricsContainer
 from danswer.search.models import SearchDoc
 from danswer.search.models import SearchQuery
 from danswer.search.models import SearchType
+from danswer.search.scoring import chunk_boost_multipliers
+from danswer.search.scoring import chunk_recency_multipliers
+from danswer.search.scoring import chunk_retrieval_scores
+from danswer.search.scoring import score_boosted_retrieval_results
+from danswer.search.scoring import score_boosted_retrieval_results_legacy
+from danswer.search.scoring import score_cross_encoder_results
 from danswer.search.search_nlp_models import CrossEncoderEnsembleModel
 from danswer.search.search_nlp_models import EmbeddingModel
 from danswer.search.search_nlp_models import EmbedTextType
+from danswer.search.search_nlp_models import get_query_embedding_cache
 from danswer.secondary_llm_flows.chunk_usefulness import llm_batch_eval_chunks
 from danswer.secondary_llm_flows.query_expansion import multilingual_query_expansion
 from danswer.utils.logger import setup_logger
 from danswer.utils.threadpool_concurrency import FunctionCall
+from danswer.utils.threadpool_concurrency import get_executor
 from danswer.utils.threadpool_concurrency import run_functions_in_parallel
 from danswer.utils.threadpool_concurrency import run_functions_tuples_in_parallel
 from danswer.utils.timing import log_function_time
@@ -48,7 +56,7 @@ from danswer.utils.timing import log_function_time
 logger = setup_logger()
 
 
-def _log_top_chunk_links(search_flow: str, chunks: list[InferenceChunk]) -> None:
+def log_top_chunk_links(search_flow: str, chunks: list[InferenceChunk]) -> None:
     top_links = [
         c.source_links[0] if c.source_links is not None else "No Link" for c in chunks
     ]
@@ -131,6 +139,29 @@ def combine_retrieval_results(
     return sorted_chunks
 
 
+def get_query_embedding_model(db_session: Session) -> EmbeddingModel:
+    db_embedding_model = get_current_db_embedding_model(db_session)
+    # Drops cached query embeddings if the embedding model has been swapped
+    get_query_embedding_cache().sync_model(
+        (
+            db_embedding_model.id,
+            db_embedding_model.model_name,
+            db_embedding_model.normalize,
+            db_embedding_model.query_prefix,
+        )
+    )
+
+    return EmbeddingModel(
+        model_name=db_embedding_model.model_name,
+        query_prefix=db_embedding_model.query_prefix,
+        passage_prefix=db_embedding_model.passage_prefix,
+        normalize=db_embedding_model.normalize,
+        # The below are globally set, this flow always uses the indexing one
+        server_host=MODEL_SERVER_HOST,
+        server_port=MODEL_SERVER_PORT,
+    )
+
+
 @log_function_time(print_only=True)
 def doc_index_retrieval(
     query: SearchQuery,
@@ -146,17 +177,7 @@ def doc_index_retrieval(
             num_to_retrieve=query.num_hits,
         )
     else:
-        db_embedding_model = get_current_db_embedding_model(db_session)
-
-        model = EmbeddingModel(
-            model_name=db_embedding_model.model_name,
-            query_prefix=db_embedding_model.query_prefix,
-            passage_prefix=db_embedding_model.passage_prefix,
-            normalize=db_embedding_model.normalize,
-            # The below are globally set, this flow always uses the indexing one
-            server_host=MODEL_SERVER_HOST,
-            server_port=MODEL_SERVER_PORT,
-        )
+        model = get_query_embedding_model(db_session)
 
         query_embedding = model.encode([query.query], text_type=EmbedTextType.QUERY)[0]
 
@@ -178,6 +199,7 @@ def doc_index_retrieval(
                 num_to_retrieve=query.num_hits,
                 offset=query.offset,
                 hybrid_alpha=hybrid_alpha,
+                include_content=query.num_hydrated is None,
             )
 
         else:
@@ -193,48 +215,41 @@ def semantic_reranking(
     rerank_metrics_callback: Callable[[RerankMetricsContainer], None] | None = None,
     model_min: int = CROSS_ENCODER_RANGE_MIN,
     model_max: int = CROSS_ENCODER_RANGE_MAX,
+    sim_scores_floats: list[list[float]] | None = None,
 ) -> tuple[list[InferenceChunk], list[int]]:
     """Reranks chunks based on cross-encoder models. Additionally provides the original indices
-    of the chunks in their new sorted order.
+    of the chunks in their new sorted order. If the cross-encoder scores have already been
+    computed (e.g. by the async pipeline), pass them in as `sim_scores_floats`.
 
     Note: this updates the chunks in place, it updates the chunk scores which came from retrieval
     """
-    cross_encoders = CrossEncoderEnsembleModel()
-    passages = [chunk.content for chunk in chunks]
-    sim_scores_floats = cross_encoders.predict(query=query, passages=passages)
-
-    sim_scores = [numpy.array(scores) for scores in sim_scores_floats]
-
-    raw_sim_scores = cast(numpy.ndarray, sum(sim_scores) / len(sim_scores))
+    if not chunks:
+        return [], []
 
-    cross_models_min = numpy.min(sim_scores)
-
-    shifted_sim_scores = sum(
-        [enc_n_scores - cross_models_min for enc_n_scores in sim_scores]
-    ) / len(sim_scores)
+    if sim_scores_floats is None:
+        cross_encoders = CrossEncoderEnsembleModel()
+        passages = [chunk.content for chunk in chunks]
+        sim_scores_floats = cross_encoders.predict(
+            query=query,
+            passages=passages,
+            passage_ids=[chunk.unique_id for chunk in chunks],
+        )
 
-    boosts = [translate_boost_count_to_multiplier(chunk.boost) for chunk in chunks]
-    recency_multiplier = [chunk.recency_bias for chunk in chunks]
-    boosted_sim_scores = shifted_sim_scores * boosts * recency_multiplier
-    normalized_b_s_scores = (boosted_sim_scores + cross_models_min - model_min) / (
-        model_max - model_min
-    )
-    orig_indices = [i for i in range(len(normalized_b_s_scores))]
-    scored_results = list(
-        zip(normalized_b_s_scores, raw_sim_scores, chunks, orig_indices)
-    )
-    scored_results.sort(key=lambda x: x[0], reverse=True)
-    ranked_sim_scores, ranked_raw_scores, ranked_chunks, ranked_indices = zip(
-        *scored_results
+    score_columns = score_cross_encoder_results(
+        sim_scores=numpy.asarray(sim_scores_floats, dtype=numpy.float64),
+        boosts=chunk_boost_multipliers(chunks),
+        recency=chunk_recency_multipliers(chunks),
+        model_min=model_min,
+        model_max=model_max,
     )
 
     logger.debug(
-        f"Reranked (Boosted + Time Weighted) similarity scores: {ranked_sim_scores}"
+        "Reranked (Boosted + Time Weighted) similarity scores: "
+        f"{score_columns.ranked_final_scores()}"
     )
 
     # Assign new chunk scores based on reranking
-    for ind, chunk in enumerate(ranked_chunks):
-        chunk.score = ranked_sim_scores[ind]
+    ranked_chunks = score_columns.apply(chunks)
 
     if rerank_metrics_callback is not None:
         chunk_metrics = [
@@ -249,11 +264,12 @@ def semantic_reranking(
 
         rerank_metrics_callback(
             RerankMetricsContainer(
-                metrics=chunk_metrics, raw_similarity_scores=ranked_raw_scores  # type: ignore
+                metrics=chunk_metrics,
+                raw_similarity_scores=score_columns.ranked_raw_scores(),
             )
         )
 
-    return list(ranked_chunks), list(ranked_indices)
+    return ranked_chunks, score_columns.order.tolist()
 
 
 def apply_boost_legacy(
@@ -261,51 +277,18 @@ def apply_boost_legacy(
     norm_min: float = SIM_SCORE_RANGE_LOW,
     norm_max: float = SIM_SCORE_RANGE_HIGH,
 ) -> list[InferenceChunk]:
-    scores = [chunk.score or 0 for chunk in chunks]
-    boosts = [translate_boost_count_to_multiplier(chunk.boost) for chunk in chunks]
-
-    logger.debug(f"Raw similarity scores: {scores}")
-
-    score_min = min(scores)
-    score_max = max(scores)
-    score_range = score_max - score_min
-
-    if score_range != 0:
-        boosted_scores = [
-            ((score - score_min) / score_range) * boost
-            for score, boost in zip(scores, boosts)
-        ]
-        unnormed_boosted_scores = [
-            score * score_range + score_min for score in boosted_scores
-        ]
-    else:
-        unnormed_boosted_scores = [
-            score * boost for score, boost in zip(scores, boosts)
-        ]
-
-    norm_min = min(norm_min, min(scores))
-    norm_max = max(norm_max, max(scores))
-    # This should never be 0 unless user has done some weird/wrong settings
-    norm_range = norm_max - norm_min
-
-    # For score display purposes
-    if norm_range != 0:
-        re_normed_scores = [
-            ((score - norm_min) / norm_range) for score in unnormed_boosted_scores
-        ]
-    else:
-        re_normed_scores = unnormed_boosted_scores
-
-    rescored_chunks = list(zip(re_normed_scores, chunks))
-    rescored_chunks.sort(key=lambda x: x[0], reverse=True)
-    sorted_boosted_scores, boost_sorted_chunks = zip(*rescored_chunks)
-
-    final_chunks = list(boost_sorted_chunks)
-    final_scores = list(sorted_boosted_scores)
-    for ind, chunk in enumerate(final_chunks):
-        chunk.score = final_scores[ind]
+    scores = chunk_retrieval_scores(chunks)
+    logger.debug(f"Raw similarity scores: {scores.tolist()}")
+
+    score_columns = score_boosted_retrieval_results_legacy(
+        scores=scores,
+        boosts=chunk_boost_multipliers(chunks),
+        norm_min=norm_min,
+        norm_max=norm_max,
+    )
+    final_chunks = score_columns.apply(chunks)
 
-    logger.debug(f"Boost sorted similary scores: {list(final_scores)}")
+    logger.debug(f"Boost sorted similary scores: {score_columns.ranked_final_scores()}")
 
     return final_chunks
 
@@ -318,33 +301,22 @@ def apply_boost(
     norm_min: float = SIM_SCORE_RANGE_LOW,
     norm_max: float = SIM_SCORE_RANGE_HIGH,
 ) -> list[InferenceChunk]:
-    scores = [chunk.score or 0.0 for chunk in chunks]
-    logger.debug(f"Raw similarity scores: {scores}")
-
-    boosts = [translate_boost_count_to_multiplier(chunk.boost) for chunk in chunks]
-    recency_multiplier = [chunk.recency_bias for chunk in chunks]
-
-    norm_min = min(norm_min, min(scores[:norm_cutoff]))
-    norm_max = max(norm_max, max(scores[:norm_cutoff]))
-    # This should never be 0 unless user has done some weird/wrong settings
-    norm_range = norm_max - norm_min
-
-    boosted_scores = [
-        max(0, (score - norm_min) * boost * recency / norm_range)
-        for score, boost, recency in zip(scores, boosts, recency_multiplier)
-    ]
-
-    rescored_chunks = list(zip(boosted_scores, chunks))
-    rescored_chunks.sort(key=lambda x: x[0], reverse=True)
-    sorted_boosted_scores, boost_sorted_chunks = zip(*rescored_chunks)
-
-    final_chunks = list(boost_sorted_chunks)
-    final_scores = list(sorted_boosted_scores)
-    for ind, chunk in enumerate(final_chunks):
-        chunk.score = final_scores[ind]
+    scores = chunk_retrieval_scores(chunks)
+    logger.debug(f"Raw similarity scores: {scores.tolist()}")
+
+    score_columns = score_boosted_retrieval_results(
+        scores=scores,
+        boosts=chunk_boost_multipliers(chunks),
+        recency=chunk_recency_multipliers(chunks),
+        norm_cutoff=norm_cutoff,
+        norm_min=norm_min,
+        norm_max=norm_max,
+    )
+    final_chunks = score_columns.apply(chunks)
 
     logger.debug(
-        f"Boosted + Time Weighted sorted similarity scores: {list(final_scores)}"
+        "Boosted + Time Weighted sorted similarity scores: "
+        f"{score_columns.ranked_final_scores()}"
     )
 
     return final_chunks
@@ -356,58 +328,49 @@ def _simplify_text(text: str) -> str:
     ).lower()
 
 
-def retrieve_chunks(
-    query: SearchQuery,
-    document_index: DocumentIndex,
-    db_session: Session,
-    hybrid_alpha: float = HYBRID_ALPHA,  # Only applicable to hybrid search
-    multilingual_expansion_str: str | None = MULTILINGUAL_QUERY_EXPANSION,
-    retrieval_metrics_callback: Callable[[RetrievalMetricsContainer], None]
-    | None = None,
-) -> list[InferenceChunk]:
-    """Returns a list of the best chunks from an initial keyword/semantic/ hybrid search."""
+def is_expandable_query(query: SearchQuery) -> bool:
     # Don't do query expansion on complex queries, rephrasings likely would not work well
-    if not multilingual_expansion_str or "\n" in query.query or "\r" in query.query:
-        top_chunks = doc_index_retrieval(
-            query=query,
-            document_index=document_index,
-            db_session=db_session,
-            hybrid_alpha=hybrid_alpha,
-        )
-    else:
-        simplified_queries = set()
-        run_queries: list[tuple[Callable, tuple]] = []
+    return "\n" not in query.query and "\r" not in query.query
+
+
+def get_expanded_queries(
+    query: SearchQuery, multilingual_expansion_str: str
+) -> list[SearchQuery]:
+    """Returns a copy of the query for each meaningfully different rephrase, including
+    the original query"""
+    simplified_queries = set()
+    expanded_queries: list[SearchQuery] = []
+
+    # Currently only uses query expansion on multilingual use cases
+    query_rephrases = multilingual_query_expansion(
+        query.query, multilingual_expansion_str
+    )
+    # Just to be extra sure, add the original query.
+    query_rephrases.append(query.query)
+    for rephrase in set(query_rephrases):
+        # Sometimes the model rephrases the query in the same language with minor changes
+        # Avoid doing an extra search with the minor changes as this biases the results
+        simplified_rephrase = _simplify_text(rephrase)
+        if simplified_rephrase in simplified_queries:
+            continue
+        simplified_queries.add(simplified_rephrase)
+
+        expanded_queries.append(query.copy(update={"query": rephrase}, deep=True))
+    return expanded_queries
 
-        # Currently only uses query expansion on multilingual use cases
-        query_rephrases = multilingual_query_expansion(
-            query.query, multilingual_expansion_str
-        )
-        # Just to be extra sure, add the original query.
-        query_rephrases.append(query.query)
-        for rephrase in set(query_rephrases):
-            # Sometimes the model rephrases the query in the same language with minor changes
-            # Avoid doing an extra search with the minor changes as this biases the results
-            simplified_rephrase = _simplify_text(rephrase)
-            if simplified_rephrase in simplified_queries:
-                continue
-            simplified_queries.add(simplified_rephrase)
-
-            q_copy = query.copy(update={"query": rephrase}, deep=True)
-            run_queries.append(
-                (
-                    doc_index_retrieval,
-                    (q_copy, document_index, db_session, hybrid_alpha),
-                )
-            )
-        parallel_search_results = run_functions_tuples_in_parallel(run_queries)
-        top_chunks = combine_retrieval_results(parallel_search_results)
 
+def report_retrieval_results(
+    query: SearchQuery,
+    top_chunks: list[InferenceChunk],
+    retrieval_metrics_callback: Callable[[RetrievalMetricsContainer], None]
+    | None = None,
+) -> None:
     if not top_chunks:
         logger.info(
             f"{query.search_type.value.capitalize()} search returned no results "
             f"with filters: {query.filters}"
         )
-        return []
+        return
 
     if retrieval_metrics_callback is not None:
         chunk_metrics = [
@@ -425,6 +388,39 @@ def retrieve_chunks(
             )
         )
 
+
+def retrieve_chunks(
+    query: SearchQuery,
+    document_index: DocumentIndex,
+    db_session: Session,
+    hybrid_alpha: float = HYBRID_ALPHA,  # Only applicable to hybrid search
+    multilingual_expansion_str: str | None = MULTILINGUAL_QUERY_EXPANSION,
+    retrieval_metrics_callback: Callable[[RetrievalMetricsContainer], None]
+    | None = None,
+) -> list[InferenceChunk]:
+    """Returns a list of the best chunks from an initial keyword/semantic/ hybrid search."""
+    if not multilingual_expansion_str or not is_expandable_query(query):
+        top_chunks = doc_index_retrieval(
+            query=query,
+            document_index=document_index,
+            db_session=db_session,
+            hybrid_alpha=hybrid_alpha,
+        )
+    else:
+        run_queries: list[tuple[Callable, tuple]] = [
+            (doc_index_retrieval, (q_copy, document_index, db_session, hybrid_alpha))
+            for q_copy in get_expanded_queries(query, multilingual_expansion_str)
+        ]
+        parallel_search_results = run_functions_tuples_in_parallel(run_queries)
+        top_chunks = combine_retrieval_results(parallel_search_results)
+
+    # Hydrated only once the results of every query rephrase are combined, since the
+    # combined order decides which chunks are reranked and filtered
+    num_hydrated = get_num_hydrated(query)
+    if num_hydrated is not None:
+        document_index.hydrate_chunks(top_chunks[:num_hydrated])
+
+    report_retrieval_results(query, top_chunks, retrieval_metrics_callback)
     return top_chunks
 
 
@@ -437,17 +433,41 @@ def should_apply_llm_based_relevance_filter(query: SearchQuery) -> bool:
     return not query.skip_llm_chunk_filter
 
 
+def get_num_hydrated(query: SearchQuery) -> int | None:
+    """Number of top retrieved chunks to hydrate, reranking and the LLM chunk filter need
+    the content of every chunk they look at"""
+    if query.num_hydrated is None:
+        return None
+    return max(
+        query.num_hydrated,
+        (query.num_rerank or 0) if should_rerank(query) else 0,
+        query.max_llm_filter_chunks
+        if should_apply_llm_based_relevance_filter(query)
+        else 0,
+    )
+
+
+def get_rerank_window(
+    query: SearchQuery, chunks_to_rerank: list[InferenceChunk]
+) -> list[InferenceChunk]:
+    # Except the first chunk, rerank the rest of chunks, because we consider the first chunk as the best one
+    return chunks_to_rerank[1 : query.num_rerank]
+
+
 def rerank_chunks(
     query: SearchQuery,
     chunks_to_rerank: list[InferenceChunk],
     rerank_metrics_callback: Callable[[RerankMetricsContainer], None] | None = None,
+    sim_scores_floats: list[list[float]] | None = None,
 ) -> list[InferenceChunk]:
+    """If provided, `sim_scores_floats` must be the cross-encoder scores of the chunks
+    returned by `get_rerank_window`"""
     reranked_chunks = []
-    # Except the first chunk, rerank the rest of chunks, because we consider the first chunk as the best one
     ranked_chunks, _ = semantic_reranking(
         query=query.query,
-        chunks=chunks_to_rerank[1: query.num_rerank],
+        chunks=get_rerank_window(query, chunks_to_rerank),
         rerank_metrics_callback=rerank_metrics_callback,
+        sim_scores_floats=sim_scores_floats,
     )
     lower_chunks = chunks_to_rerank[query.num_rerank :]
     # Scores from rerank cannot be meaningfully combined with scores without rerank
@@ -561,7 +581,7 @@ def full_chunk_search_generator(
         final_chunks = retrieved_chunks
         # NOTE: if we don't rerank, we can return the chunks immediately
         # since we know this is the final order
-        _log_top_chunk_links(search_query.search_type.value, final_chunks)
+        log_top_chunk_links(search_query.search_type.value, final_chunks)
         yield final_chunks
         chunks_yielded = True
 
@@ -590,7 +610,7 @@ def full_chunk_search_generator(
                 "Trying to yield re-ranked chunks, but chunks were already yielded. This should never happen."
             )
         else:
-            _log_top_chunk_links(search_query.search_type.value, reranked_chunks)
+            log_top_chunk_links(search_query.search_type.value, reranked_chunks)
             yield reranked_chunks
 
     llm_chunk_selection = cast(
@@ -608,6 +628,137 @@ def full_chunk_search_generator(
         yield [False for _ in reranked_chunks or retrieved_chunks]
 
 
+@dataclass
+class RerankedChunkOrder:
+    """Yielded by `progressive_chunk_search_generator` each time reranking changes the
+    order of the chunks. `chunks` is always the complete list of chunks."""
+
+    chunks: list[InferenceChunk]
+    is_final: bool
+
+
+def _progressively_rerank_chunks(
+    search_query: SearchQuery,
+    retrieved_chunks: list[InferenceChunk],
+    first_batch_size: int,
+    rerank_metrics_callback: Callable[[RerankMetricsContainer], None] | None = None,
+) -> Iterator[RerankedChunkOrder]:
+    window = get_rerank_window(search_query, retrieved_chunks)
+    first_batch, rest = window[:first_batch_size], window[first_batch_size:]
+
+    cross_encoders = CrossEncoderEnsembleModel()
+    sim_scores_floats = cross_encoders.predict(
+        query=search_query.query,
+        passages=[chunk.content for chunk in first_batch],
+        passage_ids=[chunk.unique_id for chunk in first_batch],
+    )
+
+    if rest:
+        # The top of the window is reranked amongst itself, the rest keeps its retrieval
+        # order until it has been scored as well. Reranking rescores the chunks in place,
+        # so copies are ranked and every chunk of this order keeps its retrieval score
+        _, first_batch_order = semantic_reranking(
+            query=search_query.query,
+            chunks=[copy.copy(chunk) for chunk in first_batch],
+            sim_scores_floats=sim_scores_floats,
+        )
+        yield RerankedChunkOrder(
+            chunks=[
+                retrieved_chunks[0],
+                *(first_batch[ind] for ind in first_batch_order),
+                *rest,
+                *retrieved_chunks[search_query.num_rerank :],
+            ],
+            is_final=False,
+        )
+
+        rest_sim_scores = cross_encoders.predict(
+            query=search_query.query,
+            passages=[chunk.content for chunk in rest],
+            passage_ids=[chunk.unique_id for chunk in rest],
+        )
+        sim_scores_floats = [
+            first_scores + rest_scores
+            for first_scores, rest_scores in zip(sim_scores_floats, rest_sim_scores)
+        ]
+
+    # Scores are normalized across the whole window so the final order is the same as
+    # reranking the window in one go
+    yield RerankedChunkOrder(
+        chunks=rerank_chunks(
+            query=search_query,
+            chunks_to_rerank=retrieved_chunks,
+            rerank_metrics_callback=rerank_metrics_callback,
+            sim_scores_floats=sim_scores_floats,
+        ),
+        is_final=True,
+    )
+
+
+def progressive_chunk_search_generator(
+    search_query: SearchQuery,
+    document_index: DocumentIndex,
+    db_session: Session,
+    hybrid_alpha: float = HYBRID_ALPHA,  # Only applicable to hybrid search
+    multilingual_expansion_str: str | None = MULTILINGUAL_QUERY_EXPANSION,
+    retrieval_metrics_callback: Callable[[RetrievalMetricsContainer], None]
+    | None = None,
+    rerank_metrics_callback: Callable[[RerankMetricsContainer], None] | None = None,
+    first_batch_size: int = PROGRESSIVE_RERANK_FIRST_BATCH_SIZE,
+) -> Iterator[list[InferenceChunk] | RerankedChunkOrder | list[bool]]:
+    """Variant of `full_chunk_search_generator` which does not hold back the chunks until
+    reranking is done. Yields the chunks in retrieval order first. If reranking, then
+    yields a RerankedChunkOrder once the top `first_batch_size` chunks of the rerank window
+    are scored and a final one once all of them are. Lastly yields the LLM relevance filter
+    result, which matches the final order. The LLM filter runs while reranking."""
+    retrieved_chunks = retrieve_chunks(
+        query=search_query,
+        document_index=document_index,
+        db_session=db_session,
+        hybrid_alpha=hybrid_alpha,
+        multilingual_expansion_str=multilingual_expansion_str,
+        retrieval_metrics_callback=retrieval_metrics_callback,
+    )
+
+    if not retrieved_chunks:
+        yield cast(list[InferenceChunk], [])
+        yield cast(list[bool], [])
+        return
+
+    llm_filter_future = (
+        get_executor().submit(
+            filter_chunks,
+            search_query,
+            retrieved_chunks[: search_query.max_llm_filter_chunks],
+        )
+        if should_apply_llm_based_relevance_filter(search_query)
+        else None
+    )
+    try:
+        yield retrieved_chunks
+
+        final_chunks = retrieved_chunks
+        if should_rerank(search_query):
+            for chunk_order in _progressively_rerank_chunks(
+                search_query=search_query,
+                retrieved_chunks=retrieved_chunks,
+                first_batch_size=first_batch_size,
+                rerank_metrics_callback=rerank_metrics_callback,
+            ):
+                final_chunks = chunk_order.chunks
+                yield chunk_order
+        log_top_chunk_links(search_query.search_type.value, final_chunks)
+
+        if llm_filter_future is not None:
+            llm_chunk_selection = llm_filter_future.result()
+            yield [chunk.unique_id in llm_chunk_selection for chunk in final_chunks]
+        else:
+            yield [False for _ in final_chunks]
+    finally:
+        if llm_filter_future is not None:
+            llm_filter_future.cancel()
+
+
 def combine_inference_chunks(inf_chunks: list[InferenceChunk]) -> LlmDoc:
     if not inf_chunks:
         raise ValueError("Cannot combine empty list of chunks")
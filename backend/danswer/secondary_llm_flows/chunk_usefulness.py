@@ -1,15 +1,26 @@
 from collections.abc import Callable
 
+from danswer.configs.chat_configs import LLM_CHUNK_FILTER_BATCH_SIZE
+from danswer.configs.chat_configs import LLM_CHUNK_FILTER_MAX_PROMPT_TOKENS
 from danswer.llm.exceptions import GenAIDisabledException
 from danswer.llm.factory import get_default_llm
 from danswer.llm.utils import dict_based_prompt_to_langchain_prompt
+from danswer.llm.utils import get_default_llm_tokenizer
+from danswer.llm.utils import tokenizer_trim_content
+from danswer.prompts.llm_chunk_filter import BATCH_CHUNK_FILTER_PROMPT
+from danswer.prompts.llm_chunk_filter import BATCH_CHUNK_FILTER_SECTION
 from danswer.prompts.llm_chunk_filter import CHUNK_FILTER_PROMPT
 from danswer.prompts.llm_chunk_filter import NONUSEFUL_PAT
+from danswer.prompts.llm_chunk_filter import USEFUL_SECTIONS_KEY
 from danswer.utils.logger import setup_logger
+from danswer.utils.text_processing import extract_embedded_json
+from danswer.utils.threadpool_concurrency import ExecutorPoolName
 from danswer.utils.threadpool_concurrency import run_functions_tuples_in_parallel
 
 logger = setup_logger()
 
+_MIN_CHUNK_TOKENS = 256
+
 
 def llm_eval_chunk(query: str, chunk_content: str) -> bool:
     def _get_usefulness_messages() -> list[dict[str, str]]:
@@ -50,9 +61,146 @@ def llm_eval_chunk(query: str, chunk_content: str) -> bool:
     return _extract_usefulness(model_output)
 
 
+def _parse_section_num(section_num: object) -> int:
+    """Only whole numbers are accepted, anything else (e.g. 1.7 or "2a") means the LLM did
+    not follow the format and is not coerced into a section number"""
+    if isinstance(section_num, int) and not isinstance(section_num, bool):
+        return section_num
+    if isinstance(section_num, str) and section_num.strip().isdigit():
+        return int(section_num.strip())
+    raise ValueError(f"Invalid section number: {section_num!r}")
+
+
+def _extract_useful_sections(model_output: str, num_sections: int) -> list[bool]:
+    """Raises ValueError if the output is not a json with a list of valid section numbers"""
+    useful_sections = extract_embedded_json(model_output).get(USEFUL_SECTIONS_KEY)
+    if not isinstance(useful_sections, list):
+        raise ValueError(f"Expected a list for '{USEFUL_SECTIONS_KEY}'")
+
+    section_nums = {_parse_section_num(section_num) for section_num in useful_sections}
+    if any(num < 1 or num > num_sections for num in section_nums):
+        raise ValueError("LLM returned a section number that does not exist")
+
+    return [ind + 1 in section_nums for ind in range(num_sections)]
+
+
+def llm_eval_chunks_in_one_prompt(query: str, chunk_contents: list[str]) -> list[bool]:
+    """Judges all of the chunks with a single LLM call. If the LLM output can't be
+    parsed, falls back to judging the chunks one call at a time"""
+    try:
+        llm = get_default_llm(use_fast_llm=True, timeout=10)
+    except GenAIDisabledException:
+        return [False] * len(chunk_contents)
+
+    numbered_sections = "\n\n".join(
+        BATCH_CHUNK_FILTER_SECTION.format(section_num=ind + 1, chunk_text=content)
+        for ind, content in enumerate(chunk_contents)
+    )
+    messages = [
+        {
+            "role": "user",
+            "content": BATCH_CHUNK_FILTER_PROMPT.format(
+                numbered_sections=numbered_sections, user_query=query
+            ),
+        },
+    ]
+    model_output = llm.invoke(dict_based_prompt_to_langchain_prompt(messages))
+    logger.debug(model_output)
+
+    try:
+        return _extract_useful_sections(model_output, len(chunk_contents))
+    except (ValueError, TypeError) as e:
+        logger.warning(
+            f"Could not parse batched LLM chunk filter output, "
+            f"falling back to one call per chunk: {e}"
+        )
+        return llm_batch_eval_chunks(query, chunk_contents, batch_size=1)
+
+
+def split_chunks_for_batch_eval(
+    query: str,
+    chunk_contents: list[str],
+    batch_size: int = LLM_CHUNK_FILTER_BATCH_SIZE,
+    max_prompt_tokens: int = LLM_CHUNK_FILTER_MAX_PROMPT_TOKENS,
+) -> list[list[str]]:
+    """Groups the chunks into batches of at most `batch_size` chunks whose filled in prompt
+    is at most `max_prompt_tokens` tokens. Chunks that are too long to fit in a batch on
+    their own are trimmed."""
+    tokenizer = get_default_llm_tokenizer()
+    prompt_tokens = len(
+        tokenizer.encode(
+            BATCH_CHUNK_FILTER_PROMPT.format(numbered_sections="", user_query=query)
+        )
+    )
+    section_tokens = len(
+        tokenizer.encode(
+            BATCH_CHUNK_FILTER_SECTION.format(section_num=batch_size, chunk_text="")
+        )
+    )
+    # Always leave room for a reasonable amount of chunk text, even for very long queries
+    max_chunk_tokens = max(
+        max_prompt_tokens - prompt_tokens - section_tokens, _MIN_CHUNK_TOKENS
+    )
+
+    batches: list[list[str]] = []
+    current_batch: list[str] = []
+    current_tokens = prompt_tokens
+    for content in chunk_contents:
+        num_tokens = len(tokenizer.encode(content))
+        if num_tokens > max_chunk_tokens:
+            content = tokenizer_trim_content(content, max_chunk_tokens, tokenizer)
+            num_tokens = max_chunk_tokens
+        num_tokens += section_tokens
+
+        if current_batch and (
+            len(current_batch) >= batch_size
+            or current_tokens + num_tokens > max_prompt_tokens
+        ):
+            batches.append(current_batch)
+            current_batch = []
+            current_tokens = prompt_tokens
+
+        current_batch.append(content)
+        current_tokens += num_tokens
+
+    if current_batch:
+        batches.append(current_batch)
+    return batches
+
+
 def llm_batch_eval_chunks(
-    query: str, chunk_contents: list[str], use_threads: bool = True
+    query: str,
+    chunk_contents: list[str],
+    use_threads: bool = True,
+    batch_size: int = LLM_CHUNK_FILTER_BATCH_SIZE,
 ) -> list[bool]:
+    if batch_size > 1:
+        batches = split_chunks_for_batch_eval(
+            query, chunk_contents, batch_size=batch_size
+        )
+        batch_results: list[list[bool] | None]
+        if use_threads and len(batches) > 1:
+            batch_results = run_functions_tuples_in_parallel(
+                [(llm_eval_chunks_in_one_prompt, (query, batch)) for batch in batches],
+                allow_failures=True,
+                pool=ExecutorPoolName.LLM,
+            )
+        else:
+            batch_results = []
+            for batch in batches:
+                try:
+                    batch_results.append(llm_eval_chunks_in_one_prompt(query, batch))
+                except Exception:
+                    logger.exception("Batched LLM chunk filter call failed")
+                    batch_results.append(None)
+
+        # In case of failure/timeout, don't throw out the chunks
+        return [
+            verdict
+            for batch, results in zip(batches, batch_results)
+            for verdict in (results if results is not None else [True] * len(batch))
+        ]
+
     if use_threads:
         functions_with_args: list[tuple[Callable, tuple]] = [
             (llm_eval_chunk, (query, chunk_content)) for chunk_content in chunk_contents
@@ -62,7 +210,7 @@ def llm_batch_eval_chunks(
             "Running LLM usefulness eval in parallel (following logging may be out of order)"
         )
         parallel_results = run_functions_tuples_in_parallel(
-            functions_with_args, allow_failures=True
+            functions_with_args, allow_failures=True, pool=ExecutorPoolName.LLM
         )
 
         # In case of failure/timeout, don't throw out the chunk
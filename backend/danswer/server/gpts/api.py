@@ -6,10 +6,12 @@ from fastapi import Depends
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
+from danswer.configs.chat_configs import ASYNC_SEARCH_PIPELINE
 from danswer.db.embedding_model import get_current_db_embedding_model
 from danswer.db.engine import get_session
 from danswer.document_index.factory import get_default_document_index
 from danswer.search.access_filters import build_access_filters_for_user
+from danswer.search.async_search_runner import async_backed_full_chunk_search
 from danswer.search.models import IndexFilters
 from danswer.search.models import SearchQuery
 from danswer.search.search_runner import full_chunk_search
@@ -80,6 +82,8 @@ def gpt_search(
         filters=final_filters,
         recency_bias_multiplier=1.0,
         skip_llm_chunk_filter=True,
+        # The content of every hit is returned
+        num_hydrated=None,
     )
 
     embedding_model = get_current_db_embedding_model(db_session)
@@ -88,9 +92,14 @@ def gpt_search(
         primary_index_name=embedding_model.index_name, secondary_index_name=None
     )
 
-    top_chunks, __ = full_chunk_search(
-        query=search_query, document_index=document_index, db_session=db_session
-    )
+    if ASYNC_SEARCH_PIPELINE:
+        top_chunks, __ = async_backed_full_chunk_search(
+            query=search_query, document_index=document_index, db_session=db_session
+        )
+    else:
+        top_chunks, __ = full_chunk_search(
+            query=search_query, document_index=document_index, db_session=db_session
+        )
 
     return GptSearchResponse(
         matching_document_chunks=[
@@ -37,6 +37,7 @@ from danswer.server.manage.models import BoostUpdateRequest
 from danswer.server.manage.models import HiddenUpdateRequest
 from danswer.server.models import ApiKey
 from danswer.utils.logger import setup_logger
+from danswer.utils.threadpool_concurrency import ExecutorPoolName
 from danswer.utils.threadpool_concurrency import run_functions_tuples_in_parallel
 
 router = APIRouter(prefix="/manage")
@@ -141,7 +142,7 @@ def _validate_llm_key(genai_api_key: str | None) -> None:
         functions_with_args.append((test_llm, (gpt4_llm,)))
 
     parallel_results = run_functions_tuples_in_parallel(
-        functions_with_args, allow_failures=False
+        functions_with_args, allow_failures=False, pool=ExecutorPoolName.LLM
     )
 
     error_msg = parallel_results[0]
@@ -0,0 +1,64 @@
+import asyncio
+import os
+import threading
+from collections.abc import AsyncIterator
+from collections.abc import Coroutine
+from collections.abc import Iterator
+from typing import Any
+from typing import TypeVar
+
+from danswer.utils.logger import setup_logger
+
+logger = setup_logger()
+
+R = TypeVar("R")
+T = TypeVar("T")
+
+
+_BACKGROUND_LOOP: tuple[asyncio.AbstractEventLoop, int] | None = None
+_BACKGROUND_LOOP_LOCK = threading.Lock()
+
+
+def get_background_event_loop() -> asyncio.AbstractEventLoop:
+    """Returns a process-wide event loop running forever on a daemon thread. Sync code
+    (such as the streaming chat / query endpoints) submits coroutines to it so that all
+    of the concurrent IO of a request is multiplexed onto a single thread and so that
+    async HTTP clients can keep their connection pools alive between requests.
+
+    A new loop is started if called from a forked process since the thread running the
+    parent's loop does not exist in the child."""
+    global _BACKGROUND_LOOP
+    pid = os.getpid()
+    with _BACKGROUND_LOOP_LOCK:
+        if _BACKGROUND_LOOP is None or _BACKGROUND_LOOP[1] != pid:
+            loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=loop.run_forever, name="danswer-event-loop", daemon=True
+            ).start()
+            _BACKGROUND_LOOP = (loop, pid)
+        return _BACKGROUND_LOOP[0]
+
+
+def run_coroutine_sync(coro: Coroutine[Any, Any, R]) -> R:
+    """Runs the coroutine on the background event loop and blocks until it is done"""
+    return asyncio.run_coroutine_threadsafe(coro, get_background_event_loop()).result()
+
+
+def iterate_async_generator_sync(async_gen: AsyncIterator[T]) -> Iterator[T]:
+    """Drives an async generator on the background event loop from sync code. Each item
+    is yielded as soon as the async generator produces it."""
+    loop = get_background_event_loop()
+    try:
+        while True:
+            try:
+                item = asyncio.run_coroutine_threadsafe(
+                    async_gen.__anext__(), loop  # type: ignore
+                ).result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        # If the consumer stops early, make sure the async generator's cleanup still runs
+        aclose = getattr(async_gen, "aclose", None)
+        if aclose is not None:
+            asyncio.run_coroutine_threadsafe(aclose(), loop).result()
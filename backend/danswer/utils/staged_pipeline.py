@@ -0,0 +1,210 @@
+import queue
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from types import TracebackType
+from typing import Any
+from typing import Generic
+from typing import TypeVar
+
+from danswer.utils.logger import setup_logger
+
+logger = setup_logger()
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# How often blocked stages re-check whether the pipeline was stopped
+_POLL_INTERVAL = 0.5
+
+
+class _EndOfInput:
+    pass
+
+
+_END_OF_INPUT = _EndOfInput()
+
+
+@dataclass
+class StageTiming:
+    name: str
+    items: int = 0
+    # Time spent running the stage function
+    busy_seconds: float = 0.0
+    # Time spent waiting for the next stage to have room in its queue (backpressure)
+    blocked_seconds: float = 0.0
+
+
+class StagedPipeline(Generic[T, R]):
+    """Runs each submitted item through a chain of stages, each stage on its own thread
+    with a bounded queue of at most `queue_size` items in front of it. A full queue blocks
+    the stage (or submitter) feeding it. Items go through every stage in submission order
+    and the results are handed back in that order.
+
+    If a stage raises, the pipeline stops and the exception is re-raised by the next call
+    to `submit`, `finished_results` or `finish`. The results of the items that made it
+    through before the failure can still be taken with `finished_results` by passing
+    `raise_on_failure=False`. With `queue_size` 0 the stages are run synchronously by
+    `submit` instead."""
+
+    def __init__(
+        self, stages: list[tuple[str, Callable[[Any], Any]]], queue_size: int = 1
+    ) -> None:
+        self.stages = stages
+        self.queue_size = queue_size
+        self.timings = [StageTiming(name=name) for name, _ in stages]
+
+        self._stop_event = threading.Event()
+        self._error: BaseException | None = None
+        self._results: queue.Queue[R | _EndOfInput] = queue.Queue()
+        # Results taken off of the results queue but not yet handed back
+        self._ready: list[R] = []
+        self._queues: list[queue.Queue[Any]] = []
+        self._threads: list[threading.Thread] = []
+        self._finished = False
+
+    def __enter__(self) -> "StagedPipeline[T, R]":
+        if self.queue_size <= 0:
+            return self
+
+        self._queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        output_queues: list[queue.Queue[Any]] = self._queues[1:] + [self._results]  # type: ignore
+        for ind, ((name, func), input_queue, output_queue) in enumerate(
+            zip(self.stages, self._queues, output_queues)
+        ):
+            thread = threading.Thread(
+                target=self._run_stage,
+                args=(func, input_queue, output_queue, self.timings[ind]),
+                name=f"pipeline-stage-{name}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join()
+        self.log_timings()
+
+    def _put(self, target_queue: queue.Queue[Any], item: Any) -> bool:
+        """Returns False if the pipeline was stopped before the item could be put"""
+        while not self._stop_event.is_set():
+            try:
+                target_queue.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run_stage(
+        self,
+        func: Callable[[Any], Any],
+        input_queue: queue.Queue[Any],
+        output_queue: queue.Queue[Any],
+        timing: StageTiming,
+    ) -> None:
+        while not self._stop_event.is_set():
+            try:
+                item = input_queue.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+
+            if item is not _END_OF_INPUT:
+                start = time.monotonic()
+                try:
+                    item = func(item)
+                except BaseException as e:
+                    logger.exception(f"Pipeline stage '{timing.name}' failed")
+                    if self._error is None:
+                        self._error = e
+                    self._stop_event.set()
+                    return
+                timing.items += 1
+                timing.busy_seconds += time.monotonic() - start
+
+            start = time.monotonic()
+            if not self._put(output_queue, item):
+                return
+            timing.blocked_seconds += time.monotonic() - start
+
+            if item is _END_OF_INPUT:
+                return
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise self._error
+        if self._stop_event.is_set():
+            raise RuntimeError("Pipeline was stopped")
+
+    def _run_synchronously(self, item: Any) -> R:
+        for (_, func), timing in zip(self.stages, self.timings):
+            start = time.monotonic()
+            item = func(item)
+            timing.items += 1
+            timing.busy_seconds += time.monotonic() - start
+        return item
+
+    def submit(self, item: T) -> None:
+        """Blocks while the first stage's queue is full"""
+        if self._finished:
+            raise RuntimeError("Can't submit to a finished pipeline")
+        if self.queue_size <= 0:
+            self._results.put(self._run_synchronously(item))
+            return
+
+        self._raise_if_failed()
+        if not self._put(self._queues[0], item):
+            self._raise_if_failed()
+
+    def _take_ready(self) -> list[R]:
+        results, self._ready = self._ready, []
+        return results
+
+    def finished_results(self, raise_on_failure: bool = True) -> list[R]:
+        """Results of the items that made it through all stages so far, does not block"""
+        if raise_on_failure:
+            self._raise_if_failed()
+        while True:
+            try:
+                result = self._results.get_nowait()
+            except queue.Empty:
+                return self._take_ready()
+            if not isinstance(result, _EndOfInput):
+                self._ready.append(result)
+
+    def finish(self) -> list[R]:
+        """Waits for all the submitted items to make it through the stages and returns
+        the results that were not already returned by `finished_results`"""
+        self._finished = True
+        if self.queue_size <= 0:
+            return self.finished_results()
+
+        self._raise_if_failed()
+        if not self._put(self._queues[0], _END_OF_INPUT):
+            self._raise_if_failed()
+
+        while True:
+            try:
+                result = self._results.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                self._raise_if_failed()
+                continue
+            if isinstance(result, _EndOfInput):
+                return self._take_ready()
+            self._ready.append(result)
+
+    def log_timings(self) -> None:
+        for timing in self.timings:
+            logger.info(
+                f"Pipeline stage '{timing.name}': {timing.items} items, "
+                f"{timing.busy_seconds:.2f}s busy, "
+                f"{timing.blocked_seconds:.2f}s blocked on the next stage"
+            )
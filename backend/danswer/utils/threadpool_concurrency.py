@@ -1,11 +1,24 @@
+import asyncio
+import os
+import threading
+import time
 import uuid
 from collections.abc import Callable
-from concurrent.futures import as_completed
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import Future
 from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from dataclasses import dataclass
+from enum import Enum
+from functools import partial
 from typing import Any
 from typing import Generic
 from typing import TypeVar
 
+from danswer.configs.app_configs import THREAD_POOL_IO_MAX_WORKERS
+from danswer.configs.app_configs import THREAD_POOL_LLM_MAX_WORKERS
+from danswer.configs.app_configs import THREAD_POOL_MAX_QUEUED_TASKS
+from danswer.configs.app_configs import THREAD_POOL_MODEL_MAX_WORKERS
 from danswer.utils.logger import setup_logger
 
 logger = setup_logger()
@@ -13,10 +26,274 @@ logger = setup_logger()
 R = TypeVar("R")
 
 
+class ExecutorPoolName(str, Enum):
+    IO = "io"
+    LLM = "llm"
+    MODEL = "model"
+
+
+_POOL_MAX_WORKERS: dict[ExecutorPoolName, int] = {
+    ExecutorPoolName.IO: THREAD_POOL_IO_MAX_WORKERS,
+    ExecutorPoolName.LLM: THREAD_POOL_LLM_MAX_WORKERS,
+    ExecutorPoolName.MODEL: THREAD_POOL_MODEL_MAX_WORKERS,
+}
+
+
+@dataclass
+class ExecutorStats:
+    name: str
+    max_workers: int
+    max_queued: int
+    running: int
+    queued: int
+    completed: int
+    throttled_submits: int
+    avg_wait_ms: float
+    max_wait_ms: float
+
+
+# Set on the worker threads of a BoundedExecutor so that nested parallel calls can tell
+# which pool they are already running in
+_WORKER_CONTEXT = threading.local()
+
+
+def _in_event_loop_thread() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class BoundedExecutor:
+    """Long-lived thread pool with a bound on the number of tasks waiting for a worker.
+    Once `max_workers + max_queued` tasks are outstanding, `submit` blocks until one of
+    them finishes, pushing back on the caller instead of growing an unbounded queue.
+    An event loop thread is never blocked, tasks submitted from one are admitted over
+    the limit (and counted as throttled)."""
+
+    def __init__(self, name: str, max_workers: int, max_queued: int) -> None:
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"danswer-{name}"
+        )
+        self._slots = threading.Semaphore(max_workers + max_queued)
+        self._lock = threading.Lock()
+
+        self._running = 0
+        self._queued = 0
+        self._completed = 0
+        self._throttled_submits = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def in_worker_thread(self) -> bool:
+        return getattr(_WORKER_CONTEXT, "pool_name", None) == self.name
+
+    def submit(self, fn: Callable[..., R], *args: Any, **kwargs: Any) -> "Future[R]":
+        holds_slot = self._slots.acquire(blocking=False)
+        if not holds_slot:
+            with self._lock:
+                self._throttled_submits += 1
+            if not _in_event_loop_thread():
+                logger.debug(
+                    f"Thread pool '{self.name}' is saturated, waiting for a slot"
+                )
+                self._slots.acquire()
+                holds_slot = True
+        return self._submit(fn, args, kwargs, holds_slot)
+
+    def try_submit(
+        self, fn: Callable[..., R], *args: Any, **kwargs: Any
+    ) -> "Future[R] | None":
+        """Like submit but returns None instead of waiting if the pool is saturated"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._throttled_submits += 1
+            return None
+        return self._submit(fn, args, kwargs, holds_slot=True)
+
+    def _submit(
+        self,
+        fn: Callable[..., R],
+        args: tuple,
+        kwargs: dict[str, Any],
+        holds_slot: bool,
+    ) -> "Future[R]":
+        enqueued_at = time.monotonic()
+        started = threading.Event()
+
+        def _release() -> None:
+            if holds_slot:
+                self._slots.release()
+
+        def _run() -> R:
+            started.set()
+            wait_time = time.monotonic() - enqueued_at
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._total_wait += wait_time
+                self._max_wait = max(self._max_wait, wait_time)
+
+            _WORKER_CONTEXT.pool_name = self.name
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _WORKER_CONTEXT.pool_name = None
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+                _release()
+
+        def _on_done(future: "Future[R]") -> None:
+            # Tasks cancelled before starting never run _run, give their slot back here
+            if future.cancelled() and not started.is_set():
+                with self._lock:
+                    self._queued -= 1
+                _release()
+
+        with self._lock:
+            self._queued += 1
+        try:
+            future = self._executor.submit(_run)
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+            _release()
+            raise
+        future.add_done_callback(_on_done)
+        return future
+
+    def stats(self) -> ExecutorStats:
+        with self._lock:
+            return ExecutorStats(
+                name=self.name,
+                max_workers=self.max_workers,
+                max_queued=self.max_queued,
+                running=self._running,
+                queued=self._queued,
+                completed=self._completed,
+                throttled_submits=self._throttled_submits,
+                avg_wait_ms=(
+                    1000 * self._total_wait / self._completed
+                    if self._completed
+                    else 0.0
+                ),
+                max_wait_ms=1000 * self._max_wait,
+            )
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+
+_EXECUTORS: dict[ExecutorPoolName, BoundedExecutor] = {}
+_EXECUTORS_PID: int | None = None
+_EXECUTORS_LOCK = threading.Lock()
+
+
+def get_executor(pool: ExecutorPoolName = ExecutorPoolName.IO) -> BoundedExecutor:
+    """Returns the process-wide executor for the given pool. The worker threads of a pool
+    do not survive a fork, so the pools are rebuilt if called from a different process
+    than the one that created them (e.g. Celery / Dask workers)."""
+    global _EXECUTORS_PID
+    pid = os.getpid()
+    with _EXECUTORS_LOCK:
+        if _EXECUTORS_PID != pid:
+            _EXECUTORS.clear()
+            _EXECUTORS_PID = pid
+
+        executor = _EXECUTORS.get(pool)
+        if executor is None:
+            executor = BoundedExecutor(
+                name=pool.value,
+                max_workers=_POOL_MAX_WORKERS[pool],
+                max_queued=THREAD_POOL_MAX_QUEUED_TASKS,
+            )
+            _EXECUTORS[pool] = executor
+        return executor
+
+
+def get_executor_stats() -> list[ExecutorStats]:
+    return [get_executor(pool).stats() for pool in ExecutorPoolName]
+
+
+async def run_in_pool_async(
+    pool: ExecutorPoolName, func: Callable[..., R], *args: Any
+) -> R:
+    """asyncio counterpart of `asyncio.to_thread` which runs the blocking call on one of
+    the shared pools rather than the event loop's default executor"""
+    return await asyncio.wrap_future(get_executor(pool).submit(func, *args))
+
+
+def _run_tasks(
+    tasks: list[Callable[[], Any]],
+    task_names: list[str],
+    allow_failures: bool,
+    pool: ExecutorPoolName,
+    max_in_flight: int,
+) -> list[Any]:
+    """Runs the tasks on the shared pool with at most `max_in_flight` of them outstanding
+    at once and returns their results in order. A task which fails gives None if
+    `allow_failures`, otherwise the exception is raised and any tasks of this call that
+    have not started yet are cancelled."""
+    results: list[Any] = [None] * len(tasks)
+    executor = get_executor(pool)
+
+    if executor.in_worker_thread():
+        # Nested call from a worker of the same pool. Waiting on tasks queued behind this
+        # worker could deadlock the pool, so this worker runs (inline) any task that has not
+        # been picked up by another worker by the time its result is needed
+        futures = [executor.try_submit(task) for task in tasks]
+        try:
+            for index, (task, future) in enumerate(zip(tasks, futures)):
+                try:
+                    if future is None or future.cancel():
+                        results[index] = task()
+                    else:
+                        results[index] = future.result()
+                except Exception as e:
+                    logger.exception(f"{task_names[index]} failed due to {e}")
+                    if not allow_failures:
+                        raise
+        finally:
+            for future in futures:
+                if future is not None:
+                    future.cancel()
+        return results
+
+    pending: dict[Future, int] = {}
+    next_index = 0
+    try:
+        while next_index < len(tasks) or pending:
+            while next_index < len(tasks) and len(pending) < max_in_flight:
+                pending[executor.submit(tasks[next_index])] = next_index
+                next_index += 1
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    logger.exception(f"{task_names[index]} failed due to {e}")
+                    if not allow_failures:
+                        raise
+    finally:
+        for future in pending:
+            future.cancel()
+
+    return results
+
+
 def run_functions_tuples_in_parallel(
     functions_with_args: list[tuple[Callable, tuple]],
     allow_failures: bool = False,
     max_workers: int | None = None,
+    pool: ExecutorPoolName = ExecutorPoolName.IO,
 ) -> list[Any]:
     """
     Executes multiple functions in parallel and returns a list of the results for each function.
@@ -24,10 +301,11 @@ def run_functions_tuples_in_parallel(
     Args:
         functions_with_args: List of tuples each containing the function callable and a tuple of arguments.
         allow_failures: if set to True, then the function result will just be None
-        max_workers: Max number of worker threads
+        max_workers: Max number of functions of this call running at once
+        pool: The shared thread pool to run the functions on
 
     Returns:
-        dict: A dictionary mapping function names to their results or error messages.
+        list: The results of the functions, in the same order as the functions.
     """
     workers = (
         min(max_workers, len(functions_with_args))
@@ -38,26 +316,13 @@ def run_functions_tuples_in_parallel(
     if workers <= 0:
         return []
 
-    results = []
-    with ThreadPoolExecutor(max_workers=workers) as executor:
-        future_to_index = {
-            executor.submit(func, *args): i
-            for i, (func, args) in enumerate(functions_with_args)
-        }
-
-        for future in as_completed(future_to_index):
-            index = future_to_index[future]
-            try:
-                results.append((index, future.result()))
-            except Exception as e:
-                logger.exception(f"Function at index {index} failed due to {e}")
-                results.append((index, None))
-
-                if not allow_failures:
-                    raise
-
-    results.sort(key=lambda x: x[0])
-    return [result for index, result in results]
+    return _run_tasks(
+        tasks=[partial(func, *args) for func, args in functions_with_args],
+        task_names=[f"Function at index {i}" for i in range(len(functions_with_args))],
+        allow_failures=allow_failures,
+        pool=pool,
+        max_in_flight=workers,
+    )
 
 
 class FunctionCall(Generic[R]):
@@ -81,27 +346,25 @@ class FunctionCall(Generic[R]):
 def run_functions_in_parallel(
     function_calls: list[FunctionCall],
     allow_failures: bool = False,
+    pool: ExecutorPoolName = ExecutorPoolName.IO,
 ) -> dict[str, Any]:
     """
     Executes a list of FunctionCalls in parallel and stores the results in a dictionary where the keys
     are the result_id of the FunctionCall and the values are the results of the call.
     """
-    results = {}
-    with ThreadPoolExecutor(max_workers=len(function_calls)) as executor:
-        future_to_id = {
-            executor.submit(func_call.execute): func_call.result_id
-            for func_call in function_calls
-        }
-
-        for future in as_completed(future_to_id):
-            result_id = future_to_id[future]
-            try:
-                results[result_id] = future.result()
-            except Exception as e:
-                logger.exception(f"Function with ID {result_id} failed due to {e}")
-                results[result_id] = None
+    if not function_calls:
+        return {}
 
-                if not allow_failures:
-                    raise
-
-    return results
+    results = _run_tasks(
+        tasks=[func_call.execute for func_call in function_calls],
+        task_names=[
+            f"Function with ID {func_call.result_id}" for func_call in function_calls
+        ],
+        allow_failures=allow_failures,
+        pool=pool,
+        max_in_flight=len(function_calls),
+    )
+    return {
+        func_call.result_id: result
+        for func_call, result in zip(function_calls, results)
+    }
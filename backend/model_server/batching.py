@@ -0,0 +1,180 @@
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from collections.abc import Hashable
+from concurrent.futures import Future
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Generic
+from typing import TypeVar
+
+from pydantic import BaseModel
+
+from danswer.utils.logger import setup_logger
+
+logger = setup_logger()
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class BatcherStats(BaseModel):
+    name: str
+    queue_depth: int
+    queued_items: int
+    batches_run: int
+    items_run: int
+    requests_run: int
+    largest_batch: int
+    avg_queue_wait_ms: float
+
+
+@dataclass
+class _PendingRequest(Generic[T, R]):
+    group_key: Hashable
+    items: list[T]
+    future: "Future[list[R]]" = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class MicroBatcher(Generic[T, R]):
+    """Coalesces concurrent requests into a single model call. Requests that queue up while
+    a batch is running are merged (as long as they share the same group key, e.g. the same
+    embedding model) up to `max_batch_size` items, `process_batch` is run once over all of
+    the items and the results are split back to each caller. A lone request is run right
+    away, when several are queued the batch waits up to `max_wait_ms` from the oldest one
+    to fill up.
+
+    A single request is never split across batches so a request larger than
+    `max_batch_size` is run on its own."""
+
+    def __init__(
+        self,
+        name: str,
+        process_batch: Callable[[Hashable, list[T]], list[R]],
+        max_batch_size: int,
+        max_wait_ms: float,
+    ) -> None:
+        self.name = name
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._pending: deque[_PendingRequest[T, R]] = deque()
+        self._cond = threading.Condition()
+        self._worker: threading.Thread | None = None
+
+        self._batches_run = 0
+        self._items_run = 0
+        self._requests_run = 0
+        self._largest_batch = 0
+        self._total_queue_wait = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_batch_size > 1
+
+    def submit(self, group_key: Hashable, items: list[T]) -> list[R]:
+        """Blocks until the batch containing these items has been processed"""
+        if not items:
+            return []
+
+        if not self.enabled:
+            return self.process_batch(group_key, items)
+
+        request: _PendingRequest[T, R] = _PendingRequest(
+            group_key=group_key, items=items
+        )
+        with self._cond:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name=f"{self.name}-batcher", daemon=True
+                )
+                self._worker.start()
+            self._pending.append(request)
+            self._cond.notify()
+
+        return request.future.result()
+
+    def _take_batch(self) -> list[_PendingRequest[T, R]]:
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+
+            first = self._pending[0]
+            deadline = first.enqueued_at + self.max_wait
+            # Nothing to coalesce with, don't hold the request back
+            while len(self._pending) > 1:
+                num_items = sum(
+                    len(req.items)
+                    for req in self._pending
+                    if req.group_key == first.group_key
+                )
+                remaining = deadline - time.monotonic()
+                if num_items >= self.max_batch_size or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch: list[_PendingRequest[T, R]] = []
+            leftover: deque[_PendingRequest[T, R]] = deque()
+            batch_size = 0
+            for req in self._pending:
+                if req.group_key == first.group_key and (
+                    not batch or batch_size + len(req.items) <= self.max_batch_size
+                ):
+                    batch.append(req)
+                    batch_size += len(req.items)
+                else:
+                    leftover.append(req)
+            self._pending = leftover
+
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._take_batch()
+            start = time.monotonic()
+            all_items = [item for req in batch for item in req.items]
+
+            try:
+                results = self.process_batch(batch[0].group_key, all_items)
+                if len(results) != len(all_items):
+                    raise RuntimeError(
+                        f"{self.name} batch returned {len(results)} results "
+                        f"for {len(all_items)} items"
+                    )
+            except Exception as e:
+                logger.exception(f"{self.name} batch of {len(all_items)} items failed")
+                for req in batch:
+                    req.future.set_exception(e)
+                continue
+
+            with self._cond:
+                self._batches_run += 1
+                self._items_run += len(all_items)
+                self._requests_run += len(batch)
+                self._largest_batch = max(self._largest_batch, len(all_items))
+                self._total_queue_wait += sum(start - req.enqueued_at for req in batch)
+
+            offset = 0
+            for req in batch:
+                req.future.set_result(results[offset : offset + len(req.items)])
+                offset += len(req.items)
+
+    def stats(self) -> BatcherStats:
+        with self._cond:
+            return BatcherStats(
+                name=self.name,
+                queue_depth=len(self._pending),
+                queued_items=sum(len(req.items) for req in self._pending),
+                batches_run=self._batches_run,
+                items_run=self._items_run,
+                requests_run=self._requests_run,
+                largest_batch=self._largest_batch,
+                avg_queue_wait_ms=(
+                    1000 * self._total_queue_wait / self._requests_run
+                    if self._requests_run
+                    else 0.0
+                ),
+            )
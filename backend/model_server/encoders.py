@@ -1,13 +1,31 @@
+import hashlib
+from collections.abc import Hashable
+from typing import cast
 from typing import TYPE_CHECKING
 
+import numpy
 from fastapi import APIRouter
 from fastapi import HTTPException
+from fastapi import Response
 
 from danswer.configs.model_configs import CROSS_ENCODER_MODEL_ENSEMBLE
 from danswer.configs.model_configs import DOC_EMBEDDING_CONTEXT_SIZE
+from danswer.configs.model_configs import MODEL_SERVER_BATCH_MAX_WAIT_MS
+from danswer.configs.model_configs import MODEL_SERVER_EMBED_MAX_BATCH_SIZE
+from danswer.configs.model_configs import MODEL_SERVER_RERANK_CACHE_SIZE
+from danswer.configs.model_configs import MODEL_SERVER_RERANK_MAX_BATCH_SIZE
+from danswer.configs.model_configs import RERANK_SCORE_CACHE_TTL_SECONDS
 from danswer.search.search_nlp_models import get_local_reranking_model_ensemble
 from danswer.utils.logger import setup_logger
+from danswer.utils.lru_cache import CacheStats
+from danswer.utils.lru_cache import LRUTTLCache
 from danswer.utils.timing import log_function_time
+from model_server.batching import BatcherStats
+from model_server.batching import MicroBatcher
+from shared_models.binary_tensor import BINARY_TENSOR_MEDIA_TYPE
+from shared_models.binary_tensor import encode_matrix
+from shared_models.binary_tensor import TensorCompression
+from shared_models.binary_tensor import TensorDType
 from shared_models.model_server_models import EmbedRequest
 from shared_models.model_server_models import EmbedResponse
 from shared_models.model_server_models import RerankRequest
@@ -48,27 +66,81 @@ def get_embedding_model(
     return _GLOBAL_MODELS_DICT[model_name]
 
 
-@log_function_time(print_only=True)
-def embed_text(
-    texts: list[str], model_name: str, normalize_embeddings: bool
-) -> list[list[float]]:
+def _embed_batch(group_key: Hashable, texts: list[str]) -> numpy.ndarray:
+    """Returns a float32 matrix with one row per text, the batcher hands each request
+    its slice of the rows"""
+    model_name, normalize_embeddings = cast(tuple[str, bool], group_key)
     model = get_embedding_model(model_name=model_name)
     embeddings = model.encode(texts, normalize_embeddings=normalize_embeddings)
+    return numpy.asarray(embeddings, dtype=numpy.float32)
+
+
+def _rerank_batch(_: Hashable, pairs: list[tuple[str, str]]) -> list[list[float]]:
+    """Returns the score from each model of the ensemble for each query-passage pair"""
+    cross_encoders = get_local_reranking_model_ensemble()
+    sim_scores = [
+        encoder.predict(pairs).tolist() for encoder in cross_encoders  # type: ignore
+    ]
+    return [list(pair_scores) for pair_scores in zip(*sim_scores)]
+
+
+_EMBED_BATCHER: MicroBatcher[str, numpy.ndarray] = MicroBatcher(
+    name="embed",
+    process_batch=_embed_batch,  # type: ignore
+    max_batch_size=MODEL_SERVER_EMBED_MAX_BATCH_SIZE,
+    max_wait_ms=MODEL_SERVER_BATCH_MAX_WAIT_MS,
+)
+_RERANK_BATCHER: MicroBatcher[tuple[str, str], list[float]] = MicroBatcher(
+    name="rerank",
+    process_batch=_rerank_batch,
+    max_batch_size=MODEL_SERVER_RERANK_MAX_BATCH_SIZE,
+    max_wait_ms=MODEL_SERVER_BATCH_MAX_WAIT_MS,
+)
+
 
-    if not isinstance(embeddings, list):
-        embeddings = embeddings.tolist()
+@log_function_time(print_only=True)
+def embed_text(
+    texts: list[str], model_name: str, normalize_embeddings: bool
+) -> numpy.ndarray:
+    embeddings = _EMBED_BATCHER.submit((model_name, normalize_embeddings), texts)
+    if not texts:
+        return numpy.empty((0, 0), dtype=numpy.float32)
+    return cast(numpy.ndarray, embeddings)
+
+
+# (query, passage hash) -> score from each model of the ensemble
+_RERANK_SCORE_CACHE: LRUTTLCache[tuple[str, str], list[float]] = LRUTTLCache(
+    max_size=MODEL_SERVER_RERANK_CACHE_SIZE, ttl_seconds=RERANK_SCORE_CACHE_TTL_SECONDS
+)
+
+
+def _score_pairs(query: str, docs: list[str]) -> list[list[float]]:
+    """Returns the ensemble scores of each doc, only uncached docs are sent to the models"""
+    if not _RERANK_SCORE_CACHE.enabled:
+        return _RERANK_BATCHER.submit(None, [(query, doc) for doc in docs])
+
+    keys = [(query, hashlib.sha256(doc.encode()).hexdigest()) for doc in docs]
+    pair_scores = [_RERANK_SCORE_CACHE.get(key) for key in keys]
+    miss_inds = [ind for ind, scores in enumerate(pair_scores) if scores is None]
+    if miss_inds:
+        miss_scores = _RERANK_BATCHER.submit(
+            None, [(query, docs[ind]) for ind in miss_inds]
+        )
+        for ind, scores in zip(miss_inds, miss_scores):
+            _RERANK_SCORE_CACHE.put(keys[ind], scores)
+            pair_scores[ind] = scores
 
-    return embeddings
+    return cast(list[list[float]], pair_scores)
 
 
 @log_function_time(print_only=True)
 def calc_sim_scores(query: str, docs: list[str]) -> list[list[float]]:
-    cross_encoders = get_local_reranking_model_ensemble()
-    sim_scores = [
-        encoder.predict([(query, doc) for doc in docs]).tolist()  # type: ignore
-        for encoder in cross_encoders
-    ]
-    return sim_scores
+    if not docs:
+        return [[] for _ in CROSS_ENCODER_MODEL_ENSEMBLE]
+
+    pair_scores = _score_pairs(query, docs)
+    # Back to one list of scores per model of the ensemble
+    return [list(model_scores) for model_scores in zip(*pair_scores)]
 
 
 @router.post("/bi-encoder-embed")
@@ -81,7 +153,7 @@ def process_embed_request(
             model_name=embed_request.model_name,
             normalize_embeddings=embed_request.normalize_embeddings,
         )
-        return EmbedResponse(embeddings=embeddings)
+        return EmbedResponse(embeddings=embeddings.tolist())
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -97,6 +169,63 @@ def process_rerank_request(embed_request: RerankRequest) -> RerankResponse:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Binary counterparts of the endpoints above, the response is the matrix encoded with
+# shared_models.binary_tensor rather than JSON. Clients fall back to the JSON endpoints
+# when talking to a model server without these.
+@router.post("/bi-encoder-embed-binary")
+def process_embed_request_binary(
+    embed_request: EmbedRequest,
+    dtype: TensorDType = TensorDType.FLOAT32,
+    compression: TensorCompression = TensorCompression.NONE,
+) -> Response:
+    try:
+        embeddings = embed_text(
+            texts=embed_request.texts,
+            model_name=embed_request.model_name,
+            normalize_embeddings=embed_request.normalize_embeddings,
+        )
+        return Response(
+            content=encode_matrix(embeddings, dtype=dtype, compression=compression),
+            media_type=BINARY_TENSOR_MEDIA_TYPE,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/cross-encoder-scores-binary")
+def process_rerank_request_binary(
+    embed_request: RerankRequest,
+    dtype: TensorDType = TensorDType.FLOAT32,
+    compression: TensorCompression = TensorCompression.NONE,
+) -> Response:
+    try:
+        sim_scores = calc_sim_scores(
+            query=embed_request.query, docs=embed_request.documents
+        )
+        return Response(
+            content=encode_matrix(
+                numpy.asarray(sim_scores, dtype=numpy.float32).reshape(
+                    len(sim_scores), len(embed_request.documents)
+                ),
+                dtype=dtype,
+                compression=compression,
+            ),
+            media_type=BINARY_TENSOR_MEDIA_TYPE,
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/batching-stats")
+def get_batching_stats() -> list[BatcherStats]:
+    return [_EMBED_BATCHER.stats(), _RERANK_BATCHER.stats()]
+
+
+@router.get("/rerank-cache-stats")
+def get_rerank_cache_stats() -> CacheStats:
+    return _RERANK_SCORE_CACHE.stats()
+
+
 def warm_up_cross_encoders() -> None:
     logger.info(f"Warming up Cross-Encoders: {CROSS_ENCODER_MODEL_ENSEMBLE}")
 
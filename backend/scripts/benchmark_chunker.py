@@ -0,0 +1,171 @@
+# This file is purely for development use, not included in any builds
+# Benchmark of chunk_document on documents made of many small sections (like Slack threads
+# or Confluence tables), compared against the previous implementation which re-tokenized
+# the accumulated chunk for every section. Also checks that both produce the same chunks.
+# Run from the backend directory: python scripts/benchmark_chunker.py
+import argparse
+import random
+import string
+import timeit
+
+from danswer.configs.app_configs import BLURB_SIZE
+from danswer.configs.app_configs import CHUNK_OVERLAP
+from danswer.configs.constants import DocumentSource
+from danswer.configs.constants import SECTION_SEPARATOR
+from danswer.configs.constants import TITLE_SEPARATOR
+from danswer.configs.model_configs import DOC_EMBEDDING_CONTEXT_SIZE
+from danswer.connectors.models import Document
+from danswer.connectors.models import Section
+from danswer.indexing.chunker import chunk_document
+from danswer.indexing.chunker import chunk_large_section
+from danswer.indexing.chunker import extract_blurb
+from danswer.indexing.models import DocAwareChunk
+from danswer.search.search_nlp_models import get_default_tokenizer
+from danswer.utils.text_processing import shared_precompare_cleanup
+
+
+def _make_document(num_sections: int, max_words: int) -> Document:
+    def _word() -> str:
+        return "".join(random.choices(string.ascii_lowercase, k=random.randint(2, 9)))
+
+    sections = [
+        Section(
+            text=" ".join(_word() for _ in range(random.randint(1, max_words)))
+            + random.choice(["", ".", "?", ' "quoted"', "\n- item"]),
+            link=f"https://example.com/thread#{ind}",
+        )
+        for ind in range(num_sections)
+    ]
+    return Document(
+        id=f"doc_{num_sections}",
+        sections=sections,
+        source=DocumentSource.WEB,
+        semantic_identifier="Benchmark Document",
+        title="Benchmark Document",
+        metadata={},
+    )
+
+
+def _quadratic_chunk_document(
+    document: Document,
+    chunk_tok_size: int = DOC_EMBEDDING_CONTEXT_SIZE,
+    subsection_overlap: int = CHUNK_OVERLAP,
+    blurb_size: int = BLURB_SIZE,
+) -> list[DocAwareChunk]:
+    """chunk_document prior to tracking the token counts and offsets incrementally"""
+    title = document.get_title_for_document_index()
+    title_prefix = title.replace("\n", " ") + TITLE_SEPARATOR if title else ""
+    tokenizer = get_default_tokenizer()
+
+    chunks: list[DocAwareChunk] = []
+    link_offsets: dict[int, str] = {}
+    chunk_text = ""
+    for ind, section in enumerate(document.sections):
+        section_text = title_prefix + section.text if ind == 0 else section.text
+        section_link_text = section.link or ""
+
+        section_tok_length = len(tokenizer.tokenize(section_text))
+        current_tok_length = len(tokenizer.tokenize(chunk_text))
+        curr_offset_len = len(shared_precompare_cleanup(chunk_text))
+
+        if section_tok_length > chunk_tok_size:
+            if chunk_text:
+                chunks.append(
+                    DocAwareChunk(
+                        source_document=document,
+                        chunk_id=len(chunks),
+                        blurb=extract_blurb(chunk_text, blurb_size),
+                        content=chunk_text,
+                        source_links=link_offsets,
+                        section_continuation=False,
+                    )
+                )
+                link_offsets = {}
+                chunk_text = ""
+
+            chunks.extend(
+                chunk_large_section(
+                    section_text=section_text,
+                    section_link_text=section_link_text,
+                    document=document,
+                    start_chunk_id=len(chunks),
+                    tokenizer=tokenizer,
+                    chunk_size=chunk_tok_size,
+                    chunk_overlap=subsection_overlap,
+                    blurb_size=blurb_size,
+                )
+            )
+            continue
+
+        if (
+            current_tok_length
+            + len(tokenizer.tokenize(SECTION_SEPARATOR))
+            + section_tok_length
+            <= chunk_tok_size
+        ):
+            chunk_text += (
+                SECTION_SEPARATOR + section_text if chunk_text else section_text
+            )
+            link_offsets[curr_offset_len] = section_link_text
+        else:
+            chunks.append(
+                DocAwareChunk(
+                    source_document=document,
+                    chunk_id=len(chunks),
+                    blurb=extract_blurb(chunk_text, blurb_size),
+                    content=chunk_text,
+                    source_links=link_offsets,
+                    section_continuation=False,
+                )
+            )
+            link_offsets = {0: section_link_text}
+            chunk_text = section_text
+
+    if chunk_text.strip():
+        chunks.append(
+            DocAwareChunk(
+                source_document=document,
+                chunk_id=len(chunks),
+                blurb=extract_blurb(chunk_text, blurb_size),
+                content=chunk_text,
+                source_links=link_offsets,
+                section_continuation=False,
+            )
+        )
+    return chunks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sections",
+        type=int,
+        nargs="+",
+        default=[1_000, 5_000],
+        help="Number of sections per document",
+    )
+    parser.add_argument(
+        "--max-words", type=int, default=12, help="Max words in each section"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    random.seed(0)
+    # Load the tokenizer outside of the timed runs
+    get_default_tokenizer()
+    for num_sections in args.sections:
+        document = _make_document(num_sections, args.max_words)
+
+        if chunk_document(document) != _quadratic_chunk_document(document):
+            raise RuntimeError(f"Chunks differ for {num_sections} sections")
+
+        for name, func in [
+            ("previous", _quadratic_chunk_document),
+            ("incremental", chunk_document),
+        ]:
+            best = min(
+                timeit.repeat(
+                    lambda: func(document), number=1, repeat=args.repeat  # type: ignore
+                )
+            )
+            print(f"{num_sections:>7} sections | {name:<11} | {best * 1000:10.1f} ms")
@@ -0,0 +1,140 @@
+# This file is purely for development use, not included in any builds
+# Micro-benchmark of the search scoring stage (cross-encoder rerank scoring and retrieval
+# score boosting) over synthetic candidates, compared against the previous list based
+# implementation. Run from the backend directory: python scripts/benchmark_search_scoring.py
+import argparse
+import random
+import timeit
+
+import numpy
+
+from danswer.configs.constants import DocumentSource
+from danswer.configs.model_configs import CROSS_ENCODER_RANGE_MAX
+from danswer.configs.model_configs import CROSS_ENCODER_RANGE_MIN
+from danswer.document_index.document_index_utils import (
+    translate_boost_count_to_multiplier,
+)
+from danswer.indexing.models import InferenceChunk
+from danswer.search.scoring import chunk_boost_multipliers
+from danswer.search.scoring import chunk_recency_multipliers
+from danswer.search.scoring import chunk_retrieval_scores
+from danswer.search.scoring import score_boosted_retrieval_results
+from danswer.search.scoring import score_cross_encoder_results
+
+
+def _make_chunks(num_chunks: int) -> list[InferenceChunk]:
+    return [
+        InferenceChunk(
+            chunk_id=ind,
+            blurb="blurb",
+            content="content",
+            source_links=None,
+            section_continuation=False,
+            document_id=f"doc_{ind}",
+            source_type=DocumentSource.WEB,
+            semantic_identifier=f"Document {ind}",
+            boost=random.randint(-5, 5),
+            recency_bias=random.uniform(0.5, 1.0),
+            score=random.random(),
+            hidden=False,
+            metadata={},
+            match_highlights=[],
+            updated_at=None,
+        )
+        for ind in range(num_chunks)
+    ]
+
+
+def _list_based_rerank(
+    chunks: list[InferenceChunk], sim_scores_floats: list[list[float]]
+) -> list[InferenceChunk]:
+    """The scoring of semantic_reranking prior to being array backed"""
+    sim_scores = [numpy.array(scores) for scores in sim_scores_floats]
+    cross_models_min = numpy.min(sim_scores)
+    shifted_sim_scores = sum(
+        [enc_n_scores - cross_models_min for enc_n_scores in sim_scores]
+    ) / len(sim_scores)
+    boosts = [translate_boost_count_to_multiplier(chunk.boost) for chunk in chunks]
+    recency_multiplier = [chunk.recency_bias for chunk in chunks]
+    boosted_sim_scores = shifted_sim_scores * boosts * recency_multiplier
+    normalized_b_s_scores = (
+        boosted_sim_scores + cross_models_min - CROSS_ENCODER_RANGE_MIN
+    ) / (CROSS_ENCODER_RANGE_MAX - CROSS_ENCODER_RANGE_MIN)
+    scored_results = list(zip(normalized_b_s_scores, chunks))
+    scored_results.sort(key=lambda x: x[0], reverse=True)
+    ranked_sim_scores, ranked_chunks = zip(*scored_results)
+    for ind, chunk in enumerate(ranked_chunks):
+        chunk.score = ranked_sim_scores[ind]
+    return list(ranked_chunks)
+
+
+def _array_based_rerank(
+    chunks: list[InferenceChunk], sim_scores_floats: list[list[float]]
+) -> list[InferenceChunk]:
+    return score_cross_encoder_results(
+        sim_scores=numpy.asarray(sim_scores_floats, dtype=numpy.float64),
+        boosts=chunk_boost_multipliers(chunks),
+        recency=chunk_recency_multipliers(chunks),
+        model_min=CROSS_ENCODER_RANGE_MIN,
+        model_max=CROSS_ENCODER_RANGE_MAX,
+    ).apply(chunks)
+
+
+def _list_based_boost(chunks: list[InferenceChunk]) -> list[InferenceChunk]:
+    """The scoring of apply_boost prior to being array backed"""
+    scores = [chunk.score or 0.0 for chunk in chunks]
+    boosts = [translate_boost_count_to_multiplier(chunk.boost) for chunk in chunks]
+    recency_multiplier = [chunk.recency_bias for chunk in chunks]
+    norm_min = min(0.0, min(scores[:15]))
+    norm_max = max(1.0, max(scores[:15]))
+    norm_range = norm_max - norm_min
+    boosted_scores = [
+        max(0, (score - norm_min) * boost * recency / norm_range)
+        for score, boost, recency in zip(scores, boosts, recency_multiplier)
+    ]
+    rescored_chunks = list(zip(boosted_scores, chunks))
+    rescored_chunks.sort(key=lambda x: x[0], reverse=True)
+    sorted_boosted_scores, boost_sorted_chunks = zip(*rescored_chunks)
+    for ind, chunk in enumerate(boost_sorted_chunks):
+        chunk.score = sorted_boosted_scores[ind]
+    return list(boost_sorted_chunks)
+
+
+def _array_based_boost(chunks: list[InferenceChunk]) -> list[InferenceChunk]:
+    return score_boosted_retrieval_results(
+        scores=chunk_retrieval_scores(chunks),
+        boosts=chunk_boost_multipliers(chunks),
+        recency=chunk_recency_multipliers(chunks),
+        norm_cutoff=15,
+        norm_min=0.0,
+        norm_max=1.0,
+    ).apply(chunks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000], help="Candidate counts"
+    )
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(0)
+    for num_chunks in args.sizes:
+        chunks = _make_chunks(num_chunks)
+        sim_scores_floats = [
+            [random.uniform(-10, 10) for _ in range(num_chunks)] for _ in range(2)
+        ]
+
+        for name, func, func_args in [
+            ("rerank (list)", _list_based_rerank, (chunks, sim_scores_floats)),
+            ("rerank (array)", _array_based_rerank, (chunks, sim_scores_floats)),
+            ("boost (list)", _list_based_boost, (chunks,)),
+            ("boost (array)", _array_based_boost, (chunks,)),
+        ]:
+            best = min(
+                timeit.repeat(
+                    lambda: func(*func_args), number=1, repeat=args.repeat  # type: ignore
+                )
+            )
+            print(f"{num_chunks:>7} candidates | {name:<15} | {best * 1000:8.3f} ms")
@@ -0,0 +1,119 @@
+"""Compact binary encoding of the float matrices returned by the model server
+(embeddings, cross-encoder scores), used instead of nested JSON lists when both sides
+support it.
+
+Layout: a 16 byte little-endian header followed by the row-major matrix values
+    magic (4s) | version (B) | dtype (B) | compression (B) | reserved (x) | rows (I) | cols (I)
+The values are optionally compressed as a whole."""
+import gzip
+import struct
+from enum import Enum
+
+import numpy
+
+BINARY_TENSOR_MEDIA_TYPE = "application/x-danswer-tensor"
+
+_MAGIC = b"DTNS"
+_VERSION = 1
+_HEADER = struct.Struct("<4sBBBxII")
+
+
+class TensorDType(str, Enum):
+    FLOAT32 = "float32"
+    # Halves the payload, the precision loss is negligible for retrieval
+    FLOAT16 = "float16"
+
+
+class TensorCompression(str, Enum):
+    NONE = "none"
+    GZIP = "gzip"
+    # Requires the optional zstandard package on both sides
+    ZSTD = "zstd"
+
+
+_DTYPE_CODES = {TensorDType.FLOAT32: 0, TensorDType.FLOAT16: 1}
+_NUMPY_DTYPES = {TensorDType.FLOAT32: "<f4", TensorDType.FLOAT16: "<f2"}
+_COMPRESSION_CODES = {
+    TensorCompression.NONE: 0,
+    TensorCompression.GZIP: 1,
+    TensorCompression.ZSTD: 2,
+}
+_DTYPES_BY_CODE = {code: dtype for dtype, code in _DTYPE_CODES.items()}
+_COMPRESSIONS_BY_CODE = {
+    code: compression for compression, code in _COMPRESSION_CODES.items()
+}
+
+
+def zstd_available() -> bool:
+    try:
+        import zstandard  # type: ignore # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _compress(data: bytes, compression: TensorCompression) -> bytes:
+    if compression == TensorCompression.GZIP:
+        # Float data barely compresses, favor speed
+        return gzip.compress(data, compresslevel=1)
+    if compression == TensorCompression.ZSTD:
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=1).compress(data)
+    return data
+
+
+def _decompress(data: bytes, compression: TensorCompression) -> bytes:
+    if compression == TensorCompression.GZIP:
+        return gzip.decompress(data)
+    if compression == TensorCompression.ZSTD:
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompress(data)
+    return data
+
+
+def encode_matrix(
+    matrix: numpy.ndarray,
+    dtype: TensorDType = TensorDType.FLOAT32,
+    compression: TensorCompression = TensorCompression.NONE,
+) -> bytes:
+    """Falls back to no compression if zstd is requested but not installed"""
+    if matrix.ndim != 2:
+        raise ValueError(f"Expected a 2D matrix, got {matrix.ndim} dimensions")
+    if compression == TensorCompression.ZSTD and not zstd_available():
+        compression = TensorCompression.NONE
+
+    values = numpy.ascontiguousarray(matrix, dtype=_NUMPY_DTYPES[dtype]).tobytes()
+    header = _HEADER.pack(
+        _MAGIC,
+        _VERSION,
+        _DTYPE_CODES[dtype],
+        _COMPRESSION_CODES[compression],
+        matrix.shape[0],
+        matrix.shape[1],
+    )
+    return header + _compress(values, compression)
+
+
+def decode_matrix(data: bytes) -> numpy.ndarray:
+    """Returns a float32 matrix regardless of the dtype used on the wire"""
+    if len(data) < _HEADER.size:
+        raise ValueError("Binary tensor is shorter than its header")
+
+    magic, version, dtype_code, compression_code, rows, cols = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError("Not a binary tensor of a supported version")
+
+    dtype = _DTYPES_BY_CODE.get(dtype_code)
+    if dtype is None:
+        raise ValueError(f"Unknown binary tensor dtype code {dtype_code}")
+    compression = _COMPRESSIONS_BY_CODE.get(compression_code)
+    if compression is None:
+        raise ValueError(f"Unknown binary tensor compression code {compression_code}")
+    values = _decompress(data[_HEADER.size :], compression)
+    return (
+        numpy.frombuffer(values, dtype=_NUMPY_DTYPES[dtype])
+        .reshape(rows, cols)
+        .astype(numpy.float32, copy=False)
+    )
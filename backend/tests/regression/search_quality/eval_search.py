@@ -12,6 +12,7 @@ from danswer.chat.chunk_expansion_util import extend_chunks
 from danswer.db.embedding_model import get_current_db_embedding_model
 from danswer.db.engine import get_sqlalchemy_engine
 from danswer.document_index.factory import get_default_document_index
+from danswer.document_index.vespa.index import VespaIndex
 from danswer.indexing.models import InferenceChunk
 from danswer.search.models import IndexFilters
 from danswer.search.models import RerankMetricsContainer
@@ -77,6 +78,7 @@ def word_wrap(s: str, max_line_size: int = 100, prepend_tab: bool = True) -> str
 
 def get_search_results(
     query: str,
+    exact_nearest_neighbor: bool = False,
 ) -> tuple[
     list[InferenceChunk],
     RetrievalMetricsContainer | None,
@@ -103,6 +105,8 @@ def get_search_results(
     document_index = get_default_document_index(
         primary_index_name=embedding_model.index_name, secondary_index_name=None
     )
+    if exact_nearest_neighbor and isinstance(document_index, VespaIndex):
+        document_index.approximate_nearest_neighbor = False
 
     top_chunks, llm_chunk_selection = full_chunk_search(
         query=search_query,
@@ -174,6 +178,7 @@ def main(
     show_details: bool,
     enable_llm: bool,
     stop_after: int,
+    exact_nearest_neighbor: bool,
 ) -> None:
     questions_info = read_json(questions_json)
 
@@ -183,7 +188,11 @@ def main(
 
     with open(output_file, "w") as outfile:
         with redirect_print_to_file(outfile):
-            print("Running Document Retrieval Test\n")
+            print("Running Document Retrieval Test")
+            print(
+                "Nearest neighbor search: "
+                f"{'exact' if exact_nearest_neighbor else 'approximate'}\n"
+            )
             for ind, (question, targets) in enumerate(questions_info.items()):
                 if ind >= stop_after:
                     break
@@ -194,7 +203,9 @@ def main(
                     top_chunks,
                     retrieval_metrics,
                     rerank_metrics,
-                ) = get_search_results(query=question)
+                ) = get_search_results(
+                    query=question, exact_nearest_neighbor=exact_nearest_neighbor
+                )
 
                 assert retrieval_metrics is not None and rerank_metrics is not None
 
@@ -262,6 +273,13 @@ if __name__ == "__main__":
         help="Stop processing after this many iterations.",
         default=100,
     )
+    parser.add_argument(
+        "--exact_nearest_neighbor",
+        action="store_true",
+        help="If set, disable approximate (HNSW) nearest neighbor search. Compare the "
+        "results with a run without it to measure the recall of the HNSW index.",
+        default=False,
+    )
     args = parser.parse_args()
 
     main(
@@ -270,4 +288,5 @@ if __name__ == "__main__":
         args.show_details,
         args.enable_llm,
         args.stop_after,
+        args.exact_nearest_neighbor,
     )
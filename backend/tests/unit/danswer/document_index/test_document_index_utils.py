@@ -0,0 +1,26 @@
+import unittest
+
+from danswer.document_index.document_index_utils import merge_chunk_windows
+
+
+class TestMergeChunkWindows(unittest.TestCase):
+    def test_windows_are_clamped_and_merged(self) -> None:
+        self.assertEqual(
+            merge_chunk_windows([("a", 1), ("a", 10), ("a", 4), ("b", 0)], 2),
+            {"a": [(0, 6), (8, 12)], "b": [(0, 2)]},
+        )
+
+    def test_adjacent_and_duplicate_chunks(self) -> None:
+        # Ranges that touch are merged, repeated chunks are only counted once
+        self.assertEqual(
+            merge_chunk_windows([("a", 5), ("a", 2), ("a", 5)], 1),
+            {"a": [(1, 6)]},
+        )
+        self.assertEqual(
+            merge_chunk_windows([("a", 3), ("a", 0)], 0), {"a": [(0, 0), (3, 3)]}
+        )
+        self.assertEqual(merge_chunk_windows([], 3), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
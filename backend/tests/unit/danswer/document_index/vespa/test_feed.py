@@ -0,0 +1,85 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock
+from unittest.mock import patch
+
+import httpx
+
+from danswer.document_index.vespa.feed import _FeedSession
+from danswer.document_index.vespa.feed import feed_async
+from danswer.document_index.vespa.feed import FeedError
+from danswer.document_index.vespa.feed import FeedOperation
+
+_MODULE = "danswer.document_index.vespa.feed"
+
+
+class TestFeedRetries(unittest.TestCase):
+    def setUp(self) -> None:
+        # Status codes answered to the operation, in order, then 200
+        self.status_codes: list[int] = []
+        self.num_requests = 0
+        self.sleep = AsyncMock()
+
+        for target, kwargs in [
+            ("asyncio.sleep", {"new": self.sleep}),
+            # No jitter, each retry waits exactly the current delay
+            ("random.random", {"return_value": 0.5}),
+            ("_get_feed_session", {"side_effect": self._feed_session}),
+        ]:
+            target_patch = patch(f"{_MODULE}.{target}", **kwargs)
+            target_patch.start()
+            self.addCleanup(target_patch.stop)
+
+    def _feed_session(self) -> _FeedSession:
+        return _FeedSession(
+            http_client=httpx.AsyncClient(transport=httpx.MockTransport(self._handle)),
+            concurrency_limits={},
+        )
+
+    def _handle(self, request: httpx.Request) -> httpx.Response:
+        self.num_requests += 1
+        status_code = self.status_codes.pop(0) if self.status_codes else 200
+        return httpx.Response(status_code, json={})
+
+    def _feed(self) -> None:
+        operation = FeedOperation(
+            method="PUT", url="http://vespa/document/v1/doc", body={}, description="doc"
+        )
+        asyncio.run(feed_async([operation], max_concurrency=4))
+
+    def _sleep_delays(self) -> list[float]:
+        return [call.args[0] for call in self.sleep.await_args_list]
+
+    def test_throttled_operations_are_retried_with_backoff(self) -> None:
+        self.status_codes = [429, 503, 429]
+        self._feed()
+
+        self.assertEqual(self.num_requests, 4)
+        self.assertEqual(self._sleep_delays(), [0.5, 1.0, 2.0])
+
+    def test_backoff_is_capped(self) -> None:
+        self.status_codes = [503] * 6
+        with patch(f"{_MODULE}._MAX_RETRY_DELAY", 2.0):
+            self._feed()
+
+        self.assertEqual(self._sleep_delays(), [0.5, 1.0, 2.0, 2.0, 2.0, 2.0])
+
+    def test_gives_up_after_max_retries(self) -> None:
+        self.status_codes = [503] * 10
+        with patch(f"{_MODULE}._MAX_RETRIES", 3):
+            with self.assertRaises(FeedError):
+                self._feed()
+
+        self.assertEqual(self.num_requests, 4)
+
+    def test_other_errors_are_not_retried(self) -> None:
+        self.status_codes = [400]
+        with self.assertRaises(FeedError):
+            self._feed()
+
+        self.assertEqual(self.num_requests, 1)
+        self.sleep.assert_not_awaited()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,290 @@
+import concurrent.futures
+import gzip
+import json
+import os
+import re
+import unittest
+from collections.abc import Callable
+from typing import Any
+from unittest.mock import patch
+
+import httpx
+
+from danswer.document_index.document_index_utils import get_uuid_from_chunk_info
+from danswer.document_index.vespa.feed import FeedOperation
+from danswer.document_index.vespa.index import _build_embedding_indexing
+from danswer.document_index.vespa.index import _delete_vespa_docs
+from danswer.document_index.vespa.index import _encode_query_body
+from danswer.document_index.vespa.index import _encode_query_tensor
+from danswer.document_index.vespa.index import _get_existing_document_ids
+from danswer.document_index.vespa.index import _get_max_chunk_ids
+from danswer.document_index.vespa.index import _get_vespa_chunk_ids_by_document_ids
+from danswer.document_index.vespa.index import EMBEDDING_INDEXING_REPLACEMENT_PAT
+from danswer.document_index.vespa.index import VespaIndex
+
+_MODULE = "danswer.document_index.vespa.index"
+
+Handler = Callable[[dict[str, Any]], dict[str, Any]]
+
+
+def _mock_http_client(handler: Handler, requests: list[dict[str, Any]]) -> httpx.Client:
+    """Client answering each search request with `handler(request body)`"""
+
+    def _handle(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        return httpx.Response(200, json=handler(body))
+
+    return httpx.Client(transport=httpx.MockTransport(_handle))
+
+
+def _hits_response(document_ids: list[str]) -> dict[str, Any]:
+    return {
+        "root": {
+            "children": [
+                {"fields": {"document_id": document_id}} for document_id in document_ids
+            ]
+        }
+    }
+
+
+def _grouping_response(max_chunk_ids: dict[str, int]) -> dict[str, Any]:
+    """Vespa's answer to a grouping of the chunks by document id, with the highest chunk
+    id of each document. Documents without chunks in the index have no group"""
+    return {
+        "root": {
+            "fields": {"totalCount": sum(max_chunk_ids.values()) + len(max_chunk_ids)},
+            "children": [
+                {
+                    "id": "group:root:0",
+                    "children": [
+                        {
+                            "id": "grouplist:document_id",
+                            "label": "document_id",
+                            "children": [
+                                {
+                                    "id": f"group:string:{document_id}",
+                                    "value": document_id,
+                                    "fields": {"max(chunk_id)": max_chunk_id},
+                                }
+                                for document_id, max_chunk_id in max_chunk_ids.items()
+                            ],
+                        }
+                    ],
+                }
+            ],
+        }
+    }
+
+
+def _chunk_ids(document_id: str, num_chunks: int) -> list[str]:
+    return [
+        str(get_uuid_from_chunk_info(document_id, chunk_id))
+        for chunk_id in range(num_chunks)
+    ]
+
+
+class TestGetExistingDocumentIds(unittest.TestCase):
+    def setUp(self) -> None:
+        self.requests: list[dict[str, Any]] = []
+
+    def _existing_ids(self, document_ids: list[str], hit_ids: list[str]) -> set[str]:
+        with _mock_http_client(
+            lambda _: _hits_response(hit_ids), self.requests
+        ) as http_client:
+            return _get_existing_document_ids(
+                document_ids, "danswer_chunk", http_client
+            )
+
+    def test_one_query_for_the_batch(self) -> None:
+        existing_ids = self._existing_ids(["a", "b", "c"], ["a", "c"])
+
+        self.assertEqual(existing_ids, {"a", "c"})
+        self.assertEqual(len(self.requests), 1)
+        self.assertIn("chunk_id = 0", self.requests[0]["yql"])
+        self.assertEqual(self.requests[0]["presentation.summary"], "ids_only")
+
+    def test_trailing_slash_spellings(self) -> None:
+        # Chunk ids ignore a trailing slash, so either spelling means the document exists
+        self.assertEqual(self._existing_ids(["a/", "b", "c"], ["a", "b/"]), {"a/", "b"})
+
+    def test_quotes_are_escaped(self) -> None:
+        self._existing_ids(["it's"], [])
+        self.assertIn("'it\\'s'", self.requests[0]["yql"])
+
+    def test_no_documents(self) -> None:
+        self.assertEqual(self._existing_ids([], []), set())
+        self.assertEqual(self.requests, [])
+
+
+class TestGetChunkIds(unittest.TestCase):
+    def setUp(self) -> None:
+        self.requests: list[dict[str, Any]] = []
+
+    def test_grouping_response_is_parsed(self) -> None:
+        with _mock_http_client(
+            lambda _: _grouping_response({"a": 3, "b/": 0}), self.requests
+        ) as http_client:
+            max_chunk_ids = _get_max_chunk_ids(
+                ["a", "b/", "missing"], "danswer_chunk", http_client
+            )
+
+        # Documents that are not in the index have no group and are left out
+        self.assertEqual(max_chunk_ids, {"a": 3, "b/": 0})
+        self.assertEqual(len(self.requests), 1)
+        self.assertIn("max(chunk_id)", self.requests[0]["yql"])
+        self.assertEqual(self.requests[0]["hits"], 0)
+
+    def test_no_document_in_the_index(self) -> None:
+        for response in [
+            {"root": {"fields": {"totalCount": 0}}},
+            _grouping_response({}),
+        ]:
+            with _mock_http_client(lambda _: response, []) as http_client:
+                self.assertEqual(
+                    _get_max_chunk_ids(["missing"], "danswer_chunk", http_client), {}
+                )
+
+    def test_chunk_ids_cover_gaps(self) -> None:
+        # A partially failed feed may have left only some of the chunks, every id up to
+        # the highest one is returned so that none of them is skipped
+        with (
+            concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor,
+            _mock_http_client(
+                lambda _: _grouping_response({"a": 3, "b": 1}), self.requests
+            ) as http_client,
+        ):
+            chunk_ids = _get_vespa_chunk_ids_by_document_ids(
+                ["a", "b", "a", "missing"], "danswer_chunk", http_client, executor
+            )
+
+        self.assertEqual(chunk_ids, {"a": _chunk_ids("a", 4), "b": _chunk_ids("b", 2)})
+        # Duplicate document ids are only looked up once
+        self.assertEqual(self.requests[0]["yql"].count("'a'"), 1)
+
+
+class TestDeleteVespaDocs(unittest.TestCase):
+    def setUp(self) -> None:
+        self.fed_batches: list[list[FeedOperation]] = []
+        feed_patch = patch(f"{_MODULE}.feed", side_effect=self.fed_batches.append)
+        feed_patch.start()
+        self.addCleanup(feed_patch.stop)
+
+    def _delete(self, document_ids: list[str], max_chunk_ids: dict[str, int]) -> None:
+        with _mock_http_client(
+            lambda _: _grouping_response(max_chunk_ids), []
+        ) as http_client:
+            _delete_vespa_docs(document_ids, "danswer_chunk", http_client)
+
+    def test_every_chunk_up_to_the_highest_is_deleted(self) -> None:
+        self._delete(["a", "b", "missing"], {"a": 3, "b": 0})
+
+        operations = [operation for batch in self.fed_batches for operation in batch]
+        self.assertTrue(all(operation.method == "DELETE" for operation in operations))
+        self.assertEqual(
+            sorted(operation.url.rsplit("/", 1)[-1] for operation in operations),
+            sorted(_chunk_ids("a", 4) + _chunk_ids("b", 1)),
+        )
+        self.assertTrue(
+            all("/danswer_chunk/docid/" in operation.url for operation in operations)
+        )
+
+    def test_deleted_in_batches_of_documents(self) -> None:
+        with patch(f"{_MODULE}._DELETE_BATCH_SIZE", 2):
+            self._delete(["a", "b", "c"], {"a": 1, "b": 1, "c": 1})
+
+        self.assertEqual([len(batch) for batch in self.fed_batches], [4, 2])
+
+
+class TestHnswIndex(unittest.TestCase):
+    def _schema(self, hnsw_index: bool) -> str:
+        schema_file = os.path.join(
+            "danswer",
+            "document_index",
+            "vespa",
+            "app_config",
+            "schemas",
+            "danswer_chunk.sd",
+        )
+        with open(schema_file, "r") as schema_f:
+            return schema_f.read().replace(
+                EMBEDDING_INDEXING_REPLACEMENT_PAT,
+                _build_embedding_indexing(hnsw_index),
+            )
+
+    def _embedding_fields(self, schema: str) -> list[str]:
+        return re.findall(
+            r"field (?:title_embedding|embeddings) type .*?\n {8}\}", schema, re.DOTALL
+        )
+
+    def test_schema_without_hnsw(self) -> None:
+        schema = self._schema(hnsw_index=False)
+
+        self.assertNotIn(EMBEDDING_INDEXING_REPLACEMENT_PAT, schema)
+        self.assertNotIn("hnsw", schema)
+        embedding_fields = self._embedding_fields(schema)
+        self.assertEqual(len(embedding_fields), 2)
+        for field in embedding_fields:
+            self.assertIn("indexing: attribute\n", field)
+            self.assertIn("distance-metric: angular", field)
+
+    def test_schema_with_hnsw(self) -> None:
+        schema = self._schema(hnsw_index=True)
+
+        self.assertNotIn(EMBEDDING_INDEXING_REPLACEMENT_PAT, schema)
+        # Both the title and the content embeddings get a graph, and stay attributes with
+        # their distance metric so that exact search keeps working
+        embedding_fields = self._embedding_fields(schema)
+        self.assertEqual(len(embedding_fields), 2)
+        for field in embedding_fields:
+            self.assertIn("indexing: attribute | index\n", field)
+            self.assertIn("hnsw {", field)
+            self.assertIn("max-links-per-node: ", field)
+            self.assertIn("neighbors-to-explore-at-insert: ", field)
+            self.assertIn("distance-metric: angular", field)
+        self.assertEqual(schema.count("hnsw {"), 2)
+
+    def test_nearest_neighbor_annotation(self) -> None:
+        for approximate, explore_additional_hits, expected in [
+            (False, 100, "{targetHits: 10, approximate: false}"),
+            (True, 0, "{targetHits: 10}"),
+            (True, 100, "{targetHits: 10, hnsw.exploreAdditionalHits: 100}"),
+        ]:
+            index = VespaIndex(
+                index_name="danswer_chunk",
+                secondary_index_name=None,
+                approximate_nearest_neighbor=approximate,
+                hnsw_explore_additional_hits=explore_additional_hits,
+            )
+            self.assertEqual(index._nearest_neighbor_annotation(10), expected)
+
+
+class TestQueryEncoding(unittest.TestCase):
+    def test_hex_query_tensor(self) -> None:
+        with patch(f"{_MODULE}.VESPA_HEX_QUERY_TENSORS", True):
+            # Big-endian float32: 1.0 = 3F800000, -2.0 = C0000000, 0.5 = 3F000000
+            self.assertEqual(
+                _encode_query_tensor([1.0, -2.0, 0.5]), "3F800000C00000003F000000"
+            )
+            # Values are rounded to float32, 0.1 = 3DCCCCCD
+            self.assertEqual(_encode_query_tensor([0.1]), "3DCCCCCD")
+
+    def test_list_query_tensor(self) -> None:
+        with patch(f"{_MODULE}.VESPA_HEX_QUERY_TENSORS", False):
+            self.assertEqual(_encode_query_tensor([1.0, -2.0]), "[1.0, -2.0]")
+
+    def test_large_query_bodies_are_gzipped(self) -> None:
+        query_body: dict[str, str | int | float] = {"yql": "select *", "hits": 10}
+        with patch(f"{_MODULE}.VESPA_GZIP_REQUEST_MIN_BYTES", 64):
+            content, headers = _encode_query_body(query_body)
+            self.assertEqual(json.loads(content), query_body)
+            self.assertNotIn("Content-Encoding", headers)
+
+            query_body["input.query(query_embedding)"] = "3F800000" * 16
+            content, headers = _encode_query_body(query_body)
+            self.assertEqual(headers["Content-Encoding"], "gzip")
+            self.assertEqual(json.loads(gzip.decompress(content)), query_body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,208 @@
+import re
+import unittest
+from unittest.mock import patch
+
+from danswer.configs.constants import DocumentSource
+from danswer.connectors.models import Document
+from danswer.connectors.models import Section
+from danswer.indexing.chunker import chunk_document
+from danswer.indexing.chunker import DefaultChunker
+from danswer.indexing.chunker import extract_blurb
+from danswer.indexing.chunker import ProcessPoolChunker
+from danswer.indexing.chunker import shutdown_chunking_pool
+from danswer.indexing.chunker import tokenizer_splits_on_whitespace
+
+_MODULE = "danswer.indexing.chunker"
+
+
+class _WordSentenceSplitter:
+    """Greedily packs whole sentences into pieces of at most chunk_size words, like the
+    sentence aware splitter does with tokens"""
+
+    def __init__(self, chunk_size: int) -> None:
+        self.chunk_size = chunk_size
+        self.split_lengths: list[int] = []
+
+    def split_text(self, text: str) -> list[str]:
+        self.split_lengths.append(len(text))
+        pieces: list[list[str]] = [[]]
+        for sentence in text.split(". "):
+            words = sentence.split()
+            if pieces[-1] and len(pieces[-1]) + len(words) > self.chunk_size:
+                pieces.append([])
+            pieces[-1].extend(words)
+        return [" ".join(piece) for piece in pieces]
+
+
+class _WordTokenizer:
+    def tokenize(self, text: str) -> list[str]:
+        return text.split()
+
+
+def _patch_splitting(
+    test_case: unittest.TestCase, chunk_size: int
+) -> _WordSentenceSplitter:
+    splitter = _WordSentenceSplitter(chunk_size)
+    for target, value in [
+        ("get_sentence_splitter", splitter),
+        ("get_default_tokenizer", _WordTokenizer()),
+    ]:
+        target_patch = patch(f"{_MODULE}.{target}", return_value=value)
+        target_patch.start()
+        test_case.addCleanup(target_patch.stop)
+    return splitter
+
+
+class TestExtractBlurb(unittest.TestCase):
+    def setUp(self) -> None:
+        self.splitter = _patch_splitting(self, chunk_size=16)
+
+    def _text(self, num_sentences: int) -> str:
+        return ". ".join(
+            " ".join(f"w{sentence}x{word}" for word in range(1 + sentence % 7))
+            for sentence in range(num_sentences)
+        )
+
+    def test_blurb_is_first_piece_of_full_split(self) -> None:
+        for num_sentences in [1, 5, 20, 100, 500, 2000]:
+            text = self._text(num_sentences)
+            expected = _WordSentenceSplitter(chunk_size=16).split_text(text)[0]
+            self.assertEqual(extract_blurb(text, 16), expected, msg=num_sentences)
+
+    def test_chunk_sized_text_is_split_once(self) -> None:
+        text = self._text(20)
+        extract_blurb(text, 16)
+        self.assertEqual(self.splitter.split_lengths, [len(text)])
+
+        # Only a prefix of long text is split
+        self.splitter.split_lengths.clear()
+        extract_blurb(self._text(2000), 16)
+        self.assertEqual(len(self.splitter.split_lengths), 1)
+        self.assertLess(self.splitter.split_lengths[0], len(self._text(2000)))
+
+
+class TestProcessPoolChunker(unittest.TestCase):
+    def setUp(self) -> None:
+        # Set up before the pool is started so that its forked workers are patched too
+        _patch_splitting(self, chunk_size=64)
+        start_method_patch = patch(f"{_MODULE}._CHUNKING_POOL_START_METHOD", "fork")
+        start_method_patch.start()
+        self.addCleanup(start_method_patch.stop)
+        self.addCleanup(shutdown_chunking_pool)
+
+    def _document(self, doc_ind: int) -> Document:
+        # Mix of short sections that are combined and long ones that are split up
+        sections = [
+            Section(
+                text=f"doc {doc_ind} section {ind}. " * (2 + 150 * (ind % 4 == 3)),
+                link=f"link {ind}",
+            )
+            for ind in range(doc_ind % 5 + 1)
+        ]
+        return Document(
+            id=f"doc {doc_ind}",
+            sections=sections,
+            source=DocumentSource.WEB,
+            semantic_identifier=f"doc {doc_ind}",
+            metadata={},
+        )
+
+    def test_same_chunks_as_default_chunker(self) -> None:
+        documents = [self._document(doc_ind) for doc_ind in range(12)]
+        expected = DefaultChunker().chunk_batch(documents)
+        chunks = ProcessPoolChunker(num_processes=2).chunk_batch(documents)
+
+        self.assertEqual(
+            [(chunk.source_document.id, chunk.chunk_id) for chunk in chunks],
+            [(chunk.source_document.id, chunk.chunk_id) for chunk in expected],
+        )
+        self.assertEqual(chunks, expected)
+        self.assertTrue(
+            all(
+                chunk.source_document is expected_chunk.source_document
+                for chunk, expected_chunk in zip(chunks, expected)
+            )
+        )
+
+
+class _PreTokenizer:
+    def __init__(self, pattern: str) -> None:
+        self.pattern = pattern
+
+    def pre_tokenize_str(self, text: str) -> list[tuple[str, tuple[int, int]]]:
+        return [
+            (match.group(), match.span()) for match in re.finditer(self.pattern, text)
+        ]
+
+
+class _BackendTokenizer:
+    def __init__(self, pre_tokenizer: _PreTokenizer) -> None:
+        self.pre_tokenizer = pre_tokenizer
+
+
+class _WhitespaceFoldingTokenizer:
+    """Counts the whitespace between two words as a token of its own but drops leading
+    and trailing whitespace, so a text's tokens are not the sum of those of its parts"""
+
+    def tokenize(self, text: str) -> list[str]:
+        return re.findall(r"\S+|(?<=\S)\s+(?=\S)", text)
+
+
+class TestChunkTokenCounts(unittest.TestCase):
+    def _document(self) -> Document:
+        return Document(
+            id="doc",
+            sections=[
+                Section(text=" ".join(["word"] * (ind % 4 + 1)), link=f"link {ind}")
+                for ind in range(30)
+            ],
+            source=DocumentSource.WEB,
+            semantic_identifier="doc",
+            metadata={},
+        )
+
+    def test_tokenizer_splits_on_whitespace(self) -> None:
+        word_pieces = _WordTokenizer()
+        word_pieces.backend_tokenizer = _BackendTokenizer(  # type: ignore
+            _PreTokenizer(r"\S+")
+        )
+        self.assertTrue(tokenizer_splits_on_whitespace(word_pieces))
+
+        metaspace = _WordTokenizer()
+        metaspace.backend_tokenizer = _BackendTokenizer(  # type: ignore
+            _PreTokenizer(r"\s*\S+")
+        )
+        self.assertFalse(tokenizer_splits_on_whitespace(metaspace))
+
+        # Without a pre-tokenizer to check, the token counts are not assumed additive
+        self.assertFalse(tokenizer_splits_on_whitespace(_WordTokenizer()))
+
+    def test_incremental_counts_match_retokenizing(self) -> None:
+        _patch_splitting(self, chunk_size=64)
+        document = self._document()
+        with patch(f"{_MODULE}.tokenizer_splits_on_whitespace", return_value=True):
+            incremental_chunks = chunk_document(document, chunk_tok_size=12)
+        with patch(f"{_MODULE}.tokenizer_splits_on_whitespace", return_value=False):
+            retokenized_chunks = chunk_document(document, chunk_tok_size=12)
+
+        self.assertGreater(len(incremental_chunks), 1)
+        self.assertEqual(incremental_chunks, retokenized_chunks)
+
+    def test_chunks_within_chunk_size_for_non_additive_tokenizer(self) -> None:
+        _patch_splitting(self, chunk_size=64)
+        tokenizer = _WhitespaceFoldingTokenizer()
+        tokenizer_patch = patch(
+            f"{_MODULE}.get_default_tokenizer", return_value=tokenizer
+        )
+        tokenizer_patch.start()
+        self.addCleanup(tokenizer_patch.stop)
+
+        chunks = chunk_document(self._document(), chunk_tok_size=12)
+
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(len(tokenizer.tokenize(chunk.content)), 12)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+
+import numpy
+
+from danswer.indexing.embedding_cache import EmbeddingCache
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.temp_dir.name, "embeddings.sqlite3")
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_keys_depend_on_model_settings(self) -> None:
+        cache = EmbeddingCache(self.path, "model", True, "passage: ")
+        cache.put_many(
+            cache.build_keys(["a", "b"]),
+            [numpy.array([0.5, 1.0]), numpy.array([0.25, -2.0])],
+        )
+
+        self.assertEqual(
+            [
+                embedding.tolist() if embedding is not None else None
+                for embedding in cache.get_many(cache.build_keys(["b", "c", "a"]))
+            ],
+            [[0.25, -2.0], None, [0.5, 1.0]],
+        )
+        stats = cache.stats()
+        self.assertEqual((stats.hits, stats.misses), (2, 1))
+
+        other_prefix = EmbeddingCache(self.path, "model", True, None)
+        self.assertEqual(other_prefix.get_many(other_prefix.build_keys(["a"])), [None])
+
+    def test_evicts_least_recently_used(self) -> None:
+        # Each embedding of 4 float32 values takes 16 bytes
+        cache = EmbeddingCache(self.path, "model", False, None, max_size_bytes=48)
+        cache.put_many(cache.build_keys(["a", "b"]), [numpy.ones(4), numpy.ones(4) * 2])
+        cache.get_many(cache.build_keys(["a"]))
+        cache.put_many(
+            cache.build_keys(["c", "d"]), [numpy.ones(4) * 3, numpy.ones(4) * 4]
+        )
+
+        self.assertLessEqual(cache.stats().size, 48)
+        self.assertIsNone(cache.get_many(cache.build_keys(["b"]))[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
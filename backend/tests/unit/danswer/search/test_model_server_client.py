@@ -0,0 +1,91 @@
+import unittest
+from unittest.mock import patch
+
+import httpx
+import numpy
+
+from danswer.search.model_server_client import EndpointPolicy
+from danswer.search.model_server_client import ModelServerClient
+from danswer.search.model_server_client import ModelServerEndpoint
+from shared_models.binary_tensor import BINARY_TENSOR_MEDIA_TYPE
+from shared_models.binary_tensor import encode_matrix
+
+_MODULE = "danswer.search.model_server_client"
+_URL = "http://model-server/encoder/bi-encoder-embed"
+
+
+class TestPostBinary(unittest.TestCase):
+    def setUp(self) -> None:
+        binary_patch = patch(f"{_MODULE}.MODEL_SERVER_BINARY_PROTOCOL", True)
+        binary_patch.start()
+        self.addCleanup(binary_patch.stop)
+
+        self.status_code = 200
+        self.content_type = BINARY_TENSOR_MEDIA_TYPE
+        self.requested_urls: list[str] = []
+        self.client = ModelServerClient(
+            endpoint_policies={
+                endpoint: EndpointPolicy(timeout=1, retries=0)
+                for endpoint in ModelServerEndpoint
+            }
+        )
+        self.client._client = httpx.Client(transport=httpx.MockTransport(self._handle))
+        self.addCleanup(self.client.close)
+
+    def _handle(self, request: httpx.Request) -> httpx.Response:
+        self.requested_urls.append(str(request.url.copy_with(query=None)))
+        if self.status_code != 200:
+            return httpx.Response(self.status_code)
+        if self.content_type != BINARY_TENSOR_MEDIA_TYPE:
+            return httpx.Response(
+                200,
+                content=b'{"embeddings": []}',
+                headers={"content-type": self.content_type},
+            )
+        return httpx.Response(
+            200,
+            content=encode_matrix(numpy.ones((2, 3))),
+            headers={"content-type": BINARY_TENSOR_MEDIA_TYPE},
+        )
+
+    def _post_binary(self) -> numpy.ndarray | None:
+        return self.client.post_binary(ModelServerEndpoint.EMBED, _URL, {})
+
+    def test_binary_response_is_decoded(self) -> None:
+        embeddings = self._post_binary()
+        assert embeddings is not None
+        self.assertEqual(embeddings.tolist(), [[1.0] * 3] * 2)
+        self.assertEqual(self.requested_urls, [_URL + "-binary"])
+
+    def test_missing_endpoint_disables_binary_responses(self) -> None:
+        for status_code in [404, 405]:
+            self.status_code = status_code
+            self.client._binary_unsupported_urls.clear()
+            self.assertIsNone(self._post_binary())
+            # Remembered, the binary endpoint is not tried again
+            self.assertIsNone(self._post_binary())
+            self.assertEqual(len(self.requested_urls), 1)
+            self.requested_urls.clear()
+
+    def test_non_binary_response_disables_binary_responses(self) -> None:
+        for content_type in ["application/json", "text/html; charset=utf-8"]:
+            self.content_type = content_type
+            self.client._binary_unsupported_urls.clear()
+            self.assertIsNone(self._post_binary())
+            self.assertIsNone(self._post_binary())
+            self.assertEqual(len(self.requested_urls), 1)
+            self.requested_urls.clear()
+
+    def test_other_errors_are_raised(self) -> None:
+        self.status_code = 500
+        with self.assertRaises(httpx.HTTPStatusError):
+            self._post_binary()
+
+        # A failed request does not disable binary responses for good
+        self.status_code = 200
+        self.assertIsNotNone(self._post_binary())
+        self.assertEqual(len(self.requested_urls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+from unittest.mock import patch
+
+from danswer.search.search_nlp_models import CrossEncoderEnsembleModel
+from danswer.search.search_nlp_models import RerankScoreCache
+
+_MODULE = "danswer.search.search_nlp_models"
+
+
+class TestRerankScoreCache(unittest.TestCase):
+    def test_keys(self) -> None:
+        keys = RerankScoreCache.build_keys(
+            ("", "model"), "  what  is\tdanswer ", ["content", "content"], ["a", "b"]
+        )
+        self.assertEqual(
+            keys,
+            RerankScoreCache.build_keys(
+                ("", "model"), "what is danswer", ["content", "content"], ["a", "b"]
+            ),
+        )
+        self.assertNotEqual(keys[0], keys[1])
+        # A re-indexed chunk or another ensemble never gets the old scores
+        self.assertNotEqual(
+            keys[0],
+            RerankScoreCache.build_keys(
+                ("", "model"), "what is danswer", ["new content"], ["a"]
+            )[0],
+        )
+        self.assertNotEqual(
+            keys[0],
+            RerankScoreCache.build_keys(
+                ("", "other model"), "what is danswer", ["content"], ["a"]
+            )[0],
+        )
+
+    def test_get_and_put(self) -> None:
+        cache = RerankScoreCache(max_size=10, ttl_seconds=60)
+        keys = RerankScoreCache.build_keys(("m",), "q", ["x", "y"], ["a", "b"])
+        cache.put_many(keys[:1], [[0.5, 0.25]])
+
+        self.assertEqual(cache.get_many(keys), [[0.5, 0.25], None])
+        cache.clear()
+        self.assertEqual(cache.get_many(keys), [None, None])
+
+        disabled = RerankScoreCache(max_size=0, ttl_seconds=60)
+        disabled.put_many(keys, [[1.0], [2.0]])
+        self.assertFalse(disabled.enabled)
+        self.assertEqual(disabled.get_many(keys), [None, None])
+
+
+class TestCachedPredict(unittest.TestCase):
+    def setUp(self) -> None:
+        cache_patch = patch(
+            f"{_MODULE}.get_rerank_score_cache",
+            return_value=RerankScoreCache(max_size=100, ttl_seconds=60),
+        )
+        cache_patch.start()
+        self.addCleanup(cache_patch.stop)
+
+        self.model = CrossEncoderEnsembleModel(
+            model_names=["m1", "m2"], model_server_host=None
+        )
+        self.scored_passages: list[list[str]] = []
+        self.from_ensemble = True
+
+    def _predict_uncached(
+        self, query: str, passages: list[str]
+    ) -> tuple[list[list[float]], bool]:
+        self.scored_passages.append(passages)
+        scores = [float(len(passage)) for passage in passages]
+        return [scores, [-score for score in scores]], self.from_ensemble
+
+    def test_only_misses_are_scored(self) -> None:
+        with patch.object(self.model, "_predict_uncached", self._predict_uncached):
+            self.assertEqual(
+                self.model.predict("q", ["a", "bb"], ["1", "2"]),
+                [[1.0, 2.0], [-1.0, -2.0]],
+            )
+            self.assertEqual(
+                self.model.predict("q", ["bb", "ccc", "a"], ["2", "3", "1"]),
+                [[2.0, 3.0, 1.0], [-2.0, -3.0, -1.0]],
+            )
+
+        self.assertEqual(self.scored_passages, [["a", "bb"], ["ccc"]])
+
+    def test_fallback_scores_are_not_cached(self) -> None:
+        self.from_ensemble = False
+        with patch.object(self.model, "_predict_uncached", self._predict_uncached):
+            self.model.predict("q", ["a"], ["1"])
+            self.from_ensemble = True
+            self.model.predict("q", ["a"], ["1"])
+            self.model.predict("q", ["a"], ["1"])
+
+        self.assertEqual(self.scored_passages, [["a"], ["a"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+import numpy
+
+from danswer.document_index.document_index_utils import (
+    translate_boost_count_to_multiplier,
+)
+from danswer.search.scoring import ChunkScoreColumns
+from danswer.search.scoring import score_cross_encoder_results
+from danswer.search.scoring import translate_boost_counts_to_multipliers
+
+
+class TestScoring(unittest.TestCase):
+    def test_boost_multipliers_match_scalar_version(self) -> None:
+        boost_counts = [-20, -3, -1, 0, 1, 3, 20]
+        multipliers = translate_boost_counts_to_multipliers(
+            numpy.array(boost_counts, dtype=numpy.float64)
+        )
+        for count, multiplier in zip(boost_counts, multipliers.tolist()):
+            self.assertAlmostEqual(
+                multiplier, translate_boost_count_to_multiplier(count)
+            )
+
+    def test_order_is_descending_and_stable(self) -> None:
+        final = numpy.array([0.1, 0.5, 0.1, 0.9])
+        columns = ChunkScoreColumns.from_final_scores(
+            raw=final, boost=numpy.ones(4), recency=numpy.ones(4), final=final
+        )
+        self.assertEqual(columns.order.tolist(), [3, 1, 0, 2])
+        self.assertEqual(columns.ranked_final_scores(), [0.9, 0.5, 0.1, 0.1])
+
+    def test_cross_encoder_scores(self) -> None:
+        sim_scores = numpy.array([[2.0, -4.0, 0.0], [4.0, -2.0, 0.0]])
+        columns = score_cross_encoder_results(
+            sim_scores=sim_scores,
+            boosts=numpy.array([1.0, 1.0, 2.0]),
+            recency=numpy.array([1.0, 0.5, 1.0]),
+            model_min=-10,
+            model_max=10,
+        )
+        self.assertEqual(columns.raw.tolist(), [3.0, -3.0, 0.0])
+        # Shifted by the min (-4), multiplied, shifted back and normalized to [-10, 10]
+        self.assertEqual(columns.final.tolist(), [0.65, 0.325, 0.7])
+        self.assertEqual(columns.order.tolist(), [2, 0, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from typing import Any
+from unittest.mock import MagicMock
+from unittest.mock import patch
+
+from danswer.configs.constants import DocumentSource
+from danswer.indexing.models import InferenceChunk
+from danswer.search.models import IndexFilters
+from danswer.search.models import SearchQuery
+from danswer.search.search_runner import retrieve_chunks
+
+_MODULE = "danswer.search.search_runner"
+
+
+def _display_chunk(document_id: str, score: float) -> InferenceChunk:
+    return InferenceChunk(
+        document_id=document_id,
+        source_type=DocumentSource.FILE,
+        chunk_id=0,
+        content="",
+        source_links=None,
+        blurb="blurb",
+        semantic_identifier=document_id,
+        section_continuation=False,
+        recency_bias=1,
+        boost=0,
+        hidden=False,
+        score=score,
+        metadata={},
+        match_highlights=[],
+        updated_at=None,
+        content_hydrated=False,
+    )
+
+
+class _FakeIndex:
+    def __init__(self) -> None:
+        self.hydrated_ids: list[str] = []
+
+    def hydrate_chunks(self, chunks: list[InferenceChunk]) -> list[InferenceChunk]:
+        for chunk in chunks:
+            self.hydrated_ids.append(chunk.document_id)
+            chunk.content = f"content of {chunk.document_id}"
+            chunk.content_hydrated = True
+        return chunks
+
+
+class TestRetrieveChunks(unittest.TestCase):
+    def setUp(self) -> None:
+        self.results_by_query = {
+            "english": [_display_chunk("a", 0.9), _display_chunk("b", 0.5)],
+            # Scores of the rephrases are not comparable, these all land on top
+            "french": [
+                _display_chunk("c", 3.0),
+                _display_chunk("d", 2.0),
+                _display_chunk("e", 1.0),
+            ],
+        }
+        for target, side_effect in [
+            ("report_retrieval_results", None),
+            ("get_expanded_queries", self._expand),
+            ("doc_index_retrieval", self._retrieve_for_query),
+        ]:
+            target_patch = patch(f"{_MODULE}.{target}", side_effect=side_effect)
+            target_patch.start()
+            self.addCleanup(target_patch.stop)
+
+    def _expand(self, query: SearchQuery, _: str) -> list[SearchQuery]:
+        return [
+            query.copy(update={"query": rephrase}) for rephrase in self.results_by_query
+        ]
+
+    def _retrieve_for_query(self, query: SearchQuery, *_: Any) -> list[InferenceChunk]:
+        return self.results_by_query[query.query]
+
+    def _retrieve(self, index: Any, **query_kwargs: Any) -> list[InferenceChunk]:
+        query = SearchQuery(
+            query="question",
+            filters=IndexFilters(access_control_list=None),
+            recency_bias_multiplier=1.0,
+            skip_rerank=False,
+            num_rerank=3,
+            skip_llm_chunk_filter=True,
+            **query_kwargs,
+        )
+        return retrieve_chunks(
+            query=query,
+            document_index=index,
+            db_session=MagicMock(),
+            multilingual_expansion_str="english,french",
+        )
+
+    def test_top_of_combined_results_is_hydrated(self) -> None:
+        index = _FakeIndex()
+        chunks = self._retrieve(index, num_hydrated=2)
+
+        # Covers the rerank window, which is taken from the combined order
+        self.assertEqual([chunk.document_id for chunk in chunks], list("cdeab"))
+        self.assertEqual(index.hydrated_ids, ["c", "d", "e"])
+        self.assertEqual(
+            [chunk.content_hydrated for chunk in chunks],
+            [True, True, True, False, False],
+        )
+
+    def test_nothing_to_hydrate(self) -> None:
+        index = MagicMock()
+        self._retrieve(index, num_hydrated=None)
+        index.hydrate_chunks.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import unittest
+from typing import Any
+from unittest.mock import patch
+
+from danswer.prompts.llm_chunk_filter import BATCH_CHUNK_FILTER_PROMPT
+from danswer.prompts.llm_chunk_filter import BATCH_CHUNK_FILTER_SECTION
+from danswer.prompts.llm_chunk_filter import NONUSEFUL_PAT
+from danswer.secondary_llm_flows.chunk_usefulness import _extract_useful_sections
+from danswer.secondary_llm_flows.chunk_usefulness import llm_batch_eval_chunks
+from danswer.secondary_llm_flows.chunk_usefulness import split_chunks_for_batch_eval
+
+_MODULE = "danswer.secondary_llm_flows.chunk_usefulness"
+
+
+class _WordTokenizer:
+    """One token per whitespace separated word"""
+
+    def encode(self, text: str) -> list[str]:
+        return text.split()
+
+    def decode(self, tokens: list[str]) -> str:
+        return " ".join(tokens)
+
+
+class _FakeLLM:
+    def __init__(self, batch_output: str) -> None:
+        self.batch_output = batch_output
+        self.prompts: list[str] = []
+
+    def invoke(self, prompt: list[Any]) -> str:
+        content = prompt[0].content
+        self.prompts.append(content)
+        if "Section 1" in content:
+            return self.batch_output
+        return NONUSEFUL_PAT if "useless" in content else "Useful"
+
+
+class TestExtractUsefulSections(unittest.TestCase):
+    def test_well_formed_output(self) -> None:
+        self.assertEqual(
+            _extract_useful_sections('{"useful_sections": [1, 3]}', 4),
+            [True, False, True, False],
+        )
+        # Json embedded in other text and numbers given as strings
+        self.assertEqual(
+            _extract_useful_sections('Sure: {"useful_sections": ["2"]} done', 2),
+            [False, True],
+        )
+        self.assertEqual(
+            _extract_useful_sections('{"useful_sections": []}', 2), [False, False]
+        )
+
+    def test_malformed_output(self) -> None:
+        for model_output, error in [
+            ("Sections 1 and 3", ValueError),
+            ('{"useful_sections": 1}', ValueError),
+            ('{"sections": [1]}', ValueError),
+            ('{"useful_sections": [0]}', ValueError),
+            ('{"useful_sections": [5]}', ValueError),
+            ('{"useful_sections": ["first"]}', ValueError),
+            ('{"useful_sections": [null]}', ValueError),
+            ('{"useful_sections": [1.7]}', ValueError),
+            ('{"useful_sections": ["2a"]}', ValueError),
+            ('{"useful_sections": [true]}', ValueError),
+        ]:
+            with self.assertRaises(error, msg=model_output):
+                _extract_useful_sections(model_output, 4)
+
+
+class TestBatchEval(unittest.TestCase):
+    def setUp(self) -> None:
+        tokenizer_patch = patch(
+            f"{_MODULE}.get_default_llm_tokenizer", return_value=_WordTokenizer()
+        )
+        tokenizer_patch.start()
+        self.addCleanup(tokenizer_patch.stop)
+
+    def _patch_llm(self, llm: _FakeLLM) -> None:
+        llm_patch = patch(f"{_MODULE}.get_default_llm", return_value=llm)
+        llm_patch.start()
+        self.addCleanup(llm_patch.stop)
+
+    @staticmethod
+    def _overhead_tokens(query: str, batch_size: int) -> tuple[int, int]:
+        prompt = BATCH_CHUNK_FILTER_PROMPT.format(
+            numbered_sections="", user_query=query
+        )
+        section = BATCH_CHUNK_FILTER_SECTION.format(
+            section_num=batch_size, chunk_text=""
+        )
+        return len(prompt.split()), len(section.split())
+
+    def test_batches_are_capped_by_size_and_tokens(self) -> None:
+        chunks = ["a " * 10, "b " * 10, "c " * 10, "d " * 10, "e " * 10]
+        self.assertEqual(
+            [len(batch) for batch in split_chunks_for_batch_eval("query", chunks, 2)],
+            [2, 2, 1],
+        )
+
+        prompt_tokens, section_tokens = self._overhead_tokens("query", 10)
+        # Room for exactly two of the chunks per prompt
+        max_prompt_tokens = prompt_tokens + 2 * (10 + section_tokens)
+        batches = split_chunks_for_batch_eval(
+            "query", chunks, batch_size=10, max_prompt_tokens=max_prompt_tokens
+        )
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual([chunk for batch in batches for chunk in batch], chunks)
+
+    def test_chunks_over_the_token_cap_are_trimmed(self) -> None:
+        prompt_tokens, section_tokens = self._overhead_tokens("query", 5)
+        max_prompt_tokens = prompt_tokens + section_tokens + 300
+        batches = split_chunks_for_batch_eval(
+            "query",
+            ["word " * 5000, "short"],
+            batch_size=5,
+            max_prompt_tokens=max_prompt_tokens,
+        )
+        # The long chunk is trimmed to fill a prompt on its own
+        self.assertEqual(batches, [[" ".join(["word"] * 300)], ["short"]])
+
+    def test_batched_verdicts(self) -> None:
+        llm = _FakeLLM('{"useful_sections": [2]}')
+        self._patch_llm(llm)
+
+        self.assertEqual(
+            llm_batch_eval_chunks("query", ["one", "two"], use_threads=False),
+            [False, True],
+        )
+        self.assertEqual(len(llm.prompts), 1)
+
+    def test_malformed_output_falls_back_to_one_call_per_chunk(self) -> None:
+        llm = _FakeLLM("I think the second one")
+        self._patch_llm(llm)
+
+        self.assertEqual(
+            llm_batch_eval_chunks("query", ["useless", "good"], use_threads=False),
+            [False, True],
+        )
+        # One batched call, then one call per chunk
+        self.assertEqual(len(llm.prompts), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
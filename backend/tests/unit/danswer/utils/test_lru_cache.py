@@ -0,0 +1,41 @@
+import time
+import unittest
+
+from danswer.utils.lru_cache import LRUTTLCache
+
+
+class TestLRUTTLCache(unittest.TestCase):
+    def test_lru_eviction(self) -> None:
+        cache: LRUTTLCache[str, int] = LRUTTLCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        # Touching "a" makes "b" the least recently used entry
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+
+        stats = cache.stats()
+        self.assertEqual(stats.size, 2)
+        self.assertEqual(stats.hits, 3)
+        self.assertEqual(stats.misses, 1)
+
+    def test_ttl_expiry(self) -> None:
+        cache: LRUTTLCache[str, int] = LRUTTLCache(max_size=10, ttl_seconds=0.05)
+        cache.put("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_disabled(self) -> None:
+        cache: LRUTTLCache[str, int] = LRUTTLCache(max_size=0)
+        cache.put("a", 1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats().misses, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
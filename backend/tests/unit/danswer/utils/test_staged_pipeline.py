@@ -0,0 +1,60 @@
+import time
+import unittest
+
+from danswer.utils.staged_pipeline import StagedPipeline
+
+
+def _slow_double(item: int) -> int:
+    time.sleep(0.01 * (item % 3))
+    return item * 2
+
+
+def _fail_on_three(item: int) -> int:
+    if item == 3:
+        raise ValueError("failed")
+    return item
+
+
+class TestStagedPipeline(unittest.TestCase):
+    def test_results_keep_submission_order(self) -> None:
+        for queue_size in [0, 1, 3]:
+            with StagedPipeline[int, int](
+                [("double", _slow_double), ("increment", lambda x: x + 1)],
+                queue_size=queue_size,
+            ) as pipeline:
+                results: list[int] = []
+                for item in range(10):
+                    pipeline.submit(item)
+                    results.extend(pipeline.finished_results())
+                results.extend(pipeline.finish())
+
+            self.assertEqual(results, [item * 2 + 1 for item in range(10)])
+            self.assertEqual([timing.items for timing in pipeline.timings], [10, 10])
+
+    def test_stage_failure_is_raised(self) -> None:
+        with self.assertRaises(ValueError):
+            with StagedPipeline[int, int](
+                [("fail", _fail_on_three), ("double", _slow_double)], queue_size=1
+            ) as pipeline:
+                for item in range(10):
+                    pipeline.submit(item)
+                pipeline.finish()
+
+    def test_results_before_failure_can_be_taken(self) -> None:
+        results: list[int] = []
+        # Failing in the last stage, the items before the failed one made it through
+        with StagedPipeline[int, int](
+            [("increment", lambda x: x + 1), ("fail", _fail_on_three)], queue_size=1
+        ) as pipeline:
+            with self.assertRaises(ValueError):
+                for item in range(10):
+                    pipeline.submit(item)
+                    results.extend(pipeline.finished_results())
+                results.extend(pipeline.finish())
+            results.extend(pipeline.finished_results(raise_on_failure=False))
+
+        self.assertEqual(results, [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
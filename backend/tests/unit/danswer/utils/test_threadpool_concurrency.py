@@ -0,0 +1,69 @@
+import threading
+import time
+import unittest
+
+from danswer.utils.threadpool_concurrency import BoundedExecutor
+from danswer.utils.threadpool_concurrency import ExecutorPoolName
+from danswer.utils.threadpool_concurrency import FunctionCall
+from danswer.utils.threadpool_concurrency import get_executor
+from danswer.utils.threadpool_concurrency import run_functions_in_parallel
+from danswer.utils.threadpool_concurrency import run_functions_tuples_in_parallel
+
+
+def _fail() -> None:
+    raise ValueError("failed")
+
+
+class TestThreadpoolConcurrency(unittest.TestCase):
+    def test_results_keep_order_and_failures(self) -> None:
+        results = run_functions_tuples_in_parallel(
+            [(time.sleep, (0.02,)), (str.upper, ("a",)), (_fail, ())],
+            allow_failures=True,
+        )
+        self.assertEqual(results, [None, "A", None])
+
+        with self.assertRaises(ValueError):
+            run_functions_tuples_in_parallel([(_fail, ())])
+
+        call = FunctionCall(str.lower, ("B",))
+        self.assertEqual(run_functions_in_parallel([call]), {call.result_id: "b"})
+
+    def test_nested_calls_in_same_pool_do_not_deadlock(self) -> None:
+        io_pool_size = get_executor(ExecutorPoolName.IO).max_workers
+
+        def _inner(i: int) -> list[int]:
+            return run_functions_tuples_in_parallel(
+                [(int, (i,)) for _ in range(io_pool_size)]
+            )
+
+        results = run_functions_tuples_in_parallel(
+            [(_inner, (i,)) for i in range(io_pool_size * 2)]
+        )
+        self.assertEqual(results, [[i] * io_pool_size for i in range(io_pool_size * 2)])
+
+    def test_submit_blocks_when_saturated(self) -> None:
+        executor = BoundedExecutor("test", max_workers=1, max_queued=1)
+        release = threading.Event()
+        executor.submit(release.wait)
+        executor.submit(release.wait)
+        self.assertIsNone(executor.try_submit(release.wait))
+
+        submitted = threading.Event()
+
+        def _submit_third() -> None:
+            executor.submit(int).result()
+            submitted.set()
+
+        threading.Thread(target=_submit_third, daemon=True).start()
+        self.assertFalse(submitted.wait(0.05))
+
+        release.set()
+        self.assertTrue(submitted.wait(1))
+        stats = executor.stats()
+        self.assertEqual(stats.completed, 3)
+        self.assertEqual(stats.throttled_submits, 2)
+        executor.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
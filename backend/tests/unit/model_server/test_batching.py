@@ -0,0 +1,100 @@
+import threading
+import time
+import unittest
+from collections.abc import Hashable
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+
+from model_server.batching import MicroBatcher
+
+
+class TestMicroBatcher(unittest.TestCase):
+    def setUp(self) -> None:
+        self.calls: list[tuple[Hashable, list[int]]] = []
+        # The first batch blocks until released so that the next requests queue up
+        self.release_first = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=8)
+
+    def tearDown(self) -> None:
+        self.release_first.set()
+        self.executor.shutdown(wait=True)
+
+    def _process_batch(self, group_key: Hashable, items: list[int]) -> list[int]:
+        self.calls.append((group_key, items))
+        if len(self.calls) == 1:
+            self.release_first.wait(timeout=5)
+        return [item * 10 for item in items]
+
+    def _submit_while_blocked(
+        self, batcher: MicroBatcher[int, int], requests: list[tuple[str, list[int]]]
+    ) -> list["Future[list[int]]"]:
+        futures = [self.executor.submit(batcher.submit, "blocker", [0])]
+        while not self.calls:
+            time.sleep(0.001)
+        for num_queued, (group_key, items) in enumerate(requests, start=1):
+            futures.append(self.executor.submit(batcher.submit, group_key, items))
+            # Queued one at a time to keep the order deterministic
+            while batcher.stats().queue_depth < num_queued:
+                time.sleep(0.001)
+        self.release_first.set()
+        return futures
+
+    def test_lone_request_is_not_held_back(self) -> None:
+        self.release_first.set()
+        batcher = MicroBatcher("test", self._process_batch, 8, max_wait_ms=10_000)
+
+        start = time.monotonic()
+        self.assertEqual(batcher.submit("a", [1, 2]), [10, 20])
+        self.assertLess(time.monotonic() - start, 1)
+
+    def test_groups_and_splits_queued_requests(self) -> None:
+        batcher = MicroBatcher("test", self._process_batch, 4, max_wait_ms=50)
+        futures = self._submit_while_blocked(
+            batcher,
+            [
+                ("a", [1, 2]),
+                ("b", [3]),
+                ("a", [4, 5]),
+                ("a", [6]),
+                ("a", [7, 8, 9, 10, 11]),
+            ],
+        )
+
+        self.assertEqual(
+            [future.result(timeout=5) for future in futures],
+            [[0], [10, 20], [30], [40, 50], [60], [70, 80, 90, 100, 110]],
+        )
+        self.assertEqual(
+            self.calls,
+            [
+                ("blocker", [0]),
+                ("a", [1, 2, 4, 5]),
+                ("b", [3]),
+                ("a", [6]),
+                # Larger than the max batch size, run on its own
+                ("a", [7, 8, 9, 10, 11]),
+            ],
+        )
+
+    def test_failures_reach_every_caller_of_the_batch(self) -> None:
+        def _fail(group_key: Hashable, items: list[int]) -> list[int]:
+            raise ValueError("model failed")
+
+        batcher: MicroBatcher[int, int] = MicroBatcher("test", _fail, 4, max_wait_ms=10)
+        with self.assertRaises(ValueError):
+            batcher.submit("a", [1])
+
+        short_batcher: MicroBatcher[int, int] = MicroBatcher(
+            "test", lambda group_key, items: items[:-1], 4, max_wait_ms=10
+        )
+        with self.assertRaises(RuntimeError):
+            short_batcher.submit("a", [1, 2])
+
+        # The worker keeps serving requests after a failure
+        self.release_first.set()
+        batcher.process_batch = self._process_batch
+        self.assertEqual(batcher.submit("a", [3]), [30])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import struct
+import unittest
+
+import numpy
+
+from shared_models.binary_tensor import decode_matrix
+from shared_models.binary_tensor import encode_matrix
+from shared_models.binary_tensor import TensorCompression
+from shared_models.binary_tensor import TensorDType
+
+
+class TestBinaryTensor(unittest.TestCase):
+    def setUp(self) -> None:
+        self.matrix = numpy.random.default_rng(0).standard_normal((5, 7))
+
+    def test_round_trip(self) -> None:
+        for dtype in TensorDType:
+            for compression in TensorCompression:
+                decoded = decode_matrix(encode_matrix(self.matrix, dtype, compression))
+                self.assertEqual(decoded.dtype, numpy.float32)
+                self.assertEqual(decoded.shape, (5, 7))
+                numpy.testing.assert_allclose(
+                    decoded,
+                    self.matrix,
+                    rtol=1e-6 if dtype == TensorDType.FLOAT32 else 1e-2,
+                    atol=0 if dtype == TensorDType.FLOAT32 else 1e-3,
+                    err_msg=f"{dtype} {compression}",
+                )
+
+        empty = numpy.zeros((0, 4))
+        self.assertEqual(decode_matrix(encode_matrix(empty)).shape, (0, 4))
+
+    def test_invalid_input(self) -> None:
+        with self.assertRaises(ValueError):
+            encode_matrix(numpy.zeros(3))
+
+        data = encode_matrix(self.matrix)
+        for invalid in [
+            data[:10],
+            b"XXXX" + data[4:],
+            # Unknown dtype and compression codes
+            data[:5] + bytes([9]) + data[6:],
+            data[:6] + bytes([9]) + data[7:],
+        ]:
+            with self.assertRaises(ValueError):
+                decode_matrix(invalid)
+
+        # Header layout: magic, version, dtype, compression, reserved, rows, cols
+        magic, version, dtype_code, compression_code, rows, cols = struct.unpack_from(
+            "<4sBBBxII", data
+        )
+        self.assertEqual((magic, version, rows, cols), (b"DTNS", 1, 5, 7))
+        self.assertEqual((dtype_code, compression_code), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()